@@ -5,17 +5,21 @@ Description: This script automates the assignment of tickets in ServiceNow based
 License: MIT
 """
 
-import time
-import os
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
+from servicenow_metrics import metrics
+from servicenow_processes import processes
+from servicenow_waits import wait_for_autocomplete, wait_for_cell_editor_closed
 
-# Kill any existing Chrome processes before starting
-os.system("taskkill /F /IM chrome.exe /T")
+# Step timings go to ServiceNow_Metrics.jsonl / ServiceNow_Metrics.prom in the user profile
+metrics.configure('assign_chrome')
+
+# Stop only Chrome instances left behind by crashed runs; the user's own windows stay open
+processes.cleanup_orphans()
 
 # Configuration for Chrome profile
 # REMOVED: Actual file path to personal Chrome profile
@@ -25,7 +29,7 @@ chrome_options.add_argument(f'user-data-dir={chrome_profile_path}')
 chrome_options.add_argument('profile-directory=Profile 2')
 
 # Initialize the WebDriver with longer timeout for slow pages
-driver = webdriver.Chrome(options=chrome_options)
+driver = processes.start('chrome', chrome_options)
 wait = WebDriverWait(driver, 10)  # 10-second timeout for finding elements
 
 '''
@@ -53,13 +57,14 @@ try:
     sign_in_button.click()
 except (NoSuchElementException, TimeoutException) as e:
     print("Error during login process:", e)
-    driver.quit()
+    processes.quit(driver)
     exit()
 '''
 
 # URL for the incident list page that shows unassigned tickets
 incidents_url = 'https://example.com/incident_list'  # Replace with actual URL
 
+@metrics.timed('element_find')
 def find_element_safe(wait, by, value, timeout=10):
     """
     Safely find an element with explicit wait without raising exceptions.
@@ -90,24 +95,28 @@ def find_shadow_element(host, selector):
 # Main automation loop
 while True:
     # Navigate to the incidents page
-    driver.get(incidents_url)
+    with metrics.span('list_load'):
+        driver.get(incidents_url)
     print("Incidents list page opened")
 
     try:
-        # Find the shadow DOM host element (modern web component)
-        shadow_host = find_element_safe(wait, By.XPATH, "//*[starts-with(name(), 'macroponent')]")
-        if not shadow_host:
-            print("❌ Shadow DOM Host not found.")
-            break
-
-        # Find the iframe inside the shadow DOM
-        iframe = find_shadow_element(shadow_host, 'iframe')
-        if not iframe:
-            print("❌ iframe not found. Reloading...")
-            continue  # Reload page if iframe is missing
-        
-        # Switch to the iframe containing the incident list
-        driver.switch_to.frame(iframe)
+        with metrics.span('frame_resolve') as span:
+            # Find the shadow DOM host element (modern web component)
+            shadow_host = find_element_safe(wait, By.XPATH, "//*[starts-with(name(), 'macroponent')]")
+            if not shadow_host:
+                span.fail()
+                print("❌ Shadow DOM Host not found.")
+                break
+
+            # Find the iframe inside the shadow DOM
+            iframe = find_shadow_element(shadow_host, 'iframe')
+            if not iframe:
+                span.fail()
+                print("❌ iframe not found. Reloading...")
+                continue  # Reload page if iframe is missing
+            
+            # Switch to the iframe containing the incident list
+            driver.switch_to.frame(iframe)
         print("✅ Switched to iframe!")
 
         # Find the implementer cell and assignment group cell in the first row
@@ -144,8 +153,9 @@ while True:
             break
         
         # Enter the implementer name
-        implementer_add.send_keys(implementer_text)
-        time.sleep(2)  # Allow time for dropdown suggestions to appear
+        with metrics.span('edit'):
+            implementer_add.send_keys(implementer_text)
+            wait_for_autocomplete(driver, implementer_add)  # Wait for dropdown suggestions to appear
         
         # Find and click the confirm button
         implementer_add_button = find_element_safe(wait, By.CSS_SELECTOR, "a#cell_edit_ok", timeout=5)
@@ -153,12 +163,12 @@ while True:
             print("❌ Implementer add button not found.")
             break
         
-        # Confirm the assignment
-        implementer_add_button.click()
+        # Confirm the assignment and wait for the edit to be saved before processing the next incident
+        with metrics.span('submit') as span:
+            implementer_add_button.click()
+            if not wait_for_cell_editor_closed(driver):
+                span.fail()
         print(f"✅ Implementer '{implementer_text}' added successfully!")
-        
-        # Wait before processing the next incident
-        time.sleep(3)
 
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -166,4 +176,5 @@ while True:
 
 # Clean up
 print("❌ Closing the browser due to error or completion.")
-driver.quit()
\ No newline at end of file
+processes.quit(driver)
+metrics.close()
\ No newline at end of file
@@ -1,7 +1,8 @@
 REM This batch script is used to execute the Python script 'assign_task_edge.py' in minimized mode.
 REM Ensure that the Python executable path and script path are correct before running.
+REM --daemon keeps the browser open and polls for new incidents instead of exiting when the list is empty.
 REM Author: Abdullah Omer
 REM GitHub: https://github.com/AbdullahOmerDev
 
 @echo off
-start /min "" "C:\Users\{username}\AppData\Local\Programs\Python\Python313\python.exe" "C:\Users\devde\Documents\Programming\ServiceNow_Automate\assign_task_edge.py"
\ No newline at end of file
+start /min "" "C:\Users\{username}\AppData\Local\Programs\Python\Python313\python.exe" "C:\Users\devde\Documents\Programming\ServiceNow_Automate\assign_task_edge.py" --daemon
\ No newline at end of file
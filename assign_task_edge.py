@@ -1,14 +1,37 @@
-import time
 import os
 import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.keys import Keys
 import warnings
+from urllib.parse import urlsplit
 from selenium.webdriver.common.service import Service
+from servicenow_api import TableAPIClient, TableAPIError, iterate_records
+from servicenow_list import iterate_list_pages, snapshot_list
+from servicenow_lean import enable_lean_network, lean_options
+from servicenow_locators import locators
+from servicenow_mass_update import group_by_target, update_selected
+from servicenow_metrics import metrics
+from servicenow_mirror import RecordMirror
+from servicenow_nav import ClassicNavigator
+from servicenow_plan import WritePlan
+from servicenow_processes import processes
+from servicenow_profile import SlimProfile
+from servicenow_recovery import DeadLetterList, RecordRecovery
+from servicenow_recycle import BrowserRecycler
+from servicenow_poller import AdaptiveBackoff, ApiTablePoller, BrowserTablePoller, WatermarkPoller, run_daemon
+from servicenow_reference import ReferenceCache, read_reference_value, set_reference_value
+from servicenow_session import lease_session
+from servicenow_stages import discard_form_changes, set_assignee, submit_form
+from servicenow_throttle import throttle
+from servicenow_waits import wait_for_autocomplete, wait_for_cell_editor_closed, wait_for_form_load
 
 # Credits: Abdullah Omer (https://github.com/AbdullahOmerDev)
 # Script Purpose: Automates task assignment in ServiceNow based on assignment group mapping
@@ -16,8 +39,42 @@ from selenium.webdriver.common.service import Service
 # Suppress specific Selenium warnings
 warnings.filterwarnings("ignore", category=UserWarning, module='selenium.webdriver.common.service')
 
-# Kill any existing Edge processes
-os.system("taskkill /F /IM msedge.exe /T")
+# Command line options
+# --backend browser (default) drives Edge; --backend api uses the ServiceNow Table API
+parser = argparse.ArgumentParser(description="Assign ServiceNow incidents based on assignment group mapping")
+parser.add_argument('--backend', choices=['browser', 'api'], default='browser',
+                    help="'browser' drives Edge, 'api' PATCHes incidents through the Table API")
+parser.add_argument('--instance-url', default='https://your_instance.service-now.com',
+                    help="Base URL used by the Table API backend")
+parser.add_argument('--page-size', type=int, default=100,
+                    help="Number of incidents read per Table API request")
+parser.add_argument('--api-workers', type=int, default=4,
+                    help="Table API backend: most PATCHes in flight at once; the shared throttle adapts below it")
+parser.add_argument('--batch', action='store_true',
+                    help="Browser backend: assign every row on the list page before reloading it")
+parser.add_argument('--mass-update', action='store_true',
+                    help="Browser backend: assign all rows going to the same implementer with one 'Update Selected' save")
+parser.add_argument('--mirror', action='store_true',
+                    help="Browser backend: route from the local SQLite mirror (synced incrementally) and open only the forms to write")
+parser.add_argument('--session-service', action='store_true',
+                    help="Browser backend: lease a warm, logged-in browser from servicenow_session.py")
+parser.add_argument('--direct-nav', action='store_true',
+                    help="Load classic UI lists directly instead of through the macroponent shell iframe")
+parser.add_argument('--lean', action='store_true',
+                    help="Block fonts, images and analytics the script never reads to cut page weight")
+parser.add_argument('--clear-reference-cache', action='store_true',
+                    help="Forget the cached implementer sys_ids before starting")
+parser.add_argument('--daemon', action='store_true',
+                    help="Keep the session open and poll for new unassigned incidents instead of exiting")
+parser.add_argument('--poll-min', type=float, default=5,
+                    help="Daemon: seconds between polls while incidents keep arriving")
+parser.add_argument('--poll-max', type=float, default=300,
+                    help="Daemon: longest interval the idle backoff grows to")
+parser.add_argument('--retries', type=int, default=2,
+                    help="Browser backend: extra attempts for an incident before it is moved to the dead-letter list")
+parser.add_argument('--slim-profile', action='store_true',
+                    help="Browser backend: Start from a small snapshot of the profile's session instead of the full Edge profile")
+args = parser.parse_args()
 
 # Set up logging
 # Use a generic path for log file
@@ -34,148 +91,614 @@ logging.getLogger('selenium').setLevel(logging.CRITICAL)
 # Set appropriate logging level for this script
 logging.getLogger().setLevel(logging.INFO)
 
+# Step timings go to ServiceNow_Metrics.jsonl / ServiceNow_Metrics.prom next to the log file
+metrics.configure('assign' if args.backend == 'browser' else 'assign_api', export_dir=log_directory)
+
+# Mapping of assignment groups to implementers
+# This dictionary maps each group to a specific person who should handle their tickets
+implementer_mapping = {
+    'Group A': 'Implementer A',
+    'Group B': 'Implementer B',
+    'Group C': 'Implementer C',
+    # Add more mappings as needed
+}
+
+# Implementer used when an assignment group has no mapping
+default_implementer = 'Default User'
+
+# List column positions used only when the list header cannot be read and no column map is cached for the view
+list_fallback_columns = {'assignment_group': 10, 'assigned_to': 11}
+
+# Persistent cache of implementer name -> sys_user sys_id, so assigned_to can be set without the autocomplete
+reference_cache = ReferenceCache(os.path.join(log_directory, "ServiceNow_Reference_Cache.json"))
+if args.clear_reference_cache:
+    reference_cache.invalidate()
+
+def lookup_user_sys_id(client, name):
+    """
+    Return the sys_user sys_id for an implementer name, using the reference cache.
+    
+    Args:
+        client: TableAPIClient instance
+        name: Implementer display name from implementer_mapping
+        
+    Returns:
+        sys_id string, or None if the name does not match exactly one user
+    """
+    cache_key = f"sys_user:{name}"
+    sys_id = reference_cache.get(cache_key)
+    if sys_id:
+        return sys_id
+    users = client.get_records('sys_user', query=f'name={name}', fields=['sys_id'], limit=2)
+    if len(users) != 1:
+        return None
+    reference_cache.set(cache_key, users[0]['sys_id'])
+    return users[0]['sys_id']
+
+# Encoded filter selecting the incidents that still need an implementer (Table API backend and daemon polls)
+unassigned_filter = 'active=true^assigned_toISEMPTY'
+
+# Incidents already assigned to their mapped implementer are skipped instead of being written again
+plan = WritePlan('assign')
+
+def desired_assignment(record):
+    """Target state of an incident: assigned to the implementer mapped to its assignment group."""
+    return {'assigned_to': implementer_mapping.get(record.get('assignment_group') or '', default_implementer)}
+
+def assign_incident_via_api(client, incident):
+    """PATCH assigned_to of one incident according to implementer_mapping (Table API backend)."""
+    assign_group = incident.get('assignment_group', '')
+    implementer_text = implementer_mapping.get(assign_group, default_implementer)
+    if not plan.changes(incident.get('number'), incident, desired_assignment(incident)):
+        logging.info(f"{incident.get('number')} is already assigned to '{implementer_text}', skipped.")
+        return
+    try:
+        # Use the cached sys_id; fall back to the display name, which
+        # reference fields accept when sysparm_input_display_value is set
+        user_sys_id = lookup_user_sys_id(client, implementer_text)
+        with metrics.span('submit', incident.get('number')):
+            updated = client.patch_record(
+                'incident',
+                incident['sys_id'],
+                {'assigned_to': user_sys_id or implementer_text},
+                input_display_value=not user_sys_id,
+                fields=['number', 'assigned_to'],
+            )
+    except TableAPIError as e:
+        logging.error(f"Failed to assign {incident.get('number')}: {e}")
+        return
+
+    if not updated.get('assigned_to'):
+        logging.warning(f"Implementer '{implementer_text}' could not be resolved for {incident.get('number')}")
+        return
+    plan.applied(incident.get('number'))
+    logging.info(f"Implementer '{implementer_text}' added successfully to '{assign_group}' ({incident.get('number')}).")
+
+def assign_via_table_api():
+    """
+    Assign incidents through the ServiceNow Table API instead of the browser.
+
+    Streams unassigned incidents page by page (keyset paging on sys_id) over one keep-alive
+    connection pool and PATCHes assigned_to using the same implementer_mapping as the browser loop.
+    Up to --api-workers PATCHes run in parallel; every request waits for a slot of the shared
+    throttle, which narrows while the instance answers slowly or with 429, so the batch runs
+    as fast as the instance allows.
+    Credentials are read from SERVICENOW_USERNAME/SERVICENOW_PASSWORD (or SERVICENOW_TOKEN).
+    """
+    workers = max(1, args.api_workers)
+    throttle.configure(max_limit=workers)
+    # Only a few incidents wait in the pool at a time; the rest stay in the page stream
+    queued = threading.BoundedSemaphore(workers * 2)
+
+    def assign(incident):
+        try:
+            assign_incident_via_api(client, incident)
+        except Exception as e:
+            # Errors inside the pool would otherwise disappear with the unread future
+            logging.error(f"Failed to assign {incident.get('number')}: {e}")
+        finally:
+            queued.release()
+
+    with TableAPIClient(args.instance_url, pool_size=workers) as client, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        # Keyset paging: assigned incidents drop out of the query without shifting the pages still to come
+        processed = 0
+        for incident in iterate_records(client, 'incident', query=unassigned_filter,
+                                        fields=['sys_id', 'number', 'assignment_group', 'assigned_to'],
+                                        page_size=args.page_size, display_value='true'):
+            processed += 1
+            queued.acquire()
+            executor.submit(assign, incident)
+    logging.info(f"No unassigned incidents left to process ({processed} processed, "
+                 f"concurrency limit {throttle.status()['limit']})")
+    logging.info(plan.summary())
+
+if args.backend == 'api':
+    assign_via_table_api()
+    if args.daemon:
+        # Poll for incidents changed after the last seen sys_updated_on and assign them as they arrive
+        with TableAPIClient(args.instance_url) as poll_client:
+            watcher = WatermarkPoller(ApiTablePoller(poll_client), 'incident', unassigned_filter)
+            run_daemon(watcher, lambda records: assign_via_table_api(), AdaptiveBackoff(args.poll_min, args.poll_max))
+    metrics.close()
+    exit()
+
 # Path to Edge profile - using a generic path
 # Note: Update this path according to your environment
 edge_profile_path = os.path.join(os.getenv('USERPROFILE', 'C:\\'), 'AppData', 'Local', 'Microsoft', 'Edge', 'User Data')
 
-# Set up Edge options
-edge_options = webdriver.EdgeOptions()
-edge_options.add_argument(f'user-data-dir={edge_profile_path}')
-edge_options.add_argument('profile-directory=Default')
-edge_options.add_argument("--headless=new")  # Run in headless mode
-edge_options.add_argument("--window-size=1920,1080")  # Set a proper screen size
-
-# Initialize WebDriver
-driver = webdriver.Edge(options=edge_options)
-wait = WebDriverWait(driver, 5)  # 5 second timeout for element interactions
+# Snapshot of the session files of that profile, used with --slim-profile
+slim_profile = SlimProfile(edge_profile_path)
 
 # ServiceNow URL
 # Note: Replace with your organization's ServiceNow URL
 login_url = 'https://your_instance.service-now.com/'
-driver.get(login_url)
-
-try:
-    # Look for the login element - replace with a generic selector in your environment
-    # This example uses a data-test-id, but you'll need to update based on your login page structure
-    next_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-test-id='login.button']")))
-    next_button.click()
-except (NoSuchElementException, TimeoutException) as e:
-    logging.error(f"Error during login process: {e}")
-    driver.quit()
-    exit()
 
 # Open the incidents list page
 # Note: Replace with your organization's specific ServiceNow incidents URL
 incidents_url = 'https://your_instance.service-now.com/nav_to.do?uri=incident_list.do'
 
-def find_element_safe(wait, by, value, timeout=10):
+# Base URL of the instance the browser logs into, used to open incident forms directly
+instance_url = '{0.scheme}://{0.netloc}'.format(urlsplit(incidents_url))
+
+session_lease = None
+
+# Daemon poller; pointed at the new browser when the recovery layer replaces a dead one
+watcher = None
+
+def start_browser(refreshed=False):
+    """
+    Start headless Edge with the user profile and log in, or lease a warm session from the session service.
+
+    Args:
+        refreshed: The slim profile snapshot was already taken again after a failed login
+
+    Returns:
+        The WebDriver, or None if the login failed
     """
-    Safe method to find an element with explicit wait.
+    global session_lease
+    if args.session_service:
+        # Attach to a warm, already logged-in browser - no cold start and no login
+        session_lease = lease_session('assign_task_edge')
+        new_driver = session_lease.driver
+    else:
+        # Set up Edge options
+        edge_options = webdriver.EdgeOptions()
+        if args.slim_profile:
+            # Private copy of the session files only - starts fast and does not lock the user profile
+            slim_profile.options(edge_options)
+        else:
+            edge_options.add_argument(f'user-data-dir={edge_profile_path}')
+            edge_options.add_argument('profile-directory=Default')
+        edge_options.add_argument("--headless=new")  # Run in headless mode
+        edge_options.add_argument("--window-size=1920,1080")  # Set a proper screen size
+
+        # Initialize WebDriver
+        if args.lean:
+            lean_options(edge_options)
+        new_driver = processes.start('edge', edge_options)
+        if args.slim_profile:
+            slim_profile.apply_cookies(new_driver)
+
+        try:
+            with metrics.span('login'):
+                new_driver.get(login_url)
+                # Look for the login element - replace with a generic selector in your environment
+                # This example uses a data-test-id, but you'll need to update based on your login page structure
+                next_button = WebDriverWait(new_driver, 5).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-test-id='login.button']")))
+                next_button.click()
+        except (NoSuchElementException, TimeoutException) as e:
+            logging.error(f"Error during login process: {e}")
+            retire_browser(new_driver)
+            if args.slim_profile and not refreshed:
+                # The session in the snapshot has expired - take it again from the user profile and retry once
+                slim_profile.refresh(keep_cookies=False)
+                return start_browser(refreshed=True)
+            return None
+        if args.slim_profile:
+            # Keep the freshest session cookies in the snapshot for the next start
+            slim_profile.capture(new_driver, login_url)
+
+    # Lean profile: fonts, images, avatars and analytics beacons are never downloaded
+    if args.lean:
+        enable_lean_network(new_driver)
+    return new_driver
+
+def retire_browser(old_driver):
+    """Quit a browser this script started and delete the slim profile copy it ran on."""
+    processes.quit(old_driver)
+    slim_profile.remove_clone(old_driver)
+
+def restart_browser():
+    """Replace a browser whose session died (recovery callback) and return the new driver."""
+    global driver, wait
+    try:
+        if session_lease:
+            session_lease.release()
+        else:
+            retire_browser(driver)
+    except Exception:
+        pass  # The old browser is already gone
+    new_driver = start_browser()
+    if not new_driver:
+        raise RuntimeError("Login failed after restarting the browser")
+    driver, wait = new_driver, WebDriverWait(new_driver, 5)
+    if watcher:
+        watcher.poller.driver = driver
+    return driver
+
+# Stop only browsers left behind by crashed runs; the user's Edge and other running automations stay open
+processes.cleanup_orphans()
+
+driver = start_browser()
+if not driver:
+    slim_profile.remove_clones()
+    metrics.close()
+    exit()
+wait = WebDriverWait(driver, 5)  # 5 second timeout for element interactions
+
+# Opens classic UI pages; with --direct-nav the Next Experience shell is skipped when the instance allows it
+navigator = ClassicNavigator(driver, direct=args.direct_nav)
+
+@metrics.timed('record')
+def assign_list_row(row, columns):
+    """
+    Assign the mapped implementer to one incident list row using in-place list editing.
     
     Args:
-        wait: WebDriverWait instance
-        by: Type of selector (By.ID, By.CSS_SELECTOR, etc.)
-        value: Selector value
-        timeout: Maximum wait time in seconds
+        row: Row dict from snapshot_list() (row_id, assignment_group, ...)
+        columns: Field name to column position map from snapshot_list()
         
     Returns:
-        WebElement if found, None otherwise
+        True if the assignment was confirmed, False if a required element was missing
     """
-    try:
-        return WebDriverWait(driver, timeout).until(EC.presence_of_element_located((by, value)))
-    except TimeoutException:
-        return None
+    # Routing is decided from the snapshot - no driver call is needed to read the group
+    assign_group = row['assignment_group'] or ''
+    
+    # Get the appropriate implementer based on the assignment group
+    # Default to a specific user if no mapping exists
+    implementer_text = implementer_mapping.get(assign_group, default_implementer)
+
+    # The snapshot already holds the current implementer - no edit when it is the mapped one
+    if not plan.changes(row['number'], row, desired_assignment(row)):
+        logging.info(f"{row['number']} is already assigned to '{implementer_text}', skipped.")
+        return True
+    
+    # The column comes from the list header (or the map cached for this view), never a guessed position
+    if 'assigned_to' not in columns:
+        logging.warning("The list view has no Assigned to column")
+        return False
 
-def find_shadow_element(host, selector):
+    # Find the implementer cell of this row
+    implementer = locators.find(driver, 'list_cell', row_id=row['row_id'], column=columns['assigned_to'])
+    if not implementer:
+        logging.warning("Implementer element not found")
+        return False
+    
+    # Double-click on the implementer field to activate edit mode
+    ActionChains(driver).double_click(implementer).perform()
+    
+    # Find and fill the implementer input field
+    implementer_add = locators.find(driver, 'list_edit_input', table='incident', field='assigned_to')
+    if not implementer_add:
+        logging.warning("Implementer input field not found")
+        return False
+    
+    # Set the cached sys_id directly; on a cache miss type the name once and remember what it resolves to
+    cache_key = f"sys_user:{implementer_text}"
+    cached_sys_id = reference_cache.get(cache_key)
+    with metrics.span('edit', row['number']):
+        if not (cached_sys_id and set_reference_value(driver, implementer_add, cached_sys_id, implementer_text)):
+            cached_sys_id = None
+            implementer_add.send_keys(implementer_text)
+            wait_for_autocomplete(driver, implementer_add)  # Wait for dropdown suggestions to appear
+            resolved_sys_id = read_reference_value(driver, implementer_add)
+            if resolved_sys_id:
+                reference_cache.set(cache_key, resolved_sys_id)
+    
+    # Click the OK button to confirm the assignment
+    implementer_add_button = locators.find(driver, 'list_edit_ok')
+    if not implementer_add_button:
+        logging.warning("OK button not found for implementer assignment")
+        return False
+    
+    # Complete the assignment and wait for the list edit to be saved
+    with metrics.span('submit', row['number']) as span:
+        implementer_add_button.click()
+        if not wait_for_cell_editor_closed(driver):
+            span.fail()
+            logging.warning(f"Cell editor did not close for row {row['row_id']}")
+    
+    # A cached sys_id that the instance did not accept is dropped so the next row uses the autocomplete again
+    if cached_sys_id:
+        cell_text = driver.execute_script("var cell = document.querySelector(arguments[0]); return cell ? cell.textContent.trim() : '';",
+                                          f"tr[id='{row['row_id']}'] > *:nth-child({columns['assigned_to']})")
+        if cell_text != implementer_text:
+            logging.warning(f"Cached sys_id for '{implementer_text}' was not accepted, invalidating it")
+            reference_cache.invalidate(cache_key)
+            return False
+    plan.applied(row['number'])
+    logging.info(f"Implementer '{implementer_text}' added successfully to '{assign_group}' ({row['number']}).")
+    return True
+
+def assign_visible_rows(processed_rows):
     """
-    Find element inside a shadow DOM.
+    Assign every incident row on the currently loaded list page (batch mode).
+    
+    Rows are edited in place one after another; the list is only reloaded by the
+    caller once every row on the page has been handled.
     
     Args:
-        host: Shadow DOM host element
-        selector: CSS selector for element within shadow DOM
+        processed_rows: Set of row ids already handled in this pass (updated in place)
         
     Returns:
-        WebElement if found, None otherwise
+        Number of rows on the page that had not been handled before
+    """
+    # Read every row of the page in one round-trip
+    columns, rows = snapshot_list(driver, fallback_columns=list_fallback_columns)
+    pending = [row for row in rows if row['row_id'] not in processed_rows and row['number'] not in recovery.dead_letter]
+
+    for row in pending:
+        processed_rows.add(row['row_id'])
+        if not recovery.run(row['number'], lambda: assign_list_row(row, columns), retry=lambda: reassign_row(row)):
+            logging.warning(f"Skipping row {row['row_id']}")
+            # Close a cell editor that may still be open before moving to the next row
+            try:
+                ActionChains(driver).send_keys(Keys.ESCAPE).perform()
+            except Exception:
+                pass  # The browser may have been replaced; nothing is open in a fresh page
+            if recovery.exhausted:
+                break
+            continue
+
+    logging.info(f"Processed {len(pending)} rows on the current list page")
+    return len(pending)
+
+def reassign_row(row):
+    """
+    Retry for a row whose assignment failed: reload the list and assign the row again.
+
+    Returns:
+        True if the row was assigned or is no longer on the list, False otherwise
+    """
+    if not navigator.open(incidents_url):
+        return False
+    columns, rows = snapshot_list(driver, fallback_columns=list_fallback_columns)
+    current = next((r for r in rows if r['sys_id'] == row['sys_id']), None)
+    if current is None:
+        logging.info(f"{row['number']} is no longer on the list")
+        return True
+    return assign_list_row(current, columns)
+
+# Row ids handled so far in the current batch mode pass (rows that could not be assigned are not
+# retried within the pass; a later daemon pass tries them again unless they were dead-lettered)
+processed_rows = set()
+
+# Rows that keep failing are retried with backoff and then parked in the dead-letter list
+dead_letter_path = os.path.join(log_directory, "ServiceNow_DeadLetter.jsonl")
+recovery = RecordRecovery(DeadLetterList(dead_letter_path, 'assign'), navigator,
+                          restart_driver=restart_browser, retries=args.retries)
+
+# Swaps in a fresh browser between incidents once this one has grown past the memory watermark;
+# with --slim-profile the replacement is started and logged in ahead of time
+recycler = BrowserRecycler(start_browser, quit_browser=retire_browser, standby=args.slim_profile,
+                           enabled=not args.session_service)
+
+def recycle_browser():
+    """Replace the browser between records once it crossed the memory or renderer watermark."""
+    global driver, wait
+    new_driver = recycler.recycle(driver)
+    if new_driver is not driver:
+        driver, wait = new_driver, WebDriverWait(new_driver, 5)
+        navigator.reset(new_driver)
+        if watcher:
+            watcher.poller.driver = driver
+
+def mass_assign_page(page_url, columns, rows):
+    """
+    Assign the incidents of one list page with one "Update Selected" save per target implementer.
+
+    Rows are grouped by the implementer they need; each group is ticked and saved together.
+    The page is then read again, and rows the mass update did not assign (not ticked, save
+    rejected, implementer not resolved) are edited one by one as in batch mode.
+
+    Args:
+        page_url: URL of the list page (reloaded between the groups)
+        columns: Field name to column position map from snapshot_list()
+        rows: Row dicts of the page from snapshot_list()
+    """
+    pending = [row for row in rows if row['number'] not in recovery.dead_letter]
+    saved = set()
+    on_page = True
+    for changes, group in group_by_target(plan, pending, lambda row: row['number'], desired_assignment):
+        implementer_text = changes['assigned_to']
+        try:
+            if not on_page and not navigator.open(page_url):
+                logging.warning("Incidents list could not be opened for the next group")
+                break
+            on_page = False
+            saved.update(update_selected(driver, 'incident', [row['sys_id'] for row in group],
+                                         lambda d: set_assignee(d, implementer_text, reference_cache),
+                                         label=implementer_text))
+        except Exception as e:
+            logging.error(f"Update Selected for '{implementer_text}' failed: {e}")
+        logging.info(f"Update Selected: {len(group)} incidents to '{implementer_text}'")
+
+    if on_page:
+        return
+    # Confirm the saves from the reloaded page and fall back to list editing for what is left
+    if not navigator.open(page_url):
+        logging.warning("Incidents list could not be reloaded after the mass update")
+        return
+    columns, rows = snapshot_list(driver, fallback_columns=list_fallback_columns)
+    for row in rows:
+        if row['number'] in recovery.dead_letter:
+            continue
+        if not plan.changes(row['number'], row, desired_assignment(row)):
+            if row['sys_id'] in saved:
+                plan.applied(row['number'])
+            continue
+        logging.warning(f"{row['number']} was not assigned by Update Selected, editing the row")
+        recovery.run(row['number'], lambda: assign_list_row(row, columns), retry=lambda: reassign_row(row))
+        if recovery.exhausted:
+            return
+
+def run_mass_update_pass():
+    """
+    Assign incidents page by page with "Update Selected" list actions (--mass-update).
+
+    Returns:
+        True if the list was worked through, False if the pass stopped on an error
     """
     try:
-        shadow_root = driver.execute_script("return arguments[0].shadowRoot", host)
-        return shadow_root.find_element(By.CSS_SELECTOR, selector)
+        for page_url, columns, rows in iterate_list_pages(navigator, incidents_url,
+                                                          fallback_columns=list_fallback_columns):
+            mass_assign_page(page_url, columns, rows)
+            recycle_browser()
+            if recovery.exhausted:
+                logging.error("Too many incidents failed in a row, stopping")
+                return False
     except Exception as e:
-        return None
+        logging.error(f"Unexpected error: {e}")
+        return False
+    logging.info("No incidents left on the list that need an implementer")
+    return True
 
-while True:
-    # Navigate to the incidents page
-    driver.get(incidents_url)
+# Local copy of the incident fields, synced with only the records changed since the last pass (--mirror)
+mirror = RecordMirror() if args.mirror else None
 
-    try:
-        # Find shadow DOM host element (ServiceNow uses shadow DOM extensively)
-        shadow_host = find_element_safe(wait, By.XPATH, "//*[starts-with(name(), 'macroponent')]")
-        if not shadow_host:
-            logging.warning("Shadow host element not found, breaking loop")
-            break
-
-        # Find iframe within shadow DOM
-        iframe = find_shadow_element(shadow_host, 'iframe')
-        if not iframe:
-            logging.warning("Iframe not found, retrying page load")
-            continue  # Reload page if iframe is missing
-        
-        # Switch to the iframe containing the incident list
-        driver.switch_to.frame(iframe)
-
-        # Find the implementer and assignment group elements
-        implementer = find_element_safe(wait, By.CSS_SELECTOR, "tr[id^='row_incident_'] > *:nth-child(11)")
-        assign_group_element = find_element_safe(wait, By.CSS_SELECTOR, "tr[id^='row_incident_'] > *:nth-child(10)")
-        if not implementer or not assign_group_element:
-            logging.warning("Implementer or assignment group element not found")
-            break
-        
-        # Double-click on the implementer field to activate edit mode
-        ActionChains(driver).double_click(implementer).perform()
-        
-        # Get the assignment group text and map to the appropriate implementer
-        assign_group = assign_group_element.text
-        
-        # Mapping of assignment groups to implementers
-        # This dictionary maps each group to a specific person who should handle their tickets
-        implementer_mapping = {
-            'Group A': 'Implementer A',
-            'Group B': 'Implementer B',
-            'Group C': 'Implementer C',
-            # Add more mappings as needed
-        }
-        
-        # Get the appropriate implementer based on the assignment group
-        # Default to a specific user if no mapping exists
-        implementer_text = implementer_mapping.get(assign_group, 'Default User')
-        
-        # Find and fill the implementer input field
-        implementer_add = find_element_safe(wait, By.CSS_SELECTOR, "input#sys_display\\.LIST_EDIT_incident\\.assigned_to", timeout=3)
-        if not implementer_add:
-            logging.warning("Implementer input field not found")
-            break
-        
-        # Enter the implementer name
-        implementer_add.send_keys(implementer_text)
-        time.sleep(2)  # Allow time for dropdown suggestions to appear
-        
-        # Click the OK button to confirm the assignment
-        implementer_add_button = find_element_safe(wait, By.CSS_SELECTOR, "a#cell_edit_ok", timeout=5)
-        if not implementer_add_button:
-            logging.warning("OK button not found for implementer assignment")
-            break
-        
-        # Complete the assignment
-        implementer_add_button.click()
-        logging.info(f"Implementer '{implementer_text}' added successfully to '{assign_group}'.")
-        
-        # Wait before processing the next entry
-        time.sleep(3)
+def assign_incident_form(record):
+    """
+    Open one incident form and assign it to the implementer mapped to its group (--mirror).
+
+    An incident that already has an assignee on the form (e.g. assigned by hand after the
+    last sync) is left alone; assigned_to is only ever filled, never overwritten.
+
+    Returns:
+        True once the form was saved or the incident turned out to be assigned already,
+        False if the form or a required element did not load
+    """
+    implementer_text = desired_assignment(record)['assigned_to']
+    if not navigator.open(f"{instance_url}/incident.do?sys_id={record['sys_id']}"):
+        logging.warning(f"{record['number']} could not be opened")
+        return False
+    wait_for_form_load(driver)
+    current = driver.execute_script("return typeof g_form !== 'undefined' ? g_form.getValue('assigned_to') : null;")
+    if current is None:
+        logging.warning(f"{record['number']} form did not expose assigned_to")
+        return False
+    if current:
+        logging.info(f"{record['number']} is already assigned, skipped")
+        return True
+    if not (set_assignee(driver, implementer_text, reference_cache) and submit_form(driver)):
+        discard_form_changes(driver)
+        return False
+    mirror.mark('incident', record['sys_id'], 'assign', {'assigned_to': implementer_text})
+    plan.applied(record['number'])
+    logging.info(f"Assigned {record['number']} to '{implementer_text}'")
+    return True
+
+def run_mirror_pass():
+    """
+    Assign incidents chosen by a local query on the mirror (--mirror).
+
+    Only the incidents changed since the last pass are read from the instance; the routing
+    decision is made on the mirror and the browser opens just the forms that need a write.
 
+    Returns:
+        True if every incident was worked through, False if the pass stopped on an error
+    """
+    try:
+        mirror.sync_browser(navigator, incidents_url)
+        # Same selection as unassigned_filter: incidents someone assigned (by hand or earlier) are never touched
+        for record in mirror.records('incident', active=True, assigned_to=''):
+            if record['number'] in recovery.dead_letter or not plan.changes(record['number'], record,
+                                                                           desired_assignment(record)):
+                continue
+            recycle_browser()
+            recovery.run(record['number'], lambda: assign_incident_form(record))
+            if recovery.exhausted:
+                logging.error("Too many incidents failed in a row, stopping")
+                return False
     except Exception as e:
         logging.error(f"Unexpected error: {e}")
-        break
+        return False
+    logging.info("No incidents left in the mirror that need an implementer")
+    return True
+
+def run_assignment_pass():
+    """
+    Assign incidents from the list until none are left.
+
+    Returns:
+        True if the list was worked through, False if the pass stopped on an error
+    """
+    if mirror:
+        return run_mirror_pass()
+    if args.mass_update:
+        return run_mass_update_pass()
+    processed_rows.clear()
+    while True:
+        try:
+            recycle_browser()
+            # Open the incidents list (directly, or through the shell iframe when required)
+            if not navigator.open(incidents_url):
+                logging.warning("Incidents list could not be opened, breaking loop")
+                return False
+
+            if args.batch:
+                # Assign every row on this page, reload only when the page is used up
+                if not assign_visible_rows(processed_rows):
+                    logging.info("No unprocessed incidents left on the list")
+                    return True
+                if recovery.exhausted:
+                    logging.error("Too many incidents failed in a row, stopping")
+                    return False
+                continue
+
+            # Assign the first row of the list that has not been given up on and is not assigned correctly yet
+            columns, rows = snapshot_list(driver, fallback_columns=list_fallback_columns)
+            rows = [row for row in rows if row['number'] not in recovery.dead_letter
+                    and plan.changes(row['number'], row, desired_assignment(row))]
+            if not rows:
+                logging.warning("No incidents found on the list")
+                return True
+            row = rows[0]
+            recovery.run(row['number'], lambda: assign_list_row(row, columns), retry=lambda: reassign_row(row))
+            if recovery.exhausted:
+                logging.error("Too many incidents failed in a row, stopping")
+                return False
+
+        except Exception as e:
+            logging.error(f"Unexpected error: {e}")
+            return False
+
+def handle_new_incidents(records):
+    """Daemon: work through the list once the poll has reported new unassigned incidents."""
+    logging.info(f"{len(records)} new unassigned incidents: {', '.join(r['sys_id'] for r in records)}")
+    if not run_assignment_pass():
+        logging.warning("Assignment pass stopped early, waiting for the next poll")
+
+completed = run_assignment_pass()
+
+if args.daemon and completed:
+    # Keep the browser open and ask the Table API from inside the page whether anything new arrived;
+    # the list is only reloaded when there is work
+    watcher = WatermarkPoller(BrowserTablePoller(driver), 'incident', unassigned_filter)
+    run_daemon(watcher, handle_new_incidents, AdaptiveBackoff(args.poll_min, args.poll_max))
+
+logging.info(plan.summary())
+if recovery.dead_letter:
+    logging.warning(f"{len(recovery.dead_letter)} incidents moved to {dead_letter_path}")
 
-# Close the browser at the end
+# Close the browser at the end (a leased browser stays warm in the session service)
 logging.info("Closing the browser due to error or completion.")
-driver.quit()
\ No newline at end of file
+recycler.close()
+if mirror:
+    mirror.close()
+if session_lease:
+    session_lease.release()
+else:
+    processes.quit(driver)
+slim_profile.remove_clones()
+metrics.close()
\ No newline at end of file
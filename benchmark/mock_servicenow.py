@@ -0,0 +1,760 @@
+"""
+Mock ServiceNow Instance
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Local HTTP server that reproduces the page structures the automation
+scripts depend on, so workflows can be measured without touching production:
+- nav_to.do: Next Experience shell with a macroponent shadow host wrapping an iframe
+- incident_list.do / label_list.do: classic lists with tr[id^='row_<table>_'] rows,
+  a.linked.formlink links and in-place list editing of assigned_to (#cell_edit_ok)
+- incident.do: form with select#incident.state, the Resolution Information tab,
+  incident.close_code, incident.close_notes, activity-stream-work_notes-textarea and sysverb_update
+- label.do: tag form with label.viewable_by, group_list/user_list and sysverb_update
+- /api/now/table/<table>: Table API for incident, label and sys_user records (sysparm_display_value
+  true/all, active derived from the state), answering 429 with
+  Retry-After when more API requests than --api-limit are in flight (rate limit rule)
+- /api/now/v1/batch: Batch API running PATCH sub-requests against the Table API; sub-requests
+  beyond --batch-limit come back as unserviced_requests like on a busy instance
+License: MIT
+
+Run standalone:
+    python benchmark/mock_servicenow.py --port 8080 --records 200 --latency-ms 50
+    python benchmark/mock_servicenow.py --port 8080 --latency-ms 50 --api-limit 3
+"""
+
+import argparse
+import base64
+import html
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, quote, urlencode
+
+STATES = ['New', 'In Progress', 'On Hold', 'Resolved', 'Closed']
+GROUPS = ['Group A', 'Group B', 'Group C', 'Group D']
+USERS = ['Implementer A', 'Implementer B', 'Implementer C', 'Default User']
+
+# Columns of the incident list; assignment_group and assigned_to are the 10th and 11th cells like on the real instance
+INCIDENT_COLUMNS = ['number', 'opened_at', 'short_description', 'caller_id', 'priority', 'state',
+                    'category', 'assignment_group', 'assigned_to', 'sys_updated_on']
+LABEL_COLUMNS = ['name', 'viewable_by', 'group_list', 'sys_updated_on']
+
+# Rows per list page; further pages are reached with sysparm_first_row like on the real instance
+LIST_PAGE_SIZE = 50
+
+# Fonts and images real pages load but no script reads (what the lean profile blocks)
+PAGE_ASSETS = ('<style>@font-face{font-family:"Source Sans";src:url("/mock/asset/source-sans.woff2")}'
+               'body{font-family:"Source Sans",sans-serif}</style>'
+               '<link rel="icon" href="/mock/asset/favicon.ico">')
+ASSET_SIZE = 64 * 1024
+
+# Client-side stand-in for the parts of the classic UI the scripts rely on:
+# Ajax.activeRequestCount, g_form, tabs, reference autocomplete and list cell editing
+GLIDE_JS = r"""
+window.Ajax = {activeRequestCount: 0};
+function mockRequest(url, body) {
+    Ajax.activeRequestCount++;
+    return fetch(url, {method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(body)})
+        .then(function (r) { return r.json(); })
+        .finally(function () { Ajax.activeRequestCount--; });
+}
+function mockUsers() { return window.MOCK_USERS || []; }
+
+function attachAutocomplete(display, hidden) {
+    var timer = null;
+    display.addEventListener('input', function () {
+        clearTimeout(timer);
+        Ajax.activeRequestCount++;
+        timer = setTimeout(function () {
+            Ajax.activeRequestCount--;
+            var old = document.querySelector('.ac_dropdown');
+            if (old) old.remove();
+            var text = display.value.toLowerCase();
+            var matches = mockUsers().filter(function (u) { return u.name.toLowerCase().indexOf(text) === 0; });
+            var dropdown = document.createElement('div');
+            dropdown.className = 'ac_dropdown';
+            dropdown.id = 'AC.' + hidden.id;
+            matches.forEach(function (u) {
+                var row = document.createElement('div');
+                row.textContent = u.name;
+                dropdown.appendChild(row);
+            });
+            document.body.appendChild(dropdown);
+            display.setAttribute('aria-expanded', matches.length ? 'true' : 'false');
+            hidden.value = matches.length === 1 ? matches[0].sys_id : '';
+        }, window.MOCK_AC_DELAY || 150);
+    });
+}
+
+document.addEventListener('dblclick', function (event) {
+    var cell = event.target.closest('td.list_edit_cell');
+    if (!cell || document.getElementById('cell_edit_window')) return;
+    var row = cell.parentNode, table = row.id.split('_')[1], field = cell.getAttribute('data-field');
+    var editor = document.createElement('div');
+    editor.id = 'cell_edit_window';
+    editor.innerHTML = '<input type="hidden" id="LIST_EDIT_' + table + '.' + field + '">' +
+        '<input type="text" id="sys_display.LIST_EDIT_' + table + '.' + field + '">' +
+        '<a href="#" id="cell_edit_ok">OK</a> <a href="#" id="cell_edit_cancel">Cancel</a>';
+    document.body.appendChild(editor);
+    var hidden = editor.querySelector('input[type=hidden]'), display = editor.querySelector('input[type=text]');
+    attachAutocomplete(display, hidden);
+    function close() {
+        editor.remove();
+        var dropdown = document.querySelector('.ac_dropdown');
+        if (dropdown) dropdown.remove();
+    }
+    document.getElementById('cell_edit_cancel').onclick = function (e) { e.preventDefault(); close(); };
+    document.getElementById('cell_edit_ok').onclick = function (e) {
+        e.preventDefault();
+        mockRequest('/mock/list_edit', {table: table, sys_id: row.getAttribute('sys_id'), field: field,
+                                        value: hidden.value, display: display.value})
+            .then(function (result) { cell.textContent = result.display || ''; close(); });
+    };
+    document.addEventListener('keydown', function (e) { if (e.key === 'Escape') close(); }, {once: true});
+    display.focus();
+});
+
+window.g_form = {
+    modified: false,
+    table: document.body ? document.body.getAttribute('data-table') : null,
+    setValue: function (name, value, displayValue) {
+        var table = document.body.getAttribute('data-table');
+        if (name === 'work_notes') {
+            document.getElementById('activity-stream-work_notes-textarea').value = value;
+        } else {
+            var field = document.getElementById(table + '.' + name);
+            if (field) field.value = value;
+            var display = document.getElementById('sys_display.' + table + '.' + name);
+            if (display) display.value = displayValue || value;
+        }
+        this.modified = true;
+    }
+};
+
+document.addEventListener('DOMContentLoaded', function () {
+    g_form.table = document.body.getAttribute('data-table');
+    document.querySelectorAll('span.tabs2_tab').forEach(function (tab) {
+        tab.addEventListener('click', function () {
+            document.querySelectorAll('div.tab_section').forEach(function (s) { s.style.display = 'none'; });
+            document.getElementById(tab.getAttribute('data-section')).style.display = 'block';
+        });
+    });
+    document.querySelectorAll('input[id^="sys_display."]').forEach(function (display) {
+        var hidden = document.getElementById(display.id.replace(/^sys_display\./, ''));
+        if (hidden) attachAutocomplete(display, hidden);
+    });
+    var state = document.getElementById('incident.state');
+    if (state) state.addEventListener('change', function () {
+        // UI policy round-trip that makes the resolution fields mandatory
+        Ajax.activeRequestCount++;
+        setTimeout(function () { Ajax.activeRequestCount--; }, window.MOCK_POLICY_DELAY || 100);
+    });
+    var actions = document.querySelector('select[id^="list_action_"]');
+    if (actions) actions.addEventListener('change', function () {
+        // "Update Selected" opens the multiple-record form for the ticked rows
+        if (actions.value !== 'update_selected') return;
+        var table = actions.id.substring('list_action_'.length);
+        var ids = Array.prototype.map.call(document.querySelectorAll('input.list_checkbox:checked'), function (box) {
+            return box.id.substring(('check_' + table + '_').length);
+        });
+        if (!ids.length) { actions.value = ''; return; }
+        location.href = table + '.do?sys_id=-1&sysparm_multiple=true&sysparm_checked_items=' + ids.join(',');
+    });
+    var post = document.querySelector('button.activity-submit');
+    if (post) post.addEventListener('click', function () {
+        var textarea = document.getElementById('activity-stream-work_notes-textarea');
+        mockRequest('/mock/work_note', {sys_id: document.body.getAttribute('data-sys-id'), text: textarea.value})
+            .then(function () { textarea.value = ''; });
+    });
+});
+"""
+
+
+class MockInstance:
+    """In-memory incident, label and user records served by the mock server."""
+
+    def __init__(self, records=100, latency_ms=0, force_shell=False, api_limit=0, batch_limit=0):
+        self.record_count = records
+        self.latency = latency_ms / 1000.0
+        self.force_shell = force_shell
+        self.api_limit = api_limit
+        self.batch_limit = batch_limit
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.batch_requests = 0
+        self.api_in_flight = 0
+        self.throttled = 0
+        self.reset()
+
+    def reset(self):
+        """Recreate the seed data."""
+        with self.lock:
+            self.users = {f'user{i:04d}': {'sys_id': f'user{i:04d}', 'name': name,
+                                           'user_name': name.lower().replace(' ', '.')}
+                          for i, name in enumerate(USERS)}
+            self.incidents = {}
+            self.labels = {}
+            for i in range(self.record_count):
+                sys_id = uuid.UUID(int=i + 1).hex
+                self.incidents[sys_id] = {
+                    'sys_id': sys_id,
+                    'number': f'INC{i + 1:07d}',
+                    'opened_at': '2026-01-01 08:00:00',
+                    'short_description': f'Mock incident {i + 1}',
+                    'caller_id': 'Mock Caller',
+                    'priority': '4 - Low',
+                    'state': 'On Hold' if i % 2 else 'In Progress',
+                    'category': 'Inquiry / Help',
+                    'assignment_group': GROUPS[i % len(GROUPS)],
+                    'assigned_to': '',
+                    'sys_updated_on': f'2026-01-01 08:{i // 60 % 60:02d}:{i % 60:02d}',
+                    'close_code': '',
+                    'close_notes': '',
+                    'work_notes': [],
+                }
+                label_id = uuid.UUID(int=100000 + i).hex
+                self.labels[label_id] = {
+                    'sys_id': label_id,
+                    'name': f'Tag {i + 1}',
+                    'viewable_by': 'Me',
+                    'group_list': '',
+                    'user_list': '',
+                    'sys_updated_on': '2026-01-01 08:00:00',
+                }
+
+    def user_name(self, value):
+        """Resolve a sys_user sys_id (or an already displayed name) to a name."""
+        user = self.users.get(value)
+        return user['name'] if user else value
+
+    def user_by_name(self, name):
+        for user in self.users.values():
+            if user['name'] == name:
+                return user
+        return None
+
+    def touch(self, record):
+        record['sys_updated_on'] = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+    def sort(self, records, query):
+        """Apply the first ORDERBY/ORDERBYDESC term of an encoded query (sys_id breaks ties)."""
+        for term in (query or '').split('^'):
+            if term.startswith('ORDERBYDESC'):
+                records.sort(key=lambda r: (str(r.get(term[len('ORDERBYDESC'):], '')), r['sys_id']), reverse=True)
+                break
+            if term.startswith('ORDERBY'):
+                records.sort(key=lambda r: (str(r.get(term[len('ORDERBY'):], '')), r['sys_id']))
+                break
+        return records
+
+    def matches(self, record, query):
+        """Evaluate the small subset of encoded queries the scripts use."""
+        for term in filter(None, (query or '').split('^')):
+            if term.startswith('ORDERBY'):
+                continue
+            if term == 'active=true':
+                if record.get('state') in ('Resolved', 'Closed'):
+                    return False
+            elif term.endswith('ISEMPTY'):
+                if record.get(term[:-len('ISEMPTY')]):
+                    return False
+            elif '>=' in term:
+                field, value = term.split('>=', 1)
+                if str(record.get(field, '')) < value.strip("'"):
+                    return False
+            elif '>' in term:
+                field, value = term.split('>', 1)
+                if str(record.get(field, '')) <= value.strip("'"):
+                    return False
+            elif '=' in term:
+                field, value = term.split('=', 1)
+                if field in record and str(record[field]) != value and not value.startswith('javascript:'):
+                    return False
+        return True
+
+
+def render_list(instance, table, query, first_row=1):
+    """Classic UI list page for incident or label records."""
+    records = instance.incidents if table == 'incident' else instance.labels
+    columns = INCIDENT_COLUMNS if table == 'incident' else LABEL_COLUMNS
+    editable = {'assigned_to'} if table == 'incident' else set()
+    with instance.lock:
+        matched = instance.sort([dict(r) for r in records.values() if instance.matches(r, query)], query)
+    # Past the end the instance shows the last page again
+    start = min(max(first_row - 1, 0), max(len(matched) - 1, 0) // LIST_PAGE_SIZE * LIST_PAGE_SIZE)
+    rows = matched[start:start + LIST_PAGE_SIZE]
+
+    header = '<th class="col-control"><input type="checkbox" id="allcheck_' + table + '"></th><th class="col-small"></th>'
+    header += ''.join(f'<th name="{c}" glide_type="string">{c.replace("_", " ").title()}</th>' for c in columns)
+    body = []
+    for row in rows:
+        cells = [f'<td class="list_decoration_cell"><input type="checkbox" class="list_checkbox" id="check_{table}_{row["sys_id"]}"></td>',
+                 '<td class="list_decoration_cell"><a class="list_popup" href="#">i</a></td>']
+        for column in columns:
+            value = row.get(column, '')
+            if column == 'assigned_to':
+                value = instance.user_name(value)
+            value = html.escape(str(value))
+            if column in ('number', 'name'):
+                cells.append(f'<td class="vt"><a class="linked formlink" href="{table}.do?sys_id={row["sys_id"]}">{value}</a></td>')
+            elif column in editable:
+                cells.append(f'<td class="vt list_edit_cell" data-field="{column}">{value}</td>')
+            else:
+                cells.append(f'<td class="vt">{value}</td>')
+        body.append(f'<tr id="row_{table}_{row["sys_id"]}" sys_id="{row["sys_id"]}" class="list_row">{"".join(cells)}</tr>')
+    if not rows:
+        body.append(f'<tr class="list2_no_records"><td colspan="{len(columns) + 2}">No records to display</td></tr>')
+    return f"""<!DOCTYPE html><html><head><title>{table} list</title>
+<script>window.MOCK_USERS = {json.dumps(list(instance.users.values()))};</script>
+<script src="/mock/glide.js"></script>{PAGE_ASSETS}</head>
+<body data-table="{table}">
+<form id="{table}.do" action="sys_action.do" method="post">
+<select id="list_action_{table}"><option value="">-- Actions on selected rows --</option><option value="update_selected">Update Selected</option></select>
+</form>
+<table class="list2_table" id="{table}_table"><thead><tr class="list_header">{header}</tr></thead>
+<tbody class="list2_body">{''.join(body)}</tbody></table></body></html>"""
+
+
+def form_query(record, checked_items):
+    """Query string a form posts to: the record, or the records ticked for "Update Selected"."""
+    if checked_items:
+        return urlencode({'sys_id': '-1', 'sysparm_multiple': 'true', 'sysparm_checked_items': ','.join(checked_items)})
+    return urlencode({'sys_id': record['sys_id']})
+
+
+def render_incident_form(instance, record, checked_items=None):
+    """Classic UI incident form; with checked_items the empty "Update Selected" form for those records."""
+    state_options = ('<option value=""></option>' if checked_items else '') + ''.join(
+        f'<option value="{i + 1}"{" selected" if s == record["state"] else ""}>{s}</option>' for i, s in enumerate(STATES))
+    close_codes = ''.join(f'<option{" selected" if c == record["close_code"] else ""}>{c}</option>'
+                          for c in ['', 'Solution provided', 'Workaround provided', 'Not Solved'])
+    assignee = html.escape(instance.user_name(record['assigned_to']))
+    notes = ''.join(f'<li class="h-card">{html.escape(n)}</li>' for n in record['work_notes'])
+    return f"""<!DOCTYPE html><html><head><title>{record['number']}</title>
+<script>window.MOCK_USERS = {json.dumps(list(instance.users.values()))};</script>
+<script src="/mock/glide.js"></script>{PAGE_ASSETS}</head>
+<body data-table="incident" data-sys-id="{record['sys_id']}">
+<form id="incident.do" name="incident.do" method="post" action="incident.do?{form_query(record, checked_items)}">
+<input type="text" id="sys_readonly.incident.number" value="{record['number']}" readonly>
+<select id="incident.state" name="incident.state">{state_options}</select>
+<input type="hidden" id="incident.assigned_to" name="incident.assigned_to" value="{html.escape(record['assigned_to'])}">
+<input type="text" id="sys_display.incident.assigned_to" name="sys_display.incident.assigned_to" value="{assignee}">
+<img class="avatar" alt="" src="/mock/asset/avatar.png?user={html.escape(record['assigned_to'])}">
+<input type="hidden" id="incident.work_notes" name="incident.work_notes">
+<div class="tabs2_strip">
+  <span class="tab_header"><span class="tabs2_tab" data-section="section_notes">Notes</span></span>
+  <span class="tab_header"><span class="tabs2_tab" data-section="section_resolution">Resolution Information</span></span>
+</div>
+<div class="tab_section" id="section_notes">
+  <textarea id="activity-stream-work_notes-textarea" name="work_notes"></textarea>
+  <button type="button" class="btn btn-default activity-submit">Post</button>
+  <ul class="activities">{notes}</ul>
+</div>
+<div class="tab_section" id="section_resolution" style="display:none">
+  <select id="incident.close_code" name="incident.close_code">{close_codes}</select>
+  <textarea id="incident.close_notes" name="incident.close_notes">{html.escape(record['close_notes'])}</textarea>
+</div>
+<button type="submit" id="sysverb_update" name="sysverb_update" class="form_action_button">Update</button>
+</form></body></html>"""
+
+
+def render_label_form(instance, record, checked_items=None):
+    """Classic UI tag (label) form; with checked_items the empty "Update Selected" form for those records."""
+    viewable = ('<option value=""></option>' if checked_items else '') + ''.join(f'<option{" selected" if v == record["viewable_by"] else ""}>{v}</option>'
+                       for v in ['Me', 'Everyone', 'Groups and Users'])
+    return f"""<!DOCTYPE html><html><head><title>{html.escape(record['name'])}</title>
+<script>window.MOCK_USERS = {json.dumps([{'sys_id': g, 'name': g} for g in ['DD', 'Service Desk']])};</script>
+<script src="/mock/glide.js"></script>{PAGE_ASSETS}</head>
+<body data-table="label" data-sys-id="{record['sys_id']}">
+<form id="label.do" name="label.do" method="post" action="label.do?{form_query(record, checked_items)}">
+<input type="text" id="label.name" name="label.name" value="{html.escape(record['name'])}">
+<select id="label.viewable_by" name="label.viewable_by">{viewable}</select>
+<input type="hidden" id="label.group_list" name="label.group_list" value="{html.escape(record['group_list'])}">
+<input type="text" id="sys_display.label.group_list" name="sys_display.label.group_list" value="">
+<input type="hidden" id="label.user_list" name="label.user_list" value="{html.escape(record['user_list'])}">
+<input type="text" id="sys_display.label.user_list" name="sys_display.label.user_list" value="">
+<button type="submit" id="sysverb_update" name="sysverb_update" class="form_action_button">Update</button>
+</form></body></html>"""
+
+
+def render_shell(target):
+    """Next Experience shell: a macroponent custom element whose open shadow root holds the classic iframe."""
+    return f"""<!DOCTYPE html><html><head><title>ServiceNow</title></head><body>
+<macroponent-f51912f4c700201072b211d4d8c26010></macroponent-f51912f4c700201072b211d4d8c26010>
+<script>
+customElements.define('macroponent-f51912f4c700201072b211d4d8c26010', class extends HTMLElement {{
+    connectedCallback() {{
+        var root = this.attachShadow({{mode: 'open'}});
+        root.innerHTML = '<iframe id="gsft_main" name="gsft_main" style="width:100%;height:900px" src="{html.escape('/' + target.lstrip('/'), quote=True)}"></iframe>';
+    }}
+}});
+</script></body></html>"""
+
+
+LOGIN_PAGE = """<!DOCTYPE html><html><head><title>Log in</title></head><body>
+<button data-test-id="login.button" onclick="location.href='/nav_to.do?uri=home.do'">Log in</button>
+</body></html>"""
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """Serves the fixture pages, form posts, mock AJAX endpoints and the Table API."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY every keep-alive response waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def instance(self):
+        return self.server.instance
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json(self, status, payload):
+        self._send(status, json.dumps(payload), 'application/json')
+
+    def _redirect(self, location):
+        self._send(302, '', headers={'Location': location})
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _simulate_latency(self):
+        with self.instance.lock:
+            self.instance.requests += 1
+        if self.instance.latency:
+            time.sleep(self.instance.latency)
+
+    def _api_admit(self):
+        """Take an API slot, or answer 429 like a rate limit rule when --api-limit slots are busy."""
+        with self.instance.lock:
+            if self.instance.api_limit and self.instance.api_in_flight >= self.instance.api_limit:
+                self.instance.throttled += 1
+                rejected = True
+            else:
+                self.instance.api_in_flight += 1
+                rejected = False
+        if rejected:
+            self._read_body()  # Drain the request body so the keep-alive connection stays usable
+            self._send(429, json.dumps({'error': {'message': 'Rate limit exceeded'}}), 'application/json',
+                       {'Retry-After': '1'})
+        return not rejected
+
+    def _api_done(self):
+        with self.instance.lock:
+            self.instance.api_in_flight -= 1
+
+    def do_GET(self):
+        if self.path.startswith('/api/'):
+            if not self._api_admit():
+                return
+            try:
+                return self._do_get()
+            finally:
+                self._api_done()
+        return self._do_get()
+
+    def _do_get(self):
+        self._simulate_latency()
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        path = parts.path
+        top_level = self.headers.get('Sec-Fetch-Dest') == 'document'
+
+        if path == '/mock/glide.js':
+            return self._send(200, GLIDE_JS, 'application/javascript')
+        if path.startswith('/mock/asset/'):
+            return self._send(200, b'\0' * ASSET_SIZE, 'application/octet-stream', {'Cache-Control': 'max-age=3600'})
+        if path in ('/', '/login.do'):
+            return self._send(200, LOGIN_PAGE)
+        if path == '/nav_to.do':
+            return self._send(200, render_shell(params.get('uri', 'home.do')))
+        if path == '/home.do':
+            return self._send(200, '<html><body data-table="home"><table class="list2_table"></table></body></html>')
+        if path in ('/stats.do', '/robots.txt'):
+            return self._send(200, 'ok', 'text/plain')
+        if path.startswith('/api/now/table/'):
+            return self._table_api_get(path, params)
+
+        classic = path in ('/incident_list.do', '/label_list.do', '/incident.do', '/label.do')
+        if classic and self.instance.force_shell and top_level:
+            # Instance that does not allow classic pages outside the Next Experience shell
+            return self._redirect('/nav_to.do?uri=' + quote(path.lstrip('/') + ('?' + parts.query if parts.query else ''), safe=''))
+        if path == '/incident_list.do':
+            return self._send(200, render_list(self.instance, 'incident', params.get('sysparm_query'),
+                                               int(params.get('sysparm_first_row', 1))))
+        if path == '/label_list.do':
+            return self._send(200, render_list(self.instance, 'label', params.get('sysparm_query'),
+                                               int(params.get('sysparm_first_row', 1))))
+        checked_items = self._checked_items(params)
+        if path == '/incident.do' and checked_items:
+            blank = {'sys_id': '-1', 'number': '', 'state': '', 'assigned_to': '', 'close_code': '', 'close_notes': '',
+                     'work_notes': []}
+            return self._send(200, render_incident_form(self.instance, blank, checked_items))
+        if path == '/label.do' and checked_items:
+            blank = {'sys_id': '-1', 'name': '', 'viewable_by': '', 'group_list': '', 'user_list': ''}
+            return self._send(200, render_label_form(self.instance, blank, checked_items))
+        if path == '/incident.do':
+            record = self.instance.incidents.get(params.get('sys_id'))
+            return self._send(200, render_incident_form(self.instance, record)) if record else self._send(404, 'Not found')
+        if path == '/label.do':
+            record = self.instance.labels.get(params.get('sys_id'))
+            return self._send(200, render_label_form(self.instance, record)) if record else self._send(404, 'Not found')
+        self._send(404, 'Not found')
+
+    def do_POST(self):
+        if self.path.startswith('/api/'):
+            if not self._api_admit():
+                return
+            try:
+                return self._do_post()
+            finally:
+                self._api_done()
+        return self._do_post()
+
+    def _do_post(self):
+        self._simulate_latency()
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        path = parts.path
+        body = self._read_body()
+
+        if path == '/mock/reset':
+            self.instance.reset()
+            return self._json(200, {'reset': True})
+        if path == '/mock/list_edit':
+            request = json.loads(body)
+            with self.instance.lock:
+                record = self.instance.incidents.get(request['sys_id'])
+                if not record:
+                    return self._json(404, {'error': 'not found'})
+                value = request['value']
+                if not value:
+                    user = self.instance.user_by_name(request['display'])
+                    value = user['sys_id'] if user else ''
+                record[request['field']] = value
+                self.instance.touch(record)
+                return self._json(200, {'display': self.instance.user_name(value)})
+        if path == '/mock/create':
+            request = json.loads(body or b'{}')
+            with self.instance.lock:
+                index = len(self.instance.incidents)
+                sys_id = uuid.uuid4().hex
+                record = dict(next(iter(self.instance.incidents.values())), sys_id=sys_id, number=f'INC{index + 1:07d}',
+                              assigned_to='', state='New', work_notes=[], close_code='', close_notes='')
+                record.update(request)
+                self.instance.incidents[sys_id] = record
+                self.instance.touch(record)
+            return self._json(200, {'sys_id': sys_id})
+        if path == '/mock/work_note':
+            request = json.loads(body)
+            with self.instance.lock:
+                record = self.instance.incidents[request['sys_id']]
+                record['work_notes'].append(request['text'])
+                self.instance.touch(record)
+            return self._json(200, {'posted': True})
+        if path in ('/incident.do', '/label.do'):
+            return self._form_post(path, params, body)
+        if path == '/api/now/v1/batch':
+            return self._batch(json.loads(body or b'{}'))
+        self._send(404, 'Not found')
+
+    def do_PATCH(self):
+        if not self._api_admit():
+            return
+        try:
+            self._do_patch()
+        finally:
+            self._api_done()
+
+    def _do_patch(self):
+        self._simulate_latency()
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        status, payload = self._table_api_patch(parts.path, params, json.loads(self._read_body() or b'{}'))
+        self._json(status, payload)
+
+    def _table_api_patch(self, path, params, values):
+        """Apply a Table API PATCH to an incident; returns (status, payload)."""
+        segments = path.split('/')
+        if len(segments) != 6 or segments[4] != 'incident':
+            return 404, {'error': {'message': 'not found'}}
+        with self.instance.lock:
+            record = self.instance.incidents.get(segments[5])
+            if not record:
+                return 404, {'error': {'message': 'No Record found'}}
+            self._apply_values(record, values, params.get('sysparm_input_display_value') == 'true')
+            return 200, {'result': self._api_record(record, params)}
+
+    def _batch(self, request):
+        """Serve a Batch API request: run each PATCH sub-request, leave those beyond batch_limit unserviced."""
+        with self.instance.lock:
+            self.instance.batch_requests += 1
+        serviced, unserviced = [], []
+        for index, sub_request in enumerate(request.get('rest_requests', [])):
+            if self.instance.batch_limit and index >= self.instance.batch_limit:
+                unserviced.append(sub_request['id'])
+                continue
+            parts = urlsplit(sub_request['url'])
+            params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+            if sub_request.get('method') != 'PATCH':
+                status, payload = 405, {'error': {'message': 'Method not supported by the mock'}}
+            else:
+                body = base64.b64decode(sub_request.get('body') or '') or b'{}'
+                status, payload = self._table_api_patch(parts.path, params, json.loads(body))
+            serviced.append({
+                'id': sub_request['id'],
+                'status_code': status,
+                'status_text': 'OK' if status == 200 else 'Error',
+                'headers': [{'name': 'Content-Type', 'value': 'application/json'}],
+                'body': base64.b64encode(json.dumps(payload).encode('utf-8')).decode('ascii'),
+                'execution_time': 0,
+            })
+        self._json(200, {'batch_request_id': request.get('batch_request_id'),
+                         'serviced_requests': serviced, 'unserviced_requests': unserviced})
+
+    def _apply_values(self, record, values, display_input):
+        """Apply Table API field values, resolving reference display names when requested."""
+        for field, value in values.items():
+            if field == 'assigned_to':
+                if display_input or value not in self.instance.users:
+                    user = self.instance.user_by_name(value)
+                    value = user['sys_id'] if user else ''
+                record[field] = value
+            elif field == 'work_notes':
+                record['work_notes'].append(value)
+            elif field == 'state' and str(value).isdigit():
+                record[field] = STATES[int(value) - 1]
+            else:
+                record[field] = value
+        self.instance.touch(record)
+
+    def _api_record(self, record, params):
+        """Shape a record like the Table API does, honouring sysparm_fields/display_value."""
+        display_value = params.get('sysparm_display_value')
+        result = {k: v for k, v in record.items() if k != 'work_notes'}
+        if 'number' in record:
+            result['active'] = 'false' if record.get('state') in ('Resolved', 'Closed') else 'true'
+        fields = params.get('sysparm_fields')
+        if fields:
+            result = {k: result.get(k, '') for k in fields.split(',')}
+        if display_value in ('true', 'all') and 'assigned_to' in result:
+            display = dict(result, assigned_to=self.instance.user_name(result['assigned_to']))
+            if display_value == 'true':
+                return display
+            return {k: {'display_value': display[k], 'value': v} for k, v in result.items()}
+        if display_value == 'all':
+            return {k: {'display_value': v, 'value': v} for k, v in result.items()}
+        return result
+
+    def _table_api_get(self, path, params):
+        segments = path.split('/')
+        table = segments[4] if len(segments) > 4 else ''
+        records = {'incident': self.instance.incidents, 'sys_user': self.instance.users, 'label': self.instance.labels}.get(table)
+        if records is None:
+            return self._json(404, {'error': {'message': f'Invalid table {table}'}})
+        with self.instance.lock:
+            if len(segments) == 6:
+                record = records.get(segments[5])
+                if not record:
+                    return self._json(404, {'error': {'message': 'No Record found'}})
+                return self._json(200, {'result': self._api_record(record, params)})
+            query = params.get('sysparm_query')
+            matched = self.instance.sort([r for r in records.values() if self.instance.matches(r, query)], query)
+            offset = int(params.get('sysparm_offset', 0))
+            limit = int(params.get('sysparm_limit', 10000))
+            page = [self._api_record(r, params) for r in matched[offset:offset + limit]]
+        self._send(200, json.dumps({'result': page}), 'application/json', {'X-Total-Count': str(len(matched))})
+
+    @staticmethod
+    def _checked_items(params):
+        """sys_ids of an "Update Selected" form (sys_id=-1 with sysparm_checked_items), else an empty list."""
+        if params.get('sys_id') != '-1':
+            return []
+        return [sys_id for sys_id in params.get('sysparm_checked_items', '').split(',') if sys_id]
+
+    def _form_post(self, path, params, body):
+        """Handle a classic form submit (sysverb_update) and redirect back to the list."""
+        fields = {k: v[0] for k, v in parse_qs(body.decode('utf-8'), keep_blank_values=True).items()}
+        table = path.strip('/').split('.')[0]
+        checked_items = self._checked_items(params)
+        with self.instance.lock:
+            records = self.instance.incidents if table == 'incident' else self.instance.labels
+            targets = [records.get(sys_id) for sys_id in checked_items or [params.get('sys_id')]]
+            if not all(targets):
+                return self._send(404, 'Not found')
+            for record in targets:
+                self._apply_form(table, record, fields, multiple=bool(checked_items))
+        self._redirect(f'/{table}_list.do')
+
+    def _apply_form(self, table, record, fields, multiple):
+        """Apply submitted form fields; the "Update Selected" form only changes the fields that were filled in."""
+        if table == 'incident':
+            state = fields.get('incident.state')
+            if state and state.isdigit():
+                record['state'] = STATES[int(state) - 1]
+            assignee = fields.get('incident.assigned_to') or ''
+            if not assignee and fields.get('sys_display.incident.assigned_to'):
+                user = self.instance.user_by_name(fields['sys_display.incident.assigned_to'])
+                assignee = user['sys_id'] if user else ''
+            if assignee or not multiple:
+                record['assigned_to'] = assignee
+            for field in ('close_code', 'close_notes'):
+                value = fields.get(f'incident.{field}')
+                if value or (value is not None and not multiple):
+                    record[field] = value
+            if fields.get('work_notes'):
+                record['work_notes'].append(fields['work_notes'])
+        else:
+            record['viewable_by'] = fields.get('label.viewable_by') or record['viewable_by']
+            groups = fields.get('label.group_list') or fields.get('sys_display.label.group_list', '')
+            record['group_list'] = groups or record['group_list']
+        self.instance.touch(record)
+
+
+def start_server(port=0, records=100, latency_ms=0, force_shell=False, api_limit=0, batch_limit=0):
+    """
+    Start the mock instance in a background thread.
+
+    Returns:
+        Tuple (server, base_url); call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockRequestHandler)
+    server.daemon_threads = True
+    server.instance = MockInstance(records, latency_ms, force_shell, api_limit, batch_limit)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a mock ServiceNow instance for local testing and benchmarks")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--records', type=int, default=100, help="Number of seeded incidents and tags")
+    parser.add_argument('--latency-ms', type=int, default=0, help="Artificial server time added to every request")
+    parser.add_argument('--force-shell', action='store_true', help="Redirect top-level classic pages into the shell")
+    parser.add_argument('--api-limit', type=int, default=0,
+                        help="Answer 429 when more Table API requests than this are in flight (0 = unlimited)")
+    parser.add_argument('--batch-limit', type=int, default=0,
+                        help="Serve at most this many sub-requests per Batch API call, the rest unserviced (0 = all)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.records, args.latency_ms, args.force_shell, args.api_limit,
+                                    args.batch_limit)
+    print(f"✅ Mock ServiceNow instance running at {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
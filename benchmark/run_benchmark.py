@@ -0,0 +1,264 @@
+"""
+ServiceNow Workflow Benchmark
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Runs each automation workflow headless against the local mock instance in
+mock_servicenow.py and reports tickets/sec and p50/p95/p99 latency per ticket, so the
+effect of a change can be measured without touching production.
+License: MIT
+
+Usage:
+    python benchmark/run_benchmark.py --browser edge --tickets 50 --latency-ms 30
+    python benchmark/run_benchmark.py --workflows assign,resolve --force-shell --json results.json
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import urllib.request
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.support.ui import WebDriverWait
+
+# The shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_servicenow import start_server
+from servicenow_api import TableAPIClient
+from servicenow_lean import enable_lean_network, lean_options
+from servicenow_list import snapshot_list
+from servicenow_nav import ClassicNavigator
+from servicenow_stages import find_element_safe, set_resolution, submit_form
+from servicenow_waits import (wait_for_ajax_idle, wait_for_autocomplete, wait_for_cell_editor_closed,
+                              wait_for_form_load, wait_for_form_submit, wait_for_work_note_posted)
+
+# Same routing as assign_task_edge.py
+implementer_mapping = {
+    'Group A': 'Implementer A',
+    'Group B': 'Implementer B',
+    'Group C': 'Implementer C',
+}
+default_implementer = 'Default User'
+
+
+def start_driver(browser, lean=False):
+    """Start a headless Edge or Chrome with a throwaway profile."""
+    if browser == 'chrome':
+        options = webdriver.ChromeOptions()
+    else:
+        options = webdriver.EdgeOptions()
+    options.add_argument('--headless=new')
+    options.add_argument('--window-size=1400,1000')
+    options.add_argument('--no-first-run')
+    if lean:
+        lean_options(options)
+    driver = webdriver.Chrome(options=options) if browser == 'chrome' else webdriver.Edge(options=options)
+    if lean:
+        enable_lean_network(driver)
+    return driver
+
+
+def nav_url(base_url, uri):
+    """Shell URL the scripts use, e.g. nav_to.do?uri=incident_list.do%3F..."""
+    return f"{base_url}/nav_to.do?uri={urllib.request.quote(uri, safe='')}"
+
+
+def assign_workflow(driver, navigator, base_url):
+    """assign_task_edge.py: list-edit assigned_to of the first unassigned incident, one list load per ticket."""
+    if not navigator.open(nav_url(base_url, 'incident_list.do?sysparm_query=assigned_toISEMPTY')):
+        return None
+    columns, rows = snapshot_list(driver)
+    if not rows:
+        return None
+    row = rows[0]
+    implementer_text = implementer_mapping.get(row['assignment_group'] or '', default_implementer)
+    cell = driver.find_element(By.CSS_SELECTOR, f"tr[id='{row['row_id']}'] > td:nth-child({columns['assigned_to']})")
+    ActionChains(driver).double_click(cell).perform()
+    assignee = find_element_safe(driver, By.ID, "sys_display.LIST_EDIT_incident.assigned_to")
+    assignee.send_keys(implementer_text)
+    wait_for_autocomplete(driver, assignee)
+    driver.find_element(By.CSS_SELECTOR, "a#cell_edit_ok").click()
+    wait_for_cell_editor_closed(driver)
+    return row['sys_id']
+
+
+def update_workflow(driver, navigator, base_url, done):
+    """update_incidents_edge.py: post a work note on an active incident."""
+    if not navigator.open(nav_url(base_url, 'incident_list.do?sysparm_query=active=true')):
+        return None
+    _, rows = snapshot_list(driver)
+    pending = [row for row in rows if row['sys_id'] not in done]
+    if not pending:
+        return None
+    row = pending[0]
+    driver.find_element(By.CSS_SELECTOR, f"tr[id='{row['row_id']}'] a.linked.formlink").click()
+    wait_for_form_load(driver)
+    work_notes = find_element_safe(driver, By.ID, "activity-stream-work_notes-textarea")
+    work_notes.send_keys("Any updates?")
+    wait_for_ajax_idle(driver)
+    driver.find_element(By.CSS_SELECTOR, "button.btn.btn-default.activity-submit").click()
+    wait_for_work_note_posted(driver, work_notes)
+    return row['sys_id']
+
+
+def resolve_workflow(driver, navigator, base_url):
+    """resolve_incidents_edge.py: resolve the first On Hold incident through its form."""
+    if not navigator.open(nav_url(base_url, 'incident_list.do?sysparm_query=active=true')):
+        return None
+    _, rows = snapshot_list(driver)
+    pending = [row for row in rows if row['state'] == 'On Hold']
+    if not pending:
+        return None
+    row = pending[0]
+    driver.find_element(By.CSS_SELECTOR, f"tr[id='{row['row_id']}'] a.linked.formlink").click()
+    wait_for_form_load(driver)
+    if not set_resolution(driver, WebDriverWait(driver, 10), "Solution provided", "Resolved by benchmark"):
+        return None
+    return row['sys_id'] if submit_form(driver) else None
+
+
+def edit_tag_workflow(driver, navigator, base_url):
+    """edit_tag_edge.py: make the first private tag viewable by a group."""
+    if not navigator.open(nav_url(base_url, 'label_list.do?sysparm_query=viewable_by=Me')):
+        return None
+    _, rows = snapshot_list(driver, table='label', fields=['name'])
+    if not rows:
+        return None
+    row = rows[0]
+    driver.find_element(By.CSS_SELECTOR, f"tr[id='{row['row_id']}'] a.linked.formlink").click()
+    wait_for_form_load(driver)
+    find_element_safe(driver, By.XPATH, "//select[@id='label.viewable_by']/option[2]").click()
+    wait_for_ajax_idle(driver)
+    group_list = find_element_safe(driver, By.ID, "sys_display.label.group_list")
+    group_list.send_keys("DD")
+    wait_for_autocomplete(driver, group_list)
+    find_element_safe(driver, By.ID, "sys_display.label.user_list").click()
+    wait_for_ajax_idle(driver)
+    update_button = find_element_safe(driver, By.ID, "sysverb_update")
+    update_button.click()
+    wait_for_form_submit(driver, update_button)
+    return row['sys_id']
+
+
+def api_assign_workflow(client):
+    """assign_task_edge.py --backend api: assign the first unassigned incident through the Table API."""
+    records = client.get_records('incident', query='active=true^assigned_toISEMPTY',
+                                 fields=['sys_id', 'assignment_group'], limit=1, display_value='true')
+    if not records:
+        return None
+    record = records[0]
+    implementer_text = implementer_mapping.get(record['assignment_group'], default_implementer)
+    client.patch_record('incident', record['sys_id'], {'assigned_to': implementer_text},
+                        input_display_value=True, fields=['sys_id'])
+    return record['sys_id']
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(name, latencies, elapsed, failures):
+    """Tickets/sec and latency percentiles (milliseconds) for one workflow run."""
+    latencies = sorted(latencies)
+    return {
+        'workflow': name,
+        'tickets': len(latencies),
+        'failures': failures,
+        'elapsed_s': round(elapsed, 3),
+        'tickets_per_s': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def run_workflow(name, step, tickets):
+    """Call step() until it has handled the requested number of tickets or runs out of work."""
+    latencies, failures = [], 0
+    start_time = time.perf_counter()
+    while len(latencies) < tickets and failures < 3:
+        ticket_start = time.perf_counter()
+        try:
+            handled = step()
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+            failures += 1
+            continue
+        if handled is None:
+            break
+        latencies.append(time.perf_counter() - ticket_start)
+    return summarize(name, latencies, time.perf_counter() - start_time, failures)
+
+
+def reset_instance(base_url):
+    """Restore the mock instance's seed data between workflows."""
+    urllib.request.urlopen(urllib.request.Request(f'{base_url}/mock/reset', data=b'{}', method='POST')).read()
+
+
+if __name__ == '__main__':
+    workflows = ['assign', 'update', 'resolve', 'edit_tag', 'api_assign']
+    parser = argparse.ArgumentParser(description="Benchmark the automation workflows against a local mock ServiceNow instance")
+    parser.add_argument('--workflows', default=','.join(workflows), help="Comma separated workflows to run")
+    parser.add_argument('--browser', choices=['edge', 'chrome'], default='edge')
+    parser.add_argument('--tickets', type=int, default=20, help="Tickets handled per workflow")
+    parser.add_argument('--latency-ms', type=int, default=0, help="Artificial server time added to every request")
+    parser.add_argument('--force-shell', action='store_true',
+                        help="Mock an instance that only serves classic pages inside the Next Experience shell")
+    parser.add_argument('--direct-nav', action='store_true', help="Use ClassicNavigator direct mode like --direct-nav")
+    parser.add_argument('--lean', action='store_true', help="Run the browser with the lean network profile")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.workflows.split(',') if name.strip()]
+    unknown = set(selected) - set(workflows)
+    if unknown:
+        parser.error(f"unknown workflows: {', '.join(sorted(unknown))}")
+
+    # Enough records for every ticket of every workflow (half of them are On Hold)
+    server, base_url = start_server(records=max(100, args.tickets * 2), latency_ms=args.latency_ms,
+                                    force_shell=args.force_shell)
+    print(f"Mock instance running at {base_url}")
+
+    driver = None
+    results = []
+    try:
+        for name in selected:
+            reset_instance(base_url)
+            if name == 'api_assign':
+                with TableAPIClient(base_url) as client:
+                    results.append(run_workflow(name, lambda: api_assign_workflow(client), args.tickets))
+                continue
+            if driver is None:
+                driver = start_driver(args.browser, args.lean)
+            navigator = ClassicNavigator(driver, direct=args.direct_nav)
+            if name == 'update':
+                done = set()
+                def step():
+                    sys_id = update_workflow(driver, navigator, base_url, done)
+                    done.add(sys_id)
+                    return sys_id
+            else:
+                step = {'assign': assign_workflow, 'resolve': resolve_workflow, 'edit_tag': edit_tag_workflow}[name]
+                step = (lambda f: lambda: f(driver, navigator, base_url))(step)
+            results.append(run_workflow(name, step, args.tickets))
+    finally:
+        if driver:
+            driver.quit()
+        server.shutdown()
+
+    print(f"\n{'workflow':<12}{'tickets':>8}{'fail':>6}{'tickets/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for result in results:
+        print(f"{result['workflow']:<12}{result['tickets']:>8}{result['failures']:>6}{result['tickets_per_s']:>11.2f}"
+              f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'browser': args.browser, 'latency_ms': args.latency_ms, 'force_shell': args.force_shell,
+                       'direct_nav': args.direct_nav, 'lean': args.lean, 'results': results}, f, indent=2)
+        print(f"Results written to {args.json}")
@@ -2,160 +2,360 @@
 # Credits: Abdullah Omer (https://github.com/AbdullahOmerDev)
 # Purpose: Automates the process of editing tags in a web application
 
-import time
 import os
+import argparse
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
+from servicenow_lean import enable_lean_network, lean_options
+from servicenow_list import iterate_list_pages, iterate_list_records, snapshot_list
+from servicenow_locators import locators
+from servicenow_mass_update import group_by_target, update_selected
+from servicenow_metrics import metrics
+from servicenow_nav import ClassicNavigator
+from servicenow_plan import Contains, WritePlan
+from servicenow_processes import processes
+from servicenow_profile import SlimProfile
+from servicenow_recovery import DeadLetterList, RecordRecovery
+from servicenow_recycle import BrowserRecycler
+from servicenow_session import lease_session
+from servicenow_waits import wait_for_ajax_idle, wait_for_autocomplete, wait_for_form_load, wait_for_form_submit
 
-# Kill any running Edge browser processes before starting
-os.system("taskkill /F /IM msedge.exe /T")
+# Command line options
+parser = argparse.ArgumentParser(description="Edit ServiceNow tags")
+parser.add_argument('--session-service', action='store_true',
+                    help="Lease a warm, logged-in browser from servicenow_session.py")
+parser.add_argument('--direct-nav', action='store_true',
+                    help="Load classic UI lists directly instead of through the macroponent shell iframe")
+parser.add_argument('--lean', action='store_true',
+                    help="Block fonts, images and analytics the script never reads to cut page weight")
+parser.add_argument('--retries', type=int, default=2,
+                    help="Extra attempts for a tag that fails before it is moved to the dead-letter list")
+parser.add_argument('--slim-profile', action='store_true',
+                    help="Start from a small snapshot of the profile's session instead of the full Edge profile")
+parser.add_argument('--mass-update', action='store_true',
+                    help="Edit all tags of a list page that need the same values with one 'Update Selected' save")
+parser.add_argument('--viewable-by', choices=['Groups and Users', 'Everyone', 'Me'], default='Groups and Users',
+                    help="\"Viewable by\" option every tag is set to (default: Groups and Users)")
+args = parser.parse_args()
+
+# Step timings go to ServiceNow_Metrics.jsonl / ServiceNow_Metrics.prom in the user profile
+metrics.configure('edit_tag')
 
 # Path to Edge user profile - generic path, update as needed
 edge_profile_path = r'C:\Users\[username]\AppData\Local\Microsoft\Edge\User Data'
 
-# Configure Edge browser options
-edge_options = webdriver.EdgeOptions()
-edge_options.add_argument(f'user-data-dir={edge_profile_path}')
-edge_options.add_argument('profile-directory=Default')
-
-# Initialize the Edge WebDriver with configured options
-driver = webdriver.Edge(options=edge_options)
-wait = WebDriverWait(driver, 10)  # Set a 10-second timeout for waiting operations
+# Snapshot of the session files of that profile, used with --slim-profile
+slim_profile = SlimProfile(edge_profile_path)
 
 # Navigate to the login page
 login_url = 'https://your-instance.service-now.com/login.do'
-driver.get(login_url)
 
-try:
-    # Find and click on the user account button to proceed with login
-    next_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-test-id='a.user@domain.com']")))
-    next_button.click()
-except (NoSuchElementException, TimeoutException) as e:
-    # Handle login errors gracefully
-    print("Error during login process:", e)
-    driver.quit()
-    exit()
+# Define the URL for the tags (label) list page
+incidents_url = 'https://your-instance.service-now.com/nav_to.do?uri=label_list.do'
 
-# Define the URL for the incidents list page
-incidents_url = 'https://your-instance.service-now.com/nav_to.do?uri=incident.list'
+# Base URL of the instance, used to open tag forms directly
+instance_url = 'https://your-instance.service-now.com'
 
-def find_element_safe(wait, by, value, timeout=10):
-    """
-    Safely find an element with explicit wait to handle potential timing issues.
-    
-    Args:
-        wait: WebDriverWait object
-        by: Selenium locator strategy (e.g., By.ID)
-        value: Selector value for the strategy
-        timeout: Maximum time to wait for element to appear
-        
-    Returns:
-        The found element or None if not found
-    """
-    try:
-        return WebDriverWait(driver, timeout).until(EC.presence_of_element_located((by, value)))
-    except TimeoutException:
-        return None
+# Target state of every tag: the "Viewable by" option the script selects and the group it adds.
+# Tags whose list row already shows both are skipped; add the Viewable by and Groups columns
+# to the tag list view so they can be read (a missing column means the tag is always edited)
+tag_viewable_by = args.viewable_by
+
+# Choice values of the "Viewable by" options; the option is selected by value, then by its label
+viewable_by_values = {'Me': 'me', 'Everyone': 'everyone', 'Groups and Users': 'groups_and_users'}
+tag_group = 'DD'
+tag_desired_state = {'viewable_by': tag_viewable_by, 'group_list': Contains(tag_group)}
 
-def find_shadow_element(host, selector):
+# Tag list columns the script reads
+tag_fields = ['name', 'viewable_by', 'group_list']
+
+session_lease = None
+
+def start_browser(refreshed=False):
     """
-    Find an element inside a shadow DOM.
-    
+    Start Edge with the user profile and log in, or lease a warm session from the session service.
+
     Args:
-        host: The shadow DOM host element
-        selector: CSS selector to find within the shadow DOM
-        
+        refreshed: The slim profile snapshot was already taken again after a failed login
+
     Returns:
-        The found element or None if not found
+        The WebDriver, or None if the login failed
     """
+    global session_lease
+    if args.session_service:
+        # Attach to a warm, already logged-in browser - no cold start and no login
+        session_lease = lease_session('edit_tag_edge')
+        new_driver = session_lease.driver
+    else:
+        # Configure Edge browser options
+        edge_options = webdriver.EdgeOptions()
+        if args.slim_profile:
+            # Private copy of the session files only - starts fast and does not lock the user profile
+            slim_profile.options(edge_options)
+        else:
+            edge_options.add_argument(f'user-data-dir={edge_profile_path}')
+            edge_options.add_argument('profile-directory=Default')
+
+        # Initialize the Edge WebDriver with configured options
+        if args.lean:
+            lean_options(edge_options)
+        new_driver = processes.start('edge', edge_options)
+        if args.slim_profile:
+            slim_profile.apply_cookies(new_driver)
+
+        try:
+            with metrics.span('login'):
+                new_driver.get(login_url)
+                # Find and click on the user account button to proceed with login
+                next_button = WebDriverWait(new_driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-test-id='a.user@domain.com']")))
+                next_button.click()
+        except (NoSuchElementException, TimeoutException) as e:
+            # Handle login errors gracefully
+            print("Error during login process:", e)
+            retire_browser(new_driver)
+            if args.slim_profile and not refreshed:
+                # The session in the snapshot has expired - take it again from the user profile and retry once
+                slim_profile.refresh(keep_cookies=False)
+                return start_browser(refreshed=True)
+            return None
+        if args.slim_profile:
+            # Keep the freshest session cookies in the snapshot for the next start
+            slim_profile.capture(new_driver, login_url)
+
+    # Lean profile: fonts, images, avatars and analytics beacons are never downloaded
+    if args.lean:
+        enable_lean_network(new_driver)
+    return new_driver
+
+def retire_browser(old_driver):
+    """Quit a browser this script started and delete the slim profile copy it ran on."""
+    processes.quit(old_driver)
+    slim_profile.remove_clone(old_driver)
+
+def restart_browser():
+    """Replace a browser whose session died (recovery callback) and return the new driver."""
+    global driver, wait
     try:
-        shadow_root = driver.execute_script("return arguments[0].shadowRoot", host)
-        return shadow_root.find_element(By.CSS_SELECTOR, selector)
+        if session_lease:
+            session_lease.release()
+        else:
+            retire_browser(driver)
     except Exception:
-        return None
+        pass  # The old browser is already gone
+    new_driver = start_browser()
+    if not new_driver:
+        raise RuntimeError("Login failed after restarting the browser")
+    driver, wait = new_driver, WebDriverWait(new_driver, 10)
+    return driver
 
-# Main loop for the automation process
-while True:
-    # Navigate to the incidents list page
-    driver.get(incidents_url)
-    print("Incidents list page opened")
+# Stop only browsers left behind by crashed runs; the user's Edge and other running automations stay open
+processes.cleanup_orphans()
 
-    try:
-        # Find the shadow DOM host element (macroponent)
-        shadow_host = find_element_safe(wait, By.XPATH, "//*[starts-with(name(), 'macroponent')]")
-        if not shadow_host:
-            print("❌ Shadow DOM Host not found.")
-            break
+driver = start_browser()
+if not driver:
+    slim_profile.remove_clones()
+    metrics.close()
+    exit()
+wait = WebDriverWait(driver, 10)  # Set a 10-second timeout for waiting operations
 
-        # Find the iframe within the shadow DOM
-        iframe = find_shadow_element(shadow_host, 'iframe')
-        if not iframe:
-            print("❌ iframe not found. Reloading...")
-            continue  # Reload page if iframe is missing
-        
-        # Switch to the iframe context to interact with its elements
-        driver.switch_to.frame(iframe)
-        print("✅ Switched to iframe!")
-
-        # Find and click on the tag name link
-        tag_name = find_element_safe(wait, By.CSS_SELECTOR, "a.linked.formlink")
-        if not tag_name:
-            print("❌ Required elements not found.")
-            break
-        
-        tag_name.click()
-        print("✅ Clicked on the tag name.")
-        time.sleep(2)
+# Opens classic UI pages; with --direct-nav the Next Experience shell is skipped when the instance allows it
+navigator = ClassicNavigator(driver, direct=args.direct_nav)
+
+def set_tag_fields(changes):
+    """
+    Set the differing fields on the open tag form - a single tag or the "Update Selected" form.
+
+    Args:
+        changes: Fields to set, as returned by plan.changes()
 
-        # Select the second option in the "Viewable by" dropdown
-        Viewable_by = find_element_safe(wait, By.XPATH, "//select[@id='label.viewable_by']/option[2]")
+    Returns:
+        True if every field was set, False if a required element was missing
+    """
+    if 'viewable_by' in changes:
+        # Select the target option in the "Viewable by" dropdown
+        Viewable_by = locators.find(driver, 'form_select_option', table='label', field='viewable_by',
+                                    value=viewable_by_values[tag_viewable_by], text=tag_viewable_by)
         if not Viewable_by:
             print("❌ Required elements not found.")
-            break
-        
-        Viewable_by.click()
-        print("✅ Clicked on the viewable by.") 
-        time.sleep(2)
+            return False
+
+        with metrics.span('edit'):
+            Viewable_by.click()
+            wait_for_ajax_idle(driver)
+        print("✅ Clicked on the viewable by.")
 
+    if 'group_list' in changes:
         # Find the group list field and enter "DD"
-        group_list = find_element_safe(wait, By.ID, "sys_display.label.group_list")
+        group_list = locators.find(driver, 'form_reference_input', table='label', field='group_list')
         if not group_list:
             print("❌ Required elements not found.")
-            break
-        
-        group_list.send_keys("DD")
+            return False
+
+        with metrics.span('edit'):
+            group_list.send_keys(tag_group)
+            wait_for_autocomplete(driver, group_list)
         print("✅ Clicked on the group list.")
-        time.sleep(2)
 
-        # Click on the user list field 
-        random_click = find_element_safe(wait, By.ID, "sys_display.label.user_list")
+        # Click on the user list field
+        random_click = locators.find(driver, 'form_reference_input', table='label', field='user_list')
         if not random_click:
             print("❌ Required elements not found.")
-            break
-        
-        random_click.click()
+            return False
+
+        with metrics.span('edit'):
+            random_click.click()
+            wait_for_ajax_idle(driver)
         print("✅ Clicked on the user list field")
-        time.sleep(2)
+    return True
 
-        # Find and click the update button to save changes
-        update_button = find_element_safe(wait, By.ID, "sysverb_update")
-        if not update_button:
-            print("❌ Required elements not found.")
-            break
-        
+def edit_tag(tag):
+    """
+    Open one tag form, set the viewable-by option and groups where they differ, and save it.
+
+    Returns:
+        True once the form was saved or the tag was already in the desired state,
+        False if the form or a required element did not load
+    """
+    key = tag['name'] or tag['sys_id']
+    changes = plan.changes(key, tag, tag_desired_state)
+    if not changes:
+        print(f"✅ Tag {key} is already viewable by {tag_viewable_by} with {tag_group}, skipped.")
+        return True
+
+    if not navigator.open(f"{instance_url}/label.do?sys_id={tag['sys_id']}"):
+        print("❌ Tag form could not be opened.")
+        return False
+    wait_for_form_load(driver)
+    print(f"✅ Opened the tag {key}.")
+
+    if not set_tag_fields(changes):
+        return False
+
+    # Find and click the update button to save changes
+    update_button = locators.find(driver, 'form_update')
+    if not update_button:
+        print("❌ Required elements not found.")
+        return False
+    
+    with metrics.span('submit') as span:
         update_button.click()
-        print("✅ Clicked on the update button.")
-        time.sleep(2)
+        if not wait_for_form_submit(driver, update_button):
+            span.fail()
+            return False
+    print("✅ Clicked on the update button.")
+    plan.applied(key)
+    return True
+
+# Tags already in the desired state are counted and skipped
+plan = WritePlan('edit_tag')
+
+# Tags that keep failing are retried with backoff and then parked in the dead-letter list
+dead_letter_path = os.path.join(os.getenv('USERPROFILE', 'C:\\'), "ServiceNow_DeadLetter.jsonl")
+recovery = RecordRecovery(DeadLetterList(dead_letter_path, 'edit_tag'), navigator,
+                          restart_driver=restart_browser, retries=args.retries)
+
+# Swaps in a fresh browser between tags once this one has grown past the memory watermark;
+# with --slim-profile the replacement is started and logged in ahead of time
+recycler = BrowserRecycler(start_browser, quit_browser=retire_browser, standby=args.slim_profile,
+                           enabled=not args.session_service)
+
+def recycle_browser():
+    """Replace the browser between records once it crossed the memory or renderer watermark."""
+    global driver, wait
+    new_driver = recycler.recycle(driver)
+    if new_driver is not driver:
+        driver, wait = new_driver, WebDriverWait(new_driver, 10)
+        navigator.reset(new_driver)
+
+def mass_edit_page(page_url, tags):
+    """
+    Edit the tags of one list page with one "Update Selected" save per distinct set of changes.
+
+    The multiple-record form replaces a glide list instead of adding to it, so only tags
+    without groups are mass updated. The page is then read again, and every tag that still
+    differs from the desired state (other groups, not ticked, save rejected) is edited one
+    form at a time.
+
+    Args:
+        page_url: URL of the list page (reloaded between the groups and after the mass update)
+        tags: Row dicts of the page from snapshot_list()
+    """
+    pending = [tag for tag in tags if (tag['name'] or tag['sys_id']) not in recovery.dead_letter]
+    saved = set()
+    on_page = True
+    for changes, group in group_by_target(plan, pending, lambda tag: tag['name'] or tag['sys_id'],
+                                          lambda tag: tag_desired_state):
+        eligible = [tag for tag in group if 'group_list' not in changes or tag['group_list'] == '']
+        if not eligible:
+            continue
+        if not on_page and not navigator.open(page_url):
+            print("❌ Tags list could not be opened for the next group.")
+            break
+        on_page = False
+        saved.update(update_selected(driver, 'label', [tag['sys_id'] for tag in eligible],
+                                     lambda d: set_tag_fields(changes), label=', '.join(changes)))
+
+    reloaded = None
+    if not on_page:
+        # Confirm the saves from the reloaded page
+        if navigator.open(page_url):
+            _, reloaded = snapshot_list(driver, table='label', fields=tag_fields)
+        if not reloaded:
+            print("⚠️ Tags list could not be reloaded after the mass update, trusting its saves.")
+    for tag in reloaded or pending:
+        key = tag['name'] or tag['sys_id']
+        if key in recovery.dead_letter:
+            continue
+        if not reloaded and tag['sys_id'] in saved:
+            plan.applied(key)
+            continue
+        if not plan.changes(key, tag, tag_desired_state):
+            if tag['sys_id'] in saved:
+                plan.applied(key)
+            continue
+        if tag['sys_id'] in saved:
+            print(f"⚠️ Tag {key} was not updated by Update Selected, editing the form.")
+        recovery.run(key, lambda: edit_tag(tag))
+        if recovery.exhausted:
+            return
+
+# Main loop for the automation process: stream the tags list page by page (keyset paging on sys_id)
+# and open every tag's form directly, so each tag is edited once however long the list is.
+# With --mass-update the tags of a page that need the same values are saved together instead
+try:
+    if args.mass_update:
+        for page_url, _, tags in iterate_list_pages(navigator, incidents_url, table='label',
+                                                    fields=tag_fields):
+            mass_edit_page(page_url, tags)
+            recycle_browser()
+            if recovery.exhausted:
+                print("❌ Too many tags failed in a row, stopping.")
+                break
+    else:
+        for tag in iterate_list_records(navigator, incidents_url, table='label', fields=tag_fields):
+            recycle_browser()
+            recovery.run(tag['name'] or tag['sys_id'], lambda: edit_tag(tag))
+            if recovery.exhausted:
+                print("❌ Too many tags failed in a row, stopping.")
+                break
+except Exception as e:
+    # Handle any unexpected errors
+    print(f"An error occurred: {e}")
 
-    except Exception as e:
-        # Handle any unexpected errors
-        print(f"An error occurred: {e}")
-        break
+print(f"✅ {plan.summary()}.")
+if recovery.dead_letter:
+    print(f"⚠️ {len(recovery.dead_letter)} tags moved to {dead_letter_path}.")
 
 # Close the browser when finished or on error
 print("❌ Closing the browser due to error or completion.")
-driver.quit()
\ No newline at end of file
+recycler.close()
+if session_lease:
+    session_lease.release()  # The browser stays warm in the session service
+else:
+    processes.quit(driver)
+slim_profile.remove_clones()
+metrics.close()
@@ -0,0 +1,291 @@
+"""
+Single-Pass Incident Pipeline
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Applies several actions (assign, work note, resolve) to each incident in
+one pass. Every record's form is opened once, all applicable stages are applied in
+order and the form is saved once, instead of running one script per action.
+License: MIT
+"""
+
+import time
+import os
+import argparse
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from servicenow_list import iterate_list_records
+from servicenow_journal import ProcessedJournal
+from servicenow_lean import enable_lean_network, lean_options
+from servicenow_metrics import metrics
+from servicenow_nav import ClassicNavigator
+from servicenow_processes import processes
+from servicenow_profile import SlimProfile
+from servicenow_recycle import BrowserRecycler
+from servicenow_reference import ReferenceCache
+from servicenow_session import lease_session
+from servicenow_stages import set_assignee, add_work_note, set_resolution, submit_form, discard_form_changes
+from servicenow_waits import wait_for_form_load
+
+# Command line options
+parser = argparse.ArgumentParser(description="Apply assign, work note and resolve stages to each incident in one pass")
+parser.add_argument('--stages', default='assign,work_note,resolve',
+                    help="Comma separated, ordered list of stages to run (assign, work_note, resolve)")
+parser.add_argument('--skip-window', type=float, default=24,
+                    help="Hours an incident is not asked for an update again after the pipeline's follow-up note")
+parser.add_argument('--resolve-after', type=float, default=72,
+                    help="Hours after its follow-up note an On Hold incident without a reply is resolved")
+parser.add_argument('--session-service', action='store_true',
+                    help="Lease a warm, logged-in browser from servicenow_session.py")
+parser.add_argument('--direct-nav', action='store_true',
+                    help="Load classic UI lists directly instead of through the macroponent shell iframe")
+parser.add_argument('--lean', action='store_true',
+                    help="Block fonts, images and analytics the script never reads to cut page weight")
+parser.add_argument('--slim-profile', action='store_true',
+                    help="Start from a small snapshot of the profile's session instead of the full Edge profile")
+args = parser.parse_args()
+
+# Step timings go to ServiceNow_Metrics.jsonl / ServiceNow_Metrics.prom in the user profile
+metrics.configure('pipeline')
+
+# Path to Edge profile - generic path that should be modified by user
+edge_profile_path = r'C:\Users\[username]\AppData\Local\Microsoft\Edge\User Data'
+
+# Snapshot of the session files of that profile, used with --slim-profile
+slim_profile = SlimProfile(edge_profile_path)
+
+# Navigate to the service portal login page
+login_url = 'https://your-instance.service-now.com/login.do'
+
+session_lease = None
+
+def start_browser(refreshed=False):
+    """
+    Start Edge with the user profile and log in, or lease a warm session from the session service.
+
+    Args:
+        refreshed: The slim profile snapshot was already taken again after a failed login
+
+    Returns:
+        The WebDriver, or None if the login failed
+    """
+    global session_lease
+    if args.session_service:
+        # Attach to a warm, already logged-in browser - no cold start and no login
+        session_lease = lease_session('incident_pipeline_edge')
+        new_driver = session_lease.driver
+    else:
+        # Set up Edge options
+        edge_options = webdriver.EdgeOptions()
+        if args.slim_profile:
+            # Private copy of the session files only - starts fast and does not lock the user profile
+            slim_profile.options(edge_options)
+        else:
+            edge_options.add_argument(f'user-data-dir={edge_profile_path}')
+            edge_options.add_argument('profile-directory=Default')
+
+        # Initialize WebDriver with 10-second wait timeout
+        if args.lean:
+            lean_options(edge_options)
+        new_driver = processes.start('edge', edge_options)
+        if args.slim_profile:
+            slim_profile.apply_cookies(new_driver)
+
+        try:
+            with metrics.span('login'):
+                new_driver.get(login_url)
+                # Look for and click the login option
+                # Note: Replace with your own login selector or method
+                next_button = WebDriverWait(new_driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-test-id='user@domain.com']")))
+                next_button.click()
+        except (NoSuchElementException, TimeoutException) as e:
+            print("Error during login process:", e)
+            retire_browser(new_driver)
+            if args.slim_profile and not refreshed:
+                # The session in the snapshot has expired - take it again from the user profile and retry once
+                slim_profile.refresh(keep_cookies=False)
+                return start_browser(refreshed=True)
+            return None
+        if args.slim_profile:
+            # Keep the freshest session cookies in the snapshot for the next start
+            slim_profile.capture(new_driver, login_url)
+
+    # Lean profile: fonts, images, avatars and analytics beacons are never downloaded
+    if args.lean:
+        enable_lean_network(new_driver)
+    return new_driver
+
+def retire_browser(old_driver):
+    """Quit a browser this script started and delete the slim profile copy it ran on."""
+    processes.quit(old_driver)
+    slim_profile.remove_clone(old_driver)
+
+# Stop only browsers left behind by crashed runs; the user's Edge and other running automations stay open
+processes.cleanup_orphans()
+
+driver = start_browser()
+if not driver:
+    slim_profile.remove_clones()
+    metrics.close()
+    exit()
+wait = WebDriverWait(driver, 10)
+
+# Base URL of the instance, used to open incident forms directly
+instance_url = 'https://your-instance.service-now.com'
+
+# URL for the incidents the pipeline works through
+incidents_url = 'https://your-instance.service-now.com/nav_to.do?uri=incident_list.do%3Fsysparm_query%3Dactive%3Dtrue%5EORDERBYDESCsys_created_on%26sysparm_view%3Ddefault'
+
+# Mapping of assignment groups to implementers (same as assign_task_edge.py)
+implementer_mapping = {
+    'Group A': 'Implementer A',
+    'Group B': 'Implementer B',
+    'Group C': 'Implementer C',
+    # Add more mappings as needed
+}
+default_implementer = 'Default User'
+
+# Texts used by the work note and resolve stages
+work_note_text = "هل من تحديث؟"  # "Any updates?" in Arabic
+resolution_code = "Solution provided"
+resolution_note = "لعدم رد العميل لاكثر من 3 مرات يرجي اغلاق التذكرة"
+
+# Follow-up notes the pipeline posted, kept for 30 days: an incident is asked again once its note is
+# --skip-window hours old, and an On Hold incident is resolved once its note is --resolve-after hours old
+journal = ProcessedJournal(os.path.join(os.getenv('USERPROFILE', 'C:\\'), "ServiceNow_Pipeline_Journal.jsonl"),
+                           window=30 * 24 * 3600)
+
+# Shared with assign_task_edge.py so both reuse the same implementer sys_ids
+reference_cache = ReferenceCache(os.path.join(os.getenv('USERPROFILE', 'C:\\'), "ServiceNow_Reference_Cache.json"))
+
+# Opens classic UI pages; with --direct-nav the Next Experience shell is skipped when the instance allows it
+navigator = ClassicNavigator(driver, direct=args.direct_nav)
+
+# Swaps in a fresh browser between incidents once this one has grown past the memory watermark;
+# with --slim-profile the replacement is started and logged in ahead of time
+recycler = BrowserRecycler(start_browser, quit_browser=retire_browser, standby=args.slim_profile,
+                           enabled=not args.session_service)
+
+def recycle_browser():
+    """Replace the browser between records once it crossed the memory or renderer watermark."""
+    global driver, wait
+    new_driver = recycler.recycle(driver)
+    if new_driver is not driver:
+        driver, wait = new_driver, WebDriverWait(new_driver, 10)
+        navigator.reset(new_driver)
+
+def assign_stage(record):
+    """Assign the implementer mapped from the record's assignment group."""
+    implementer_text = implementer_mapping.get(record['assignment_group'] or '', default_implementer)
+    return set_assignee(driver, implementer_text, reference_cache)
+
+def work_note_stage(record):
+    """Ask the caller for an update."""
+    return add_work_note(driver, work_note_text)
+
+def resolve_stage(record):
+    """Resolve the incident with the standard closing information."""
+    return set_resolution(driver, wait, resolution_code, resolution_note)
+
+def follow_up_age(record):
+    """Hours since the pipeline posted its follow-up note on the record, or None if it has not."""
+    ts = journal.handled_at(record['sys_id'], 'work_note')
+    return None if ts is None else (time.time() - ts) / 3600
+
+def needs_follow_up(record):
+    """Open incidents the pipeline has not asked for an update within --skip-window hours."""
+    if record['state'] not in ('In Progress', 'On Hold'):
+        return False
+    age = follow_up_age(record)
+    return age is None or age >= args.skip_window
+
+def follow_up_expired(record):
+    """On Hold incidents whose follow-up note got no reply within --resolve-after hours."""
+    age = follow_up_age(record)
+    return record['state'] == 'On Hold' and age is not None and age >= args.resolve_after
+
+# Ordered stages: (name, applies to the list row?, action on the open form)
+# Adjust the conditions to match your process; a record whose form has no applicable stage is never opened.
+# Fields missing from the list view are None, so their stages never apply.
+# Every applicable stage goes into the same save (e.g. assign + work_note, or the last work note + resolve);
+# the only ordering the process needs is that an On Hold incident is asked before it can be resolved.
+available_stages = [
+    ('assign', lambda record: record['assigned_to'] == '', assign_stage),
+    ('work_note', needs_follow_up, work_note_stage),
+    ('resolve', follow_up_expired, resolve_stage),
+]
+selected_names = [name.strip() for name in args.stages.split(',') if name.strip()]
+unknown_names = set(selected_names) - {name for name, _, _ in available_stages}
+if unknown_names:
+    parser.error(f"unknown stages: {', '.join(sorted(unknown_names))}")
+stages = [stage for name in selected_names for stage in available_stages if stage[0] == name]
+
+def process_record(record):
+    """
+    Open one incident form, apply every applicable stage and save it once.
+
+    Returns:
+        List of applied stage names, or None if a stage failed (the form is not saved)
+    """
+    applicable = [(name, action) for name, applies, action in stages if applies(record)]
+    if not applicable:
+        return []
+
+    if not navigator.open(f"{instance_url}/incident.do?sys_id={record['sys_id']}"):
+        print(f"❌ Incident {record['number']} could not be opened.")
+        return None
+    wait_for_form_load(driver)
+
+    for name, action in applicable:
+        if not action(record):
+            print(f"❌ Stage '{name}' failed on {record['number']}, changes discarded.")
+            discard_form_changes(driver)
+            return None
+
+    if not submit_form(driver):
+        discard_form_changes(driver)
+        return None
+    return [name for name, _ in applicable]
+
+counts = {'saved': 0, 'skipped': 0, 'failed': 0}
+start_time = time.perf_counter()
+
+# Main automation loop: stream the list page by page (keyset paging on sys_id), so every record
+# is visited once and records leaving the list after an update do not shift the pages still to come
+try:
+    for record in iterate_list_records(navigator, incidents_url):
+        recycle_browser()
+        with metrics.span('record', record['number']) as span:
+            applied = process_record(record)
+            if applied is None:
+                span.fail()
+            elif not applied:
+                span.fail('skipped')
+        if applied is None:
+            counts['failed'] += 1
+        elif not applied:
+            counts['skipped'] += 1
+        else:
+            counts['saved'] += 1
+            if 'work_note' in applied:
+                # The follow-up is dated from its save; the record is resolved once it has aged
+                journal.record(record['sys_id'], 'work_note')
+            print(f"✅ {record['number']}: {', '.join(applied)} saved in one update.")
+
+except Exception as e:
+    print(f"An error occurred: {e}")
+
+elapsed = time.perf_counter() - start_time
+print(f"Saved {counts['saved']}, skipped {counts['skipped']}, failed {counts['failed']} in {elapsed:.1f}s.")
+
+# Close the browser when finished
+print("❌ Script completed. Closing browser.")
+recycler.close()
+if session_lease:
+    session_lease.release()  # The browser stays warm in the session service
+else:
+    processes.quit(driver)
+slim_profile.remove_clones()
+journal.close()
+metrics.close()
@@ -1,5 +1,9 @@
 import time
 import os
+import argparse
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
@@ -7,174 +11,480 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
+from servicenow_api import TableAPIClient, iterate_records
+from servicenow_batch import BatchWriter
+from servicenow_list import iterate_list_records
+from servicenow_lean import enable_lean_network, lean_options
+from servicenow_metrics import metrics
+from servicenow_mirror import RecordMirror, current_user_id
+from servicenow_nav import ClassicNavigator
+from servicenow_processes import processes
+from servicenow_profile import SlimProfile
+from servicenow_recovery import DeadLetterList, RecordRecovery
+from servicenow_recycle import BrowserRecycler
+from servicenow_session import lease_session
+from servicenow_stages import discard_form_changes, set_resolution, submit_form
+from servicenow_throttle import throttle
+from servicenow_waits import wait_for_form_load
 
 # Author: Abdullah Omer
 # GitHub: https://github.com/AbdullahOmerDev
 # Description: This script automates the resolution of incidents in a ticketing system
 # by changing their state to "Resolved" and adding resolution information.
 
-# Kill any existing Edge processes to ensure clean start
-os.system("taskkill /F /IM msedge.exe /T")
+# Command line options
+# --workers N resolves the incident list with N parallel headless Edge instances
+# --backend api resolves them with Batch API requests instead of a browser
+parser = argparse.ArgumentParser(description="Resolve held ServiceNow incidents")
+parser.add_argument('--backend', choices=['browser', 'api'], default='browser',
+                    help="'browser' drives Edge, 'api' resolves the incidents with Table API PATCHes packed into Batch API requests")
+parser.add_argument('--user',
+                    help="API backend: user name (sys_user.user_name) of the operator whose incidents are resolved")
+parser.add_argument('--batch-size', type=int, default=None,
+                    help="API backend: incidents per Batch API request (default SERVICENOW_BATCH_SIZE or 100)")
+parser.add_argument('--workers', type=int, default=0,
+                    help="Number of parallel headless browsers (0 = sequential mode)")
+parser.add_argument('--session-service', action='store_true',
+                    help="Lease a warm, logged-in browser from servicenow_session.py")
+parser.add_argument('--direct-nav', action='store_true',
+                    help="Load classic UI lists directly instead of through the macroponent shell iframe")
+parser.add_argument('--lean', action='store_true',
+                    help="Block fonts, images and analytics the script never reads to cut page weight")
+parser.add_argument('--retries', type=int, default=2,
+                    help="Extra attempts for an incident that fails before it is moved to the dead-letter list")
+parser.add_argument('--slim-profile', action='store_true',
+                    help="Start from a small snapshot of the profile's session instead of the full Edge profile")
+parser.add_argument('--mirror', action='store_true',
+                    help="Pick the incidents from the local SQLite mirror (synced incrementally) instead of reading the list")
+args = parser.parse_args()
+if args.backend == 'api' and not args.user:
+    # The API account is not the operator, so javascript:gs.getUserID() would select the wrong incidents
+    parser.error("--backend api needs --user, the operator whose incidents are resolved")
+
+# Step timings go to ServiceNow_Metrics.jsonl / ServiceNow_Metrics.prom in the user profile
+metrics.configure('resolve' if args.backend == 'browser' else 'resolve_api')
 
 # Path to Edge profile - generic path that should be modified by user
 edge_profile_path = r'C:\Users\[username]\AppData\Local\Microsoft\Edge\User Data'
 
-# Set up Edge options
-edge_options = webdriver.EdgeOptions()
-edge_options.add_argument(f'user-data-dir={edge_profile_path}')
-edge_options.add_argument('profile-directory=Default')
-
-# Initialize WebDriver with 10-second wait timeout
-driver = webdriver.Edge(options=edge_options)
-wait = WebDriverWait(driver, 10)
+# Snapshot of the session files of that profile, used with --slim-profile
+slim_profile = SlimProfile(edge_profile_path)
 
 # Navigate to the service portal login page
 login_url = 'https://your-instance.service-now.com/login.do'
-driver.get(login_url)
 
-try:
-    # Look for and click the login option
-    # Note: Replace with your own login selector or method
-    next_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-test-id='user@domain.com']")))
-    next_button.click()
-except (NoSuchElementException, TimeoutException) as e:
-    print("Error during login process:", e)
-    driver.quit()
-    exit()
+# Base URL of the instance, used to open incident forms directly
+instance_url = 'https://your-instance.service-now.com'
+
+# Resolution values applied to every incident
+resolution_code = "Solution provided"
+resolution_note = "لعدم رد العميل لاكثر من 3 مرات يرجي اغلاق التذكرة"
 
 # URL for incidents that are held and assigned to a specific user
 # Remove personal identifiers from URL query parameters
 incidents_url = 'https://your-instance.service-now.com/nav_to.do?uri=incident_list.do%3Fsysparm_query%3Dactive%3Dtrue%5Eassigned_to%3Djavascript:gs.getUserID()%5EORDERBYDESCsys_created_on%26sysparm_view%3Dessentials'
 
-def find_element_safe(wait, by, value, timeout=10):
+# Encoded filter of the API backend, matching the list above without the incidents already resolved;
+# {user_id} is the sys_id of the --user operator
+resolve_filter = 'active=true^assigned_to={user_id}^stateNOT IN6,7,8'
+
+# Incidents that keep failing are retried with backoff and then parked in the dead-letter list
+dead_letter_path = os.path.join(os.getenv('USERPROFILE', 'C:\\'), "ServiceNow_DeadLetter.jsonl")
+dead_letter = DeadLetterList(dead_letter_path, 'resolve')
+
+def resolve_via_batch_api():
+    """
+    Resolve every matching incident through the Table API, many PATCHes per Batch API request.
+
+    The incidents are streamed with keyset paging and written one batch at a time, so a thousand
+    resolutions take a handful of HTTP calls. Sub-requests the batch did not apply are sent again
+    on their own; incidents that still fail go to the dead-letter list.
+    Credentials are read from SERVICENOW_USERNAME/SERVICENOW_PASSWORD (or SERVICENOW_TOKEN); the
+    incidents are those assigned to the --user operator, not to the API account.
+    """
+    resolution = {'state': 'Resolved', 'close_code': resolution_code, 'close_notes': resolution_note}
+    numbers = {}
+
+    def incidents(client, user_id):
+        query = resolve_filter.format(user_id=user_id)
+        for incident in iterate_records(client, 'incident', query=query, fields=['number']):
+            numbers[incident['sys_id']] = incident.get('number')
+            yield incident['sys_id'], resolution
+
+    start_time = time.perf_counter()
+    with TableAPIClient(instance_url) as client:
+        users = client.get_records('sys_user', query=f'user_name={args.user}', fields=['sys_id'], limit=1)
+        if not users:
+            print(f"❌ User {args.user} was not found, no incidents resolved.")
+            return
+        writer = BatchWriter(client, batch_size=args.batch_size, input_display_value=True)
+        results = writer.patch_many('incident', incidents(client, users[0]['sys_id']))
+    elapsed = time.perf_counter() - start_time
+
+    failed = [result for result in results.values() if not result.ok]
+    for result in failed:
+        dead_letter.add(numbers.get(result.sys_id) or result.sys_id, f'http_{result.status}', result.error)
+    print(f"✅ Resolved {len(results) - len(failed)} incidents with {writer.batches} batch requests in {elapsed:.1f}s.")
+    if failed:
+        print(f"⚠️ {len(failed)} incidents moved to {dead_letter_path}.")
+
+if args.backend == 'api':
+    resolve_via_batch_api()
+    metrics.close()
+    exit()
+
+session_lease = None
+
+def start_browser(refreshed=False):
+    """
+    Start Edge with the user profile and log in, or lease a warm session from the session service.
+
+    Args:
+        refreshed: The slim profile snapshot was already taken again after a failed login
+
+    Returns:
+        The WebDriver, or None if the login failed
+    """
+    global session_lease
+    if args.session_service:
+        # Attach to a warm, already logged-in browser - no cold start and no login
+        session_lease = lease_session('resolve_incidents_edge')
+        new_driver = session_lease.driver
+    else:
+        # Set up Edge options
+        edge_options = webdriver.EdgeOptions()
+        if args.slim_profile:
+            # Private copy of the session files only - starts fast and does not lock the user profile
+            slim_profile.options(edge_options)
+        else:
+            edge_options.add_argument(f'user-data-dir={edge_profile_path}')
+            edge_options.add_argument('profile-directory=Default')
+
+        # Initialize WebDriver with 10-second wait timeout
+        if args.lean:
+            lean_options(edge_options)
+        new_driver = processes.start('edge', edge_options)
+        if args.slim_profile:
+            slim_profile.apply_cookies(new_driver)
+
+        try:
+            with metrics.span('login'):
+                new_driver.get(login_url)
+                # Look for and click the login option
+                # Note: Replace with your own login selector or method
+                next_button = WebDriverWait(new_driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-test-id='user@domain.com']")))
+                next_button.click()
+        except (NoSuchElementException, TimeoutException) as e:
+            print("Error during login process:", e)
+            retire_browser(new_driver)
+            if args.slim_profile and not refreshed:
+                # The session in the snapshot has expired - take it again from the user profile and retry once
+                slim_profile.refresh(keep_cookies=False)
+                return start_browser(refreshed=True)
+            return None
+        if args.slim_profile:
+            # Keep the freshest session cookies in the snapshot for the next start
+            slim_profile.capture(new_driver, login_url)
+
+    # Lean profile: fonts, images, avatars and analytics beacons are never downloaded
+    if args.lean:
+        enable_lean_network(new_driver)
+    return new_driver
+
+def retire_browser(old_driver):
+    """Quit a browser this script started and delete the slim profile copy it ran on."""
+    processes.quit(old_driver)
+    slim_profile.remove_clone(old_driver)
+
+def restart_browser():
+    """Replace a browser whose session died (recovery callback) and return the new driver."""
+    global driver, wait
+    try:
+        if session_lease:
+            session_lease.release()
+        else:
+            retire_browser(driver)
+    except Exception:
+        pass  # The old browser is already gone
+    new_driver = start_browser()
+    if not new_driver:
+        raise RuntimeError("Login failed after restarting the browser")
+    driver, wait = new_driver, WebDriverWait(new_driver, 10)
+    return driver
+
+# Stop only browsers left behind by crashed runs; the user's Edge and other running automations stay open
+processes.cleanup_orphans()
+
+driver = start_browser()
+if not driver:
+    slim_profile.remove_clones()
+    metrics.close()
+    exit()
+wait = WebDriverWait(driver, 10)
+
+# Opens classic UI pages; with --direct-nav the Next Experience shell is skipped when the instance allows it
+navigator = ClassicNavigator(driver, direct=args.direct_nav)
+
+# Local copy of the incident fields, synced with only the records changed since the last run (--mirror)
+mirror = RecordMirror() if args.mirror else None
+
+def resolve_candidates():
+    """
+    Yield the incidents to resolve: from the local mirror with --mirror, else from the list pages.
+
+    The mirror is synced through the browser's session first; the candidates are the active
+    incidents assigned to the logged-in user that are not resolved yet, selected locally.
+    """
+    if not mirror:
+        yield from iterate_list_records(navigator, incidents_url, fields=['number'])
+        return
+    mirror.sync_browser(navigator, incidents_url)
+    user_id = current_user_id(driver)
+    if not user_id and navigator.open(incidents_url):
+        user_id = current_user_id(driver)  # The login page does not expose the user; any list or form page does
+    if not user_id:
+        raise RuntimeError("Logged-in user could not be read from the page")
+    yield from mirror.records('incident', active=True, exclude_states=('Resolved', 'Closed', 'Canceled'),
+                              assigned_to_id=user_id)
+
+@metrics.timed('element_find')
+def find_element_safe(wait, by, value, timeout=10, web_driver=None):
     """
     Safely find an element with explicit wait.
     Returns None if element is not found within the timeout period.
+    web_driver selects a worker browser; the main driver is used by default.
     """
     try:
-        return WebDriverWait(driver, timeout).until(EC.presence_of_element_located((by, value)))
+        return WebDriverWait(web_driver or driver, timeout).until(EC.presence_of_element_located((by, value)))
     except TimeoutException:
         return None
 
-def find_shadow_element(host, selector):
+@metrics.timed('record')
+def resolve_open_incident(web_driver, web_wait):
     """
-    Find an element inside a shadow DOM.
-    Returns None if element cannot be found.
+    Resolve the incident form currently open in a browser.
+
+    Sets the state to Resolved, fills the Resolution Information tab and saves the form.
+
+    Args:
+        web_driver: WebDriver showing the incident form
+        web_wait: WebDriverWait bound to that driver
+
+    Returns:
+        True if the form was saved, False if a required element was missing
     """
-    try:
-        shadow_root = driver.execute_script("return arguments[0].shadowRoot", host)
-        return shadow_root.find_element(By.CSS_SELECTOR, selector)
-    except Exception:
-        return None
+    # Change the state and fill in the resolution information
+    if not set_resolution(web_driver, web_wait, resolution_code, resolution_note):
+        return False
+
+    # Click update button to save changes; a save blocked by validation counts as a failure
+    if not submit_form(web_driver):
+        discard_form_changes(web_driver)
+        return False
+    print("✅ Incident resolved successfully.")
+    return True
 
-def click_element_safe(wait, element):
+def resolve_loaded_incident(web_driver, web_wait):
     """
-    Clicks an element using WebDriverWait with an explicit wait for clickability.
+    Resolve the incident form that was just opened, unless it is already resolved.
+
+    Returns:
+        'resolved' or 'skipped', or False if the form could not be resolved
     """
-    wait.until(EC.element_to_be_clickable(element)).click()
+    set_state = find_element_safe(web_wait, By.CSS_SELECTOR, "select#incident\\.state", web_driver=web_driver)
+    if set_state and Select(set_state).first_selected_option.text == "Resolved":
+        return 'skipped'
+    if resolve_open_incident(web_driver, web_wait):
+        return 'resolved'
+    return False
 
-def select_tab_by_text(wait, tab_text):
+def start_worker_driver(cookies):
     """
-    Selects a tab by its text content.
+    Start a headless Edge instance that reuses the main browser's session cookies.
+
+    Workers do not open the Edge user profile, so several of them can run next to
+    the main browser without profile lock conflicts.
     """
-    tab_headers = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "span.tab_header")))
-    for tab_header in tab_headers:
+    worker_options = webdriver.EdgeOptions()
+    worker_options.add_argument("--headless=new")
+    worker_options.add_argument("--window-size=1920,1080")
+    if args.lean:
+        lean_options(worker_options)
+    worker_driver = processes.start('edge', worker_options)
+    if args.lean:
+        enable_lean_network(worker_driver)
+
+    # Cookies can only be set for the domain that is currently loaded
+    worker_driver.get(f"{instance_url}/robots.txt")
+    for cookie in cookies:
+        cookie.pop('sameSite', None)
         try:
-            tab_element = tab_header.find_element(By.CSS_SELECTOR, "span.tabs2_tab")
-            
-            if tab_text in tab_element.text:
-                click_element_safe(wait, tab_element)
-                return  # Tab found and clicked, exit the function
+            worker_driver.add_cookie(cookie)
         except Exception as e:
-            print(f"Error processing tab: {e}")
-    raise Exception(f"Tab with text '{tab_text}' not found.")
+            print(f"⚠️ Could not copy cookie {cookie.get('name')}: {e}")
+    return worker_driver
+
+def resolve_worker(worker_id, work_queue, cookies, stats, stats_lock):
+    """
+    Worker loop: take sys_ids from the shared queue until the end marker (None) and resolve each one.
+
+    The queue hands every sys_id to exactly one worker, and incidents that are
+    already resolved when their form opens are skipped. A failing incident is retried
+    with backoff (a dead worker browser is replaced) before it goes to the dead-letter list.
+    Workers beyond the throttle's current limit wait for a slot, so the pool shrinks
+    while the instance is slow and grows back when it keeps up.
+    """
+    worker = {'driver': start_worker_driver(cookies)}
 
-# Main automation loop
-while True:
-    # Navigate to incidents list page
-    driver.get(incidents_url)
-    print("Incidents list page opened")
+    def restart_worker_driver():
+        try:
+            processes.quit(worker['driver'])
+        except Exception:
+            pass  # The old browser is already gone
+        worker['driver'] = start_worker_driver(cookies)
+        return worker['driver']
+
+    def resolve(sys_id):
+        worker_driver = worker['driver']
+        with metrics.span('form_load', sys_id), throttle.measure():
+            worker_driver.get(f"{instance_url}/incident.do?sys_id={sys_id}")
+            wait_for_form_load(worker_driver)
+        return resolve_loaded_incident(worker_driver, WebDriverWait(worker_driver, 10))
 
+    recovery = RecordRecovery(dead_letter, restart_driver=restart_worker_driver, retries=args.retries)
+    # A worker browser that grew past the memory watermark is swapped for a warm one started with the same cookies
+    worker_recycler = BrowserRecycler(lambda: start_worker_driver(cookies))
     try:
-        # Find shadow DOM host element (ServiceNow UI framework uses shadow DOM)
-        shadow_host = find_element_safe(wait, By.XPATH, "//*[starts-with(name(), 'macroponent')]")
-        if not shadow_host:
-            print("❌ Shadow DOM Host not found.")
-            break
+        while True:
+            sys_id = work_queue.get()
+            if sys_id is None:
+                break
+            worker['driver'] = worker_recycler.recycle(worker['driver'])
 
-        # Access iframe within shadow DOM
-        iframe = find_shadow_element(shadow_host, 'iframe')
-        if not iframe:
-            print("❌ iframe not found. Reloading...")
-            continue  # Reload page if iframe is missing
-        
-        # Switch to iframe containing the incident list
-        driver.switch_to.frame(iframe)
-        print("✅ Switched to iframe!")
-
-        # Find and click on the first incident in the list
-        incident_url = find_element_safe(wait, By.CSS_SELECTOR, "a.linked.formlink")
-        if not incident_url:
-            print("❌ No incidents found to process.")
-            break
-        
-        incident_url.click()
-        print("✅ Clicked on incident link.")
-        time.sleep(2)
-
-        # Find incident state dropdown
-        set_state = find_element_safe(wait, By.CSS_SELECTOR, "select#incident\\.state")
-        if not set_state:
-            print("❌ Incident state dropdown not found.")
-            break
+            # Only as many workers as the shared throttle allows work at the same time
+            with throttle.slot():
+                outcome = recovery.run(sys_id, lambda: resolve(sys_id)) or 'failed'
+            if mirror and outcome == 'resolved':
+                mirror.mark('incident', sys_id, 'resolve', {'state': 'Resolved'})
+            print(f"Worker {worker_id}: incident {sys_id} {outcome}.")
+            with stats_lock:
+                stats[outcome] += 1
+            if recovery.exhausted:
+                print(f"❌ Worker {worker_id}: too many incidents failed in a row, stopping.")
+                break
+    finally:
+        worker_recycler.close()
+        processes.quit(worker['driver'])
 
-        # Change incident state to "Resolved"
-        select_state = Select(set_state)
-        select_state.select_by_visible_text("Resolved")
-        print("✅ Changed state to Resolved.")
-        time.sleep(2)
-
-        # Switch to the Resolution Information tab
-        select_tab_by_text(wait, "Resolution Information")
-        print("✅ Switched to Resolution Information tab.")
-        time.sleep(2)
-
-        # Select resolution code
-        set_code = find_element_safe(wait, By.ID, "incident.close_code")
-        if not set_code:
-            print("❌ Resolution code dropdown not found.")
-            break
+def run_worker_pool(worker_count):
+    """
+    Resolve every incident of the list with a pool of parallel headless browsers
+    and report the aggregate throughput.
 
-        select_code = Select(set_code)
-        select_code.select_by_visible_text("Solution provided")
-        print("✅ Selected 'Solution provided' resolution code.")
-        time.sleep(2)
+    The main browser streams the list page by page (keyset paging on sys_id) into the
+    work queue while the workers are already resolving, so only one list page is held
+    at a time and the first forms open before the last page has been read.
+    """
+    if not navigator.open(incidents_url):
+        print("❌ Incident list could not be opened.")
+        return
+    cookies = driver.get_cookies()
+    driver.switch_to.default_content()
+    stats = {'resolved': 0, 'skipped': 0, 'failed': 0}
+    stats_lock = threading.Lock()
+    # The workers are the upper bound; the throttle starts at half of them and adapts
+    throttle.configure(max_limit=worker_count, initial=max(1, worker_count // 2))
 
-        # Add resolution notes
-        Resolution_note = find_element_safe(wait, By.CSS_SELECTOR, "textarea#incident\\.close_notes")
-        if not Resolution_note:
-            print("❌ Resolution notes field not found.")
-            break
+    start_time = time.perf_counter()
+    work_queue = queue.Queue()
+    with ThreadPoolExecutor(max_workers=worker_count) as executor:
+        futures = [executor.submit(resolve_worker, worker_id, work_queue, cookies, stats, stats_lock)
+                   for worker_id in range(1, worker_count + 1)]
+        queued = 0
+        try:
+            for row in resolve_candidates():
+                work_queue.put(row['sys_id'])
+                queued += 1
+            driver.switch_to.default_content()
+        except Exception as e:
+            print(f"❌ Incident list could not be read to the end: {e}")
+        finally:
+            # End markers, so the workers stop once the queue is drained
+            for _ in futures:
+                work_queue.put(None)
+        print(f"✅ {queued} incidents queued for {worker_count} workers.")
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Worker could not be started: {e}")
+    elapsed = time.perf_counter() - start_time
+
+    print(f"✅ Resolved {stats['resolved']}, skipped {stats['skipped']}, failed {stats['failed']} "
+          f"in {elapsed:.1f}s ({stats['resolved'] / elapsed * 3600:.0f} incidents/hour "
+          f"with {worker_count} workers, concurrency limit {throttle.status()['limit']} at the end).")
+    if dead_letter:
+        print(f"⚠️ {len(dead_letter)} incidents moved to {dead_letter_path}.")
+
+if args.workers > 0:
+    run_worker_pool(args.workers)
+    if mirror:
+        mirror.close()
+    if session_lease:
+        session_lease.release()
+    else:
+        processes.quit(driver)
+    slim_profile.remove_clones()
+    metrics.close()
+    exit()
 
-        # Add standardized closing note
-        Resolution_note.send_keys("لعدم رد العميل لاكثر من 3 مرات يرجي اغلاق التذكرة")
-        print("✅ Added resolution notes.")
-        time.sleep(2)
+def resolve_incident(record):
+    """Open one incident form directly and resolve it (sequential mode)."""
+    if not navigator.open(f"{instance_url}/incident.do?sys_id={record['sys_id']}"):
+        print(f"❌ Incident {record['number']} could not be opened.")
+        return False
+    wait_for_form_load(driver)
+    print(f"✅ Opened incident {record['number']}.")
+    return resolve_loaded_incident(driver, wait)
 
-        # Click update button to save changes
-        update_button = find_element_safe(wait, By.ID, "sysverb_update")
-        if not update_button:
-            print("❌ Update button not found.")
+recovery = RecordRecovery(dead_letter, navigator, restart_driver=restart_browser, retries=args.retries)
+
+# Swaps in a fresh browser between incidents once this one has grown past the memory watermark;
+# with --slim-profile the replacement is started and logged in ahead of time
+recycler = BrowserRecycler(start_browser, quit_browser=retire_browser, standby=args.slim_profile,
+                           enabled=not args.session_service)
+
+def recycle_browser():
+    """Replace the browser between records once it crossed the memory or renderer watermark."""
+    global driver, wait
+    new_driver = recycler.recycle(driver)
+    if new_driver is not driver:
+        driver, wait = new_driver, WebDriverWait(new_driver, 10)
+        navigator.reset(new_driver)
+
+# Main automation loop: stream the list page by page and resolve every incident on it
+try:
+    for record in resolve_candidates():
+        recycle_browser()
+        if recovery.run(record['number'], lambda: resolve_incident(record)) == 'resolved' and mirror:
+            mirror.mark('incident', record['sys_id'], 'resolve', {'state': 'Resolved'})
+        if recovery.exhausted:
+            print("❌ Too many incidents failed in a row, stopping.")
             break
-        
-        update_button.click()
-        print("✅ Clicked update button, incident resolved successfully.")
-        time.sleep(2)
+except Exception as e:
+    print(f"An error occurred: {e}")
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        break
+if dead_letter:
+    print(f"⚠️ {len(dead_letter)} incidents moved to {dead_letter_path}.")
+if mirror:
+    mirror.close()
 
 # Close the browser when finished
 print("❌ Script completed. Closing browser.")
-driver.quit()
\ No newline at end of file
+recycler.close()
+if session_lease:
+    session_lease.release()  # The browser stays warm in the session service
+else:
+    processes.quit(driver)
+slim_profile.remove_clones()
+metrics.close()
@@ -0,0 +1,333 @@
+"""
+ServiceNow Table API Client
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Lightweight client for the ServiceNow Table API (/api/now/table/<table>).
+It keeps a small pool of keep-alive HTTP connections so that thousands of reads and
+PATCHes can be sent without a browser and without reconnecting for every request.
+License: MIT
+"""
+
+import base64
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+from urllib.parse import urlencode, urlsplit, quote
+from servicenow_throttle import ERROR, THROTTLE_STATUSES, THROTTLED, parse_retry_after, throttle
+
+
+class TableAPIError(Exception):
+    """
+    Raised when the Table API answers with a non-2xx status.
+
+    Attributes:
+        status: HTTP status code returned by the instance
+        message: Error message extracted from the response body
+        headers: Response headers (used e.g. for Retry-After)
+    """
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class TableAPIClient:
+    """
+    Keep-alive client for the ServiceNow Table API.
+
+    Connections are reused from a pool, so the TCP/TLS handshake is paid once per
+    pooled connection instead of once per request. The client is safe to share
+    between threads.
+
+    Args:
+        instance_url: Base URL of the instance (e.g. https://your_instance.service-now.com)
+        username: Basic auth user (defaults to the SERVICENOW_USERNAME environment variable)
+        password: Basic auth password (defaults to the SERVICENOW_PASSWORD environment variable)
+        token: OAuth bearer token (defaults to SERVICENOW_TOKEN, used instead of basic auth)
+        pool_size: Maximum number of idle connections kept open
+        timeout: Socket timeout in seconds
+        limiter: AdaptiveLimiter fed with every response (defaults to the shared servicenow_throttle.throttle)
+        throttle_retries: How often a request answered with 429/503 is sent again after the requested pause
+    """
+
+    def __init__(self, instance_url, username=None, password=None, token=None, pool_size=4, timeout=30,
+                 limiter=None, throttle_retries=3):
+        parts = urlsplit(instance_url)
+        self.scheme = parts.scheme or 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.limiter = limiter or throttle
+        self.throttle_retries = throttle_retries
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        username = username or os.getenv('SERVICENOW_USERNAME')
+        password = password or os.getenv('SERVICENOW_PASSWORD')
+        token = token or os.getenv('SERVICENOW_TOKEN')
+
+        self.headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive',
+        }
+        if token:
+            self.headers['Authorization'] = f'Bearer {token}'
+        elif username and password:
+            credentials = base64.b64encode(f'{username}:{password}'.encode('utf-8')).decode('ascii')
+            self.headers['Authorization'] = f'Basic {credentials}'
+
+    def _new_connection(self):
+        """Open a new HTTP(S) connection to the instance."""
+        if self.scheme == 'http':
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self):
+        """Take an idle connection from the pool or open a new one."""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._new_connection()
+
+    def _release(self, connection):
+        """Return a connection to the pool, closing it if the pool is full."""
+        if self._closed:
+            connection.close()
+            return
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def request(self, method, path, params=None, body=None):
+        """
+        Send a request over a pooled connection and decode the JSON response.
+
+        A connection that was closed by the server while idle is replaced and the
+        request is sent once more. Every request holds a slot of the limiter and reports
+        its latency to it; when the instance sheds load (429/503) the request waits for
+        Retry-After and is sent again up to throttle_retries times.
+
+        Args:
+            method: HTTP method (GET, PATCH, POST, ...)
+            path: Path below the instance URL (e.g. /api/now/table/incident)
+            params: Optional dict of query string parameters
+            body: Optional JSON-serialisable request body
+
+        Returns:
+            Decoded JSON payload, or None for empty responses
+
+        Raises:
+            TableAPIError: If the instance answers with a non-2xx status
+        """
+        url = self.base_path + path
+        if params:
+            url += '?' + urlencode(params)
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+
+        for attempt in range(self.throttle_retries + 1):
+            # The slot is given back before a throttled request waits, so only as many retry as the new limit allows
+            with self.limiter.slot():
+                start_time = time.perf_counter()
+                try:
+                    payload = self._send(method, url, data)
+                except TableAPIError as e:
+                    if e.status in THROTTLE_STATUSES:
+                        retry_after = parse_retry_after(e.headers.get('Retry-After') or e.headers.get('retry-after'))
+                        self.limiter.observe(time.perf_counter() - start_time, THROTTLED, retry_after)
+                        if attempt < self.throttle_retries:
+                            continue
+                    elif e.status >= 500:
+                        self.limiter.observe(time.perf_counter() - start_time, ERROR)
+                    raise
+                except Exception:
+                    self.limiter.observe(time.perf_counter() - start_time, ERROR)
+                    raise
+                self.limiter.observe(time.perf_counter() - start_time)
+                return payload
+
+    def _send(self, method, url, data):
+        """Send one request, replacing a pooled connection the server dropped while idle."""
+        for attempt in range(2):
+            connection = self._acquire()
+            try:
+                connection.request(method, url, body=data, headers=self.headers)
+                response = connection.getresponse()
+                raw = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                    http.client.CannotSendRequest, http.client.BadStatusLine):
+                # Idle keep-alive connection was dropped by the server - retry on a fresh one
+                connection.close()
+                if attempt == 1:
+                    raise
+                continue
+            except Exception:
+                connection.close()
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(connection)
+
+            try:
+                payload = json.loads(raw.decode('utf-8')) if raw else None
+            except ValueError:
+                # Load-shedding answers (429/503) can come back as an HTML page
+                if 200 <= response.status < 300:
+                    raise
+                payload = None
+            if not 200 <= response.status < 300:
+                message = response.reason
+                if isinstance(payload, dict) and isinstance(payload.get('error'), dict):
+                    message = payload['error'].get('message') or message
+                raise TableAPIError(response.status, message, dict(response.getheaders()))
+            return payload
+
+    def get_records(self, table, query=None, fields=None, limit=None, offset=None, display_value=None):
+        """
+        Read records from a table.
+
+        Args:
+            table: Table name (e.g. 'incident')
+            query: Encoded query string (sysparm_query)
+            fields: List of field names to return (sysparm_fields)
+            limit: Maximum number of records to return (sysparm_limit)
+            offset: Index of the first record to return (sysparm_offset)
+            display_value: 'true', 'false' or 'all' (sysparm_display_value)
+
+        Returns:
+            List of record dicts
+        """
+        params = {}
+        if query:
+            params['sysparm_query'] = query
+        if fields:
+            params['sysparm_fields'] = ','.join(fields)
+        if limit is not None:
+            params['sysparm_limit'] = limit
+        if offset is not None:
+            params['sysparm_offset'] = offset
+        if display_value is not None:
+            params['sysparm_display_value'] = display_value
+        params['sysparm_exclude_reference_link'] = 'true'
+        payload = self.request('GET', f'/api/now/table/{quote(table)}', params=params)
+        return payload.get('result', []) if payload else []
+
+    def get_record(self, table, sys_id, fields=None, display_value=None):
+        """
+        Read a single record by sys_id.
+
+        Returns:
+            Record dict
+        """
+        params = {'sysparm_exclude_reference_link': 'true'}
+        if fields:
+            params['sysparm_fields'] = ','.join(fields)
+        if display_value is not None:
+            params['sysparm_display_value'] = display_value
+        payload = self.request('GET', f'/api/now/table/{quote(table)}/{quote(sys_id)}', params=params)
+        return payload.get('result', {}) if payload else {}
+
+    def patch_record(self, table, sys_id, values, input_display_value=False, fields=None):
+        """
+        Update fields of a single record.
+
+        Args:
+            table: Table name (e.g. 'incident')
+            sys_id: sys_id of the record to update
+            values: Dict of field name to new value
+            input_display_value: Interpret reference values as display names
+                (e.g. an implementer's name instead of a sys_user sys_id)
+            fields: Fields to return in the response
+
+        Returns:
+            Updated record dict
+        """
+        params = {'sysparm_exclude_reference_link': 'true'}
+        if input_display_value:
+            params['sysparm_input_display_value'] = 'true'
+        if fields:
+            params['sysparm_fields'] = ','.join(fields)
+        payload = self.request('PATCH', f'/api/now/table/{quote(table)}/{quote(sys_id)}', params=params, body=values)
+        return payload.get('result', {}) if payload else {}
+
+    def close(self):
+        """Close all pooled connections."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def keyset_query(query, after_sys_id=None):
+    """
+    Rewrite an encoded query for keyset paging: ordered by sys_id, starting after the given one.
+
+    ORDERBY terms of the original query are dropped, because sys_id must be the only sort key.
+
+    Example:
+        keyset_query('active=true^ORDERBYDESCsys_created_on', 'abc') -> 'active=true^sys_id>abc^ORDERBYsys_id'
+    """
+    terms = [term for term in (query or '').split('^') if term and not term.startswith('ORDERBY')]
+    if after_sys_id:
+        terms.append(f'sys_id>{after_sys_id}')
+    terms.append('ORDERBYsys_id')
+    return '^'.join(terms)
+
+
+def iterate_records(source, table, query=None, fields=None, page_size=500, paging='keyset', start=None,
+                    on_page=None, **kwargs):
+    """
+    Lazily yield every record matching a query, one page in memory at a time.
+
+    Keyset paging (sys_id > last seen sys_id) keeps every page equally cheap and does not
+    skip or repeat records when earlier records are updated out of the query while the
+    caller works through them. Offset paging keeps the query's own sort order.
+
+    Args:
+        source: TableAPIClient, or anything with the same get_records() (e.g. BrowserTablePoller)
+        table: Table name (e.g. 'incident')
+        query: Encoded query string
+        fields: Fields to return (sys_id is added for keyset paging)
+        page_size: Records per request (sysparm_limit)
+        paging: 'keyset' or 'offset'
+        start: Resume position - the last sys_id (keyset) or record offset (offset) of a previous run
+        on_page: Optional callback receiving the resume position after each page has been yielded
+        **kwargs: Passed through to get_records() (e.g. display_value='true')
+    """
+    if paging not in ('keyset', 'offset'):
+        raise ValueError(f"unknown paging mode: {paging}")
+    if fields and 'sys_id' not in fields:
+        fields = ['sys_id'] + list(fields)
+    position = start or (0 if paging == 'offset' else None)
+    while True:
+        if paging == 'keyset':
+            page = source.get_records(table, query=keyset_query(query, position), fields=fields, limit=page_size, **kwargs)
+        else:
+            page = source.get_records(table, query=query, fields=fields, limit=page_size, offset=position, **kwargs)
+        if not page:
+            return
+        for record in page:
+            yield record
+        position = page[-1]['sys_id'] if paging == 'keyset' else position + len(page)
+        if on_page:
+            on_page(position)
+        if len(page) < page_size:
+            return
@@ -0,0 +1,195 @@
+"""
+ServiceNow Batch API Writer
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Packs many Table API PATCHes into /api/now/v1/batch requests, so identical
+updates repeated per record (resolutions, follow-up work notes) cost one HTTP round-trip
+per batch instead of one per record. Every sub-request is mapped back to the sys_id it was
+sent for; sub-requests that failed or were left unserviced are sent again one by one, and
+a batch the instance rejects as a whole falls back to single PATCHes.
+License: MIT
+
+Configuration (environment variables):
+    SERVICENOW_BATCH_SIZE=100   Sub-requests per Batch API call
+
+Usage:
+    with TableAPIClient(instance_url) as client:
+        writer = BatchWriter(client, input_display_value=True)
+        results = writer.patch_many('incident', ((sys_id, {'work_notes': 'Any updates?'}) for sys_id in sys_ids))
+        failed = [sys_id for sys_id, result in results.items() if not result.ok]
+"""
+
+import base64
+import json
+import os
+from urllib.parse import urlencode, quote
+from servicenow_api import TableAPIError
+from servicenow_metrics import metrics
+
+BATCH_PATH = '/api/now/v1/batch'
+
+# Sub-request statuses a single retry cannot change (bad payload, no access, record deleted)
+PERMANENT_STATUSES = (400, 401, 403, 404)
+
+
+class BatchResult:
+    """
+    Outcome of the write for one record.
+
+    Attributes:
+        sys_id: Record the write was sent for
+        status: HTTP status of the sub-request or single retry (0 if it was never serviced)
+        record: Returned record fields on success
+        error: Error message on failure
+        retried: True if the batch sub-request failed and the write was sent again on its own
+    """
+
+    def __init__(self, sys_id, status, record=None, error=None, retried=False):
+        self.sys_id = sys_id
+        self.status = status
+        self.record = record
+        self.error = error
+        self.retried = retried
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+
+class BatchWriter:
+    """
+    Bulk PATCH writer on top of a TableAPIClient.
+
+    The batch request itself goes through client.request(), so it holds a slot of the shared
+    throttle and is sent again after Retry-After when the instance answers 429/503.
+
+    Args:
+        client: TableAPIClient of the instance
+        batch_size: Sub-requests per Batch API call (defaults to SERVICENOW_BATCH_SIZE)
+        input_display_value: Interpret the values as display values (e.g. state 'Resolved', a user's name)
+        fields: Fields returned for every updated record
+    """
+
+    def __init__(self, client, batch_size=None, input_display_value=False, fields=None):
+        self.client = client
+        self.batch_size = max(1, batch_size or int(os.getenv('SERVICENOW_BATCH_SIZE', '100')))
+        self.input_display_value = input_display_value
+        self.fields = fields or ['sys_id']
+        self.batches = 0
+        self.available = True
+
+    def _params(self):
+        params = {'sysparm_exclude_reference_link': 'true', 'sysparm_fields': ','.join(self.fields)}
+        if self.input_display_value:
+            params['sysparm_input_display_value'] = 'true'
+        return params
+
+    def patch_many(self, table, updates, on_batch=None):
+        """
+        Apply field values to many records.
+
+        Args:
+            table: Table name (e.g. 'incident')
+            updates: Iterable of (sys_id, values) pairs; consumed one batch at a time, so it may be a
+                generator streaming the records from the instance
+            on_batch: Optional callback receiving the dict of BatchResults of each batch once it is written
+                (e.g. to journal the records right away)
+
+        Returns:
+            Dict of sys_id to BatchResult, in the order the updates were given
+        """
+        results = {}
+        chunk = []
+        for sys_id, values in updates:
+            chunk.append((sys_id, values))
+            if len(chunk) >= self.batch_size:
+                results.update(self._write_chunk(table, chunk, on_batch))
+                chunk = []
+        if chunk:
+            results.update(self._write_chunk(table, chunk, on_batch))
+        return results
+
+    def _write_chunk(self, table, chunk, on_batch=None):
+        """Send one batch and retry its failed sub-requests on their own."""
+        results = self._send_batch(table, chunk)
+        values_by_id = dict(chunk)
+        for sys_id, result in list(results.items()):
+            if not result.ok and result.status not in PERMANENT_STATUSES:
+                results[sys_id] = self._patch_single(table, sys_id, values_by_id[sys_id])
+        succeeded = sum(1 for result in results.values() if result.ok)
+        print(f"✅ Batch {self.batches}: {succeeded} of {len(chunk)} {table} records updated.")
+        if on_batch:
+            on_batch(results)
+        return results
+
+    def _send_batch(self, table, chunk):
+        """POST one Batch API request; returns a BatchResult per sys_id (status 0 for unserviced ones)."""
+        if not self.available:
+            return {sys_id: BatchResult(sys_id, 0, error='batch API not available') for sys_id, _ in chunk}
+        self.batches += 1
+        query = urlencode(self._params())
+        ids = {}
+        rest_requests = []
+        for index, (sys_id, values) in enumerate(chunk):
+            request_id = str(index + 1)
+            ids[request_id] = sys_id
+            rest_requests.append({
+                'id': request_id,
+                'method': 'PATCH',
+                'url': f'/api/now/table/{quote(table)}/{quote(sys_id)}?{query}',
+                'headers': [{'name': 'Content-Type', 'value': 'application/json'},
+                            {'name': 'Accept', 'value': 'application/json'}],
+                'body': base64.b64encode(json.dumps(values).encode('utf-8')).decode('ascii'),
+            })
+
+        with metrics.span('batch', f'{table}:{len(chunk)}') as span:
+            try:
+                payload = self.client.request('POST', BATCH_PATH, body={
+                    'batch_request_id': str(self.batches), 'rest_requests': rest_requests}) or {}
+            except TableAPIError as e:
+                # Batch API disabled or the request refused as a whole - every record is sent on its own
+                span.fail(f'http_{e.status}')
+                if e.status in (400, 403, 404):
+                    # The endpoint is missing or not allowed for this user - do not try it for the next batches
+                    self.available = False
+                print(f"⚠️ Batch request failed ({e}), sending its {len(chunk)} updates one by one.")
+                return {sys_id: BatchResult(sys_id, 0, error=str(e)) for sys_id, _ in chunk}
+
+            results = {sys_id: BatchResult(sys_id, 0, error='unserviced') for sys_id, _ in chunk}
+            for served in payload.get('serviced_requests', []):
+                sys_id = ids.get(str(served.get('id')))
+                if sys_id is None:
+                    continue
+                body = self._decode(served.get('body'))
+                status = int(served.get('status_code') or 0)
+                if 200 <= status < 300:
+                    results[sys_id] = BatchResult(sys_id, status, record=(body or {}).get('result'))
+                else:
+                    error = ((body or {}).get('error') or {}).get('message') or served.get('status_text')
+                    results[sys_id] = BatchResult(sys_id, status, error=error)
+            if any(not result.ok for result in results.values()):
+                span.fail('partial')
+        return results
+
+    @staticmethod
+    def _decode(body):
+        """Decode the base64 JSON body of a serviced sub-request (None if empty or unreadable)."""
+        if not body:
+            return None
+        try:
+            return json.loads(base64.b64decode(body).decode('utf-8'))
+        except ValueError:
+            return None
+
+    def _patch_single(self, table, sys_id, values):
+        """Send one failed sub-request again as a single Table API PATCH."""
+        with metrics.span('batch_retry', sys_id) as span:
+            try:
+                record = self.client.patch_record(table, sys_id, values, input_display_value=self.input_display_value,
+                                                  fields=self.fields)
+            except TableAPIError as e:
+                span.fail(f'http_{e.status}')
+                return BatchResult(sys_id, e.status, error=e.message, retried=True)
+            except Exception as e:
+                span.fail('error')
+                return BatchResult(sys_id, 0, error=str(e), retried=True)
+        return BatchResult(sys_id, 200, record=record, retried=True)
@@ -0,0 +1,139 @@
+"""
+ServiceNow Processed-Record Journal
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Persistent journal of the records a workflow has already handled (sys_id,
+action, timestamp) plus a cursor over the pages of a classic list. Records handled within
+the skip window are passed over without opening their form, and a restarted run resumes
+from the list page where the previous one stopped.
+License: MIT
+"""
+
+import json
+import os
+import threading
+import time
+from servicenow_list import iterate_list_records
+
+
+class ProcessedJournal:
+    """
+    Append-only JSONL journal of handled records and list cursors.
+
+    Each line is either {"sys_id", "action", "ts"} for a handled record or
+    {"cursor", "action", "ts"} for the list position a workflow has reached.
+    Entries older than the window are dropped when the journal is opened.
+
+    Args:
+        path: JSONL file the journal is stored in
+        window: Seconds a handled record is skipped for (e.g. 24h for a daily follow-up)
+    """
+
+    def __init__(self, path, window=24 * 3600):
+        self.path = path
+        self.window = window
+        self.lock = threading.Lock()
+        self.handled = {}
+        self.cursors = {}
+        self._load()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        """Read the journal and rewrite it without the expired entries."""
+        if not os.path.exists(self.path):
+            return
+        cutoff = time.time() - self.window
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # A line cut off by a crash is ignored
+                if entry.get('ts', 0) < cutoff:
+                    continue
+                if 'cursor' in entry:
+                    self.cursors[entry['action']] = (entry['cursor'], entry['ts'])
+                else:
+                    self.handled[(entry['action'], entry['sys_id'])] = entry['ts']
+
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for (action, sys_id), ts in self.handled.items():
+                f.write(json.dumps({'sys_id': sys_id, 'action': action, 'ts': ts}) + '\n')
+            for action, (cursor, ts) in self.cursors.items():
+                f.write(json.dumps({'cursor': cursor, 'action': action, 'ts': ts}) + '\n')
+        os.replace(temp_path, self.path)
+
+    def _append(self, entry):
+        self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+
+    def seen(self, sys_id, action):
+        """True if the action was applied to the record within the window."""
+        return self.handled_at(sys_id, action) is not None
+
+    def handled_at(self, sys_id, action):
+        """Timestamp the action was last applied to the record at (None if not within the window)."""
+        with self.lock:
+            ts = self.handled.get((action, sys_id))
+        return ts if ts is not None and time.time() - ts < self.window else None
+
+    def record(self, sys_id, action):
+        """Remember that the action was applied to the record."""
+        ts = round(time.time(), 3)
+        with self.lock:
+            self.handled[(action, sys_id)] = ts
+            self._append({'sys_id': sys_id, 'action': action, 'ts': ts})
+
+    def cursor(self, action):
+        """List position the action had reached (0 if it finished its last pass or never ran)."""
+        with self.lock:
+            return self.cursors.get(action, (0, 0))[0]
+
+    def set_cursor(self, action, offset):
+        """Persist the list position (row offset or last sys_id) the action has reached."""
+        ts = round(time.time(), 3)
+        with self.lock:
+            self.cursors[action] = (offset, ts)
+            self._append({'cursor': offset, 'action': action, 'ts': ts})
+
+    def reset(self):
+        """Forget every handled record and cursor."""
+        with self.lock:
+            self.handled.clear()
+            self.cursors.clear()
+            self.file.close()
+            self.file = open(self.path, 'w', encoding='utf-8')
+
+    def close(self):
+        self.file.close()
+
+
+def iterate_list(navigator, list_url, journal, action, table='incident', fields=None, paging='keyset'):
+    """
+    Yield the rows of a classic list page by page, skipping records already journaled for the action.
+
+    The list is streamed with iterate_list_records and its resume position (last sys_id for
+    keyset paging, row offset for offset paging) is journaled after every page, so a restarted
+    run continues from the page it stopped on. A finished pass resets the cursor, so the next
+    run starts from the top and only picks up records that are new or out of the window.
+
+    Args:
+        navigator: ClassicNavigator used to open and read the list pages
+        list_url: List URL (nav_to.do or classic)
+        journal: ProcessedJournal instance
+        action: Action name the records are journaled under (e.g. 'work_note')
+        table: Table name used in the list row ids
+        fields: Fields read from each row (see snapshot_list)
+        paging: 'keyset' or 'offset' (see iterate_list_records)
+    """
+    cursor = journal.cursor(action)
+    # A cursor journaled under the other paging mode cannot be resumed from
+    if (paging == 'keyset') != isinstance(cursor, str):
+        cursor = None
+    if cursor:
+        print(f"↪ Resuming '{action}' after list position {cursor}.")
+    for row in iterate_list_records(navigator, list_url, table=table, fields=fields, paging=paging,
+                                    start=cursor, on_page=lambda position: journal.set_cursor(action, position)):
+        if not journal.seen(row['sys_id'], action):
+            yield row
+    journal.set_cursor(action, 0)
@@ -0,0 +1,189 @@
+"""
+ServiceNow Lean Browser Profile
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Cuts the page weight of headless runs. Fonts, images, avatar thumbnails and
+analytics beacons that no script reads are blocked through DevTools Network.setBlockedURLs,
+and the browser is started without image decoding and remote fonts. A compare mode loads
+pages with and without the blocklist and reports bytes saved and the load-time delta.
+License: MIT
+
+Usage:
+    python servicenow_lean.py --compare "https://your_instance.service-now.com/incident_list.do"
+"""
+
+import argparse
+import os
+from servicenow_nav import ClassicNavigator
+
+# URL patterns (DevTools wildcard syntax) that classic list and form pages load but the scripts never use.
+# Stylesheets are deliberately kept - element visibility and clickability depend on them.
+# Run the compare mode after instance upgrades: it lists the heaviest requests that are still loaded.
+LEAN_BLOCKLIST = [
+    # Web fonts and icon fonts
+    '*.woff2*', '*.woff?*', '*.woff', '*.ttf*', '*.eot*',
+    # Images, avatars and attachment thumbnails
+    '*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.svg*', '*.ico*', '*.webp*', '*.iix*',
+    '*/sys_attachment.do?*thumbnail*', '*/live_profile*',
+    # Analytics and telemetry beacons
+    '*google-analytics.com*', '*googletagmanager.com*', '*/api/now/uxanalytics*', '*/xmlstats.do*',
+    '*/api/now/ui/user_analytics*',
+]
+
+# Next Experience shell bundles - only safe when classic pages are loaded directly (--direct-nav),
+# because the macroponent shell cannot render its iframe without them
+SHELL_BUNDLE_PATTERNS = [
+    '*/uxasset/externals/*', '*/uxasset/*', '*/now/nav/ui/*', '*/scripts/polaris*',
+]
+
+# Sums what the current document and its sub-resources transferred, from the Performance API
+PAGE_WEIGHT_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var bytes = nav ? nav.transferSize : 0;
+var heaviest = [];
+for (var i = 0; i < resources.length; i++) {
+    bytes += resources[i].transferSize || 0;
+    heaviest.push([resources[i].transferSize || 0, resources[i].name]);
+}
+heaviest.sort(function (a, b) { return b[0] - a[0]; });
+return {
+    bytes: bytes,
+    requests: resources.length + 1,
+    load_ms: nav ? Math.round((nav.loadEventEnd || performance.now()) - nav.startTime) : null,
+    heaviest: heaviest.slice(0, 5)
+};
+"""
+
+
+def lean_options(options):
+    """
+    Add the lean start-up switches to Edge/Chrome options (no image decoding, no remote fonts).
+
+    Args:
+        options: webdriver.EdgeOptions or webdriver.ChromeOptions
+
+    Returns:
+        The same options object
+    """
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    options.add_argument('--disable-remote-fonts')
+    options.add_argument('--disable-background-networking')
+    options.add_argument('--disable-component-update')
+    options.add_argument('--disable-sync')
+    return options
+
+
+def enable_lean_network(driver, block_shell_bundles=False, extra_patterns=()):
+    """
+    Block the lean URL patterns for every page the driver loads from now on.
+
+    Works on freshly started and on attached (session service) Chromium drivers.
+
+    Args:
+        driver: Edge or Chrome WebDriver
+        block_shell_bundles: Also block the Next Experience shell bundles (only with direct navigation)
+        extra_patterns: Additional instance-specific URL patterns
+
+    Returns:
+        The list of patterns that is blocked
+    """
+    patterns = list(LEAN_BLOCKLIST)
+    if block_shell_bundles or os.getenv('SERVICENOW_LEAN_BLOCK_SHELL', '0') == '1':
+        patterns += SHELL_BUNDLE_PATTERNS
+    patterns += list(extra_patterns)
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    return patterns
+
+
+def disable_lean_network(driver):
+    """Stop blocking requests."""
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': []})
+
+
+def page_weight(driver):
+    """
+    Bytes, request count and load time of the document the driver is switched to.
+
+    Returns:
+        Dict with bytes, requests, load_ms and the five heaviest resources ([size, url] pairs)
+    """
+    return driver.execute_script(PAGE_WEIGHT_SCRIPT)
+
+
+def compare_page_weight(driver, navigator, urls, block_shell_bundles=False):
+    """
+    Load every URL once without and once with the blocklist (cold cache each time) and report the difference.
+
+    Returns:
+        List of dicts with url, full and lean page weights, bytes_saved and load_ms_delta
+    """
+    results = []
+    for url in urls:
+        weights = {}
+        for mode in ('full', 'lean'):
+            if mode == 'lean':
+                # Shell bundles can only go when the first load showed that direct loads are allowed
+                enable_lean_network(driver, block_shell_bundles and navigator.direct_allowed is True)
+            else:
+                driver.execute_cdp_cmd('Network.enable', {})
+                disable_lean_network(driver)
+            driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+            if not navigator.open(url):
+                print(f"❌ {url} could not be opened ({mode}).")
+                break
+            weights[mode] = page_weight(driver)
+        else:
+            full, lean = weights['full'], weights['lean']
+            result = {
+                'url': url,
+                'full': full,
+                'lean': lean,
+                'bytes_saved': full['bytes'] - lean['bytes'],
+                'load_ms_delta': (lean['load_ms'] or 0) - (full['load_ms'] or 0),
+            }
+            results.append(result)
+            print(f"✅ {url}")
+            print(f"   {full['bytes'] / 1024:.0f} KB in {full['requests']} requests, {full['load_ms']} ms -> "
+                  f"{lean['bytes'] / 1024:.0f} KB in {lean['requests']} requests, {lean['load_ms']} ms "
+                  f"(saved {result['bytes_saved'] / 1024:.0f} KB, {result['load_ms_delta']:+d} ms)")
+            for size, name in lean['heaviest']:
+                print(f"   still loaded: {size / 1024:.0f} KB {name}")
+    disable_lean_network(driver)
+    return results
+
+
+if __name__ == '__main__':
+    from selenium import webdriver
+    from servicenow_processes import processes
+    from servicenow_session import edge_profile_path, lease_session, login
+
+    parser = argparse.ArgumentParser(description="Measure how much the lean profile saves on ServiceNow pages")
+    parser.add_argument('--compare', nargs='+', required=True, metavar='URL', help="Pages to load with and without the blocklist")
+    parser.add_argument('--session-service', action='store_true',
+                        help="Lease a warm, logged-in browser from servicenow_session.py")
+    parser.add_argument('--direct-nav', action='store_true',
+                        help="Load classic UI pages directly (also blocks the Next Experience shell bundles)")
+    args = parser.parse_args()
+
+    session_lease = None
+    if args.session_service:
+        session_lease = lease_session('servicenow_lean')
+        driver = session_lease.driver
+    else:
+        edge_options = webdriver.EdgeOptions()
+        edge_options.add_argument(f'user-data-dir={edge_profile_path}')
+        edge_options.add_argument('profile-directory=Default')
+        edge_options.add_argument('--headless=new')
+        edge_options.add_argument('--window-size=1920,1080')
+        driver = processes.start('edge', edge_options)
+        login(driver)
+
+    try:
+        compare_page_weight(driver, ClassicNavigator(driver, direct=args.direct_nav), args.compare,
+                            block_shell_bundles=args.direct_nav)
+    finally:
+        if session_lease:
+            session_lease.release()
+        else:
+            processes.quit(driver)
@@ -0,0 +1,203 @@
+"""
+ServiceNow List Snapshot
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Reads every row of a classic UI list (incident_list.do, label_list.do, ...)
+with a single execute_script call, so routing decisions can be made in Python without
+one WebDriver round-trip per cell. Columns are located by the list header, never by a
+fixed position; the field-to-column map of every list view is cached for lists whose
+header cannot be read.
+License: MIT
+"""
+
+import logging
+import threading
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from servicenow_api import keyset_query
+from servicenow_metrics import metrics
+from servicenow_nav import list_param, with_list_params
+
+logger = logging.getLogger(__name__)
+
+# Fields read for every incident row by default
+INCIDENT_FIELDS = ['number', 'assignment_group', 'assigned_to', 'state', 'sys_updated_on']
+
+# Returns null while the list is still rendering, otherwise {columns: {field: nth-child}, view, header, rows: [...]}
+LIST_SNAPSHOT_SCRIPT = """
+var table = arguments[0], fields = arguments[1], known = arguments[2] || {};
+var rows = document.querySelectorAll("tr[id^='row_" + table + "_']");
+if (!rows.length && !document.querySelector('.list2_no_records, table.list2_table')) {
+    return null;
+}
+var view = new URLSearchParams(location.search).get('sysparm_view') || 'default';
+
+// Map field names to column positions (1-based, as used by :nth-child) from the list header:
+// the column's name attribute, else its label ("Assigned to" -> assigned_to)
+var columns = {}, header = false;
+var headers = document.querySelectorAll("tr.list_header th, table.list2_table thead th");
+for (var h = 0; h < headers.length; h++) {
+    var th = headers[h];
+    var name = th.getAttribute('name') || th.getAttribute('glide_field') ||
+        th.textContent.trim().toLowerCase().replace(/[^a-z0-9]+/g, '_').replace(/^_|_$/g, '');
+    if (!name || name in columns) continue;
+    columns[name] = Array.prototype.indexOf.call(th.parentNode.children, th) + 1;
+    header = true;
+}
+// Without a readable header use the map cached for this view (or the caller's fallback) - never a mix
+if (!header) columns = known[view] || known['*'] || {};
+
+var result = [];
+for (var r = 0; r < rows.length; r++) {
+    var row = rows[r];
+    var record = {
+        row_id: row.id,
+        sys_id: row.getAttribute('sys_id') || row.id.substring(('row_' + table + '_').length)
+    };
+    for (var f = 0; f < fields.length; f++) {
+        var index = columns[fields[f]];
+        var cell = index ? row.children[index - 1] : null;
+        record[fields[f]] = cell ? cell.textContent.trim() : null;
+    }
+    if (!record.number) {
+        var link = row.querySelector('a.linked.formlink, a.formlink');
+        if (link) record.number = link.textContent.trim();
+    }
+    result.push(record);
+}
+return {columns: columns, view: view, header: header, rows: result};
+"""
+
+
+class ColumnCache:
+    """
+    Field name to column position maps of the list views seen in this run, per table and sysparm_view.
+
+    Filled from every list header that could be read; used for a list of the same view whose
+    header could not be read, so cells are still found by field name instead of a guessed position.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def set(self, table, view, columns):
+        with self.lock:
+            self.views[(table, view)] = dict(columns)
+
+    def for_table(self, table):
+        """All cached maps of a table, keyed by view."""
+        with self.lock:
+            return {view: dict(columns) for (cached_table, view), columns in self.views.items() if cached_table == table}
+
+
+# Column maps shared by every list snapshot of the process
+column_cache = ColumnCache()
+
+
+def snapshot_list(driver, table='incident', fields=None, fallback_columns=None, timeout=10):
+    """
+    Read all rows of the list currently shown in the driver's document in one round-trip.
+
+    Columns come from the list header. A list whose header cannot be read uses the map
+    cached for its view (sysparm_view), and only then fallback_columns. A field found in
+    none of them is returned as None rather than read from another column.
+
+    Args:
+        driver: WebDriver switched into the document that shows the list
+        table: Table name used in the row ids (row_<table>_<sys_id>)
+        fields: Field names to read (defaults to INCIDENT_FIELDS)
+        fallback_columns: Optional {field: nth-child index} used when no header has been read for the view
+        timeout: Seconds to wait for the list to render
+
+    Returns:
+        Tuple (columns, rows): columns maps field names to nth-child indexes, rows is a list of
+        dicts with row_id, sys_id and one entry per field. Both are empty if the list did not render.
+    """
+    fields = fields or INCIDENT_FIELDS
+    known = column_cache.for_table(table)
+    if fallback_columns:
+        known['*'] = fallback_columns
+    with metrics.span('list_snapshot') as span:
+        try:
+            snapshot = WebDriverWait(driver, timeout, poll_frequency=0.1,
+                                     ignored_exceptions=(WebDriverException,)).until(
+                lambda d: d.execute_script(LIST_SNAPSHOT_SCRIPT, table, fields, known))
+        except TimeoutException:
+            span.fail()
+            return {}, []
+        if snapshot['header']:
+            column_cache.set(table, snapshot['view'], snapshot['columns'])
+        elif snapshot['rows']:
+            span.fail('no_header')
+    return snapshot['columns'], snapshot['rows']
+
+
+def iterate_list_records(navigator, list_url, table='incident', fields=None, paging='keyset', start=None,
+                         on_page=None):
+    """
+    Lazily yield the rows of a classic list across all of its pages, one page in memory at a time.
+
+    Keyset paging re-filters the list to sys_id > last seen sys_id (ordered by sys_id), so rows
+    that drop out of the list while the caller works on them - assigned, resolved - do not make
+    later rows shift onto an already visited page. Offset paging walks sysparm_first_row and
+    keeps the list's own sort order. Rows are snapshots: the caller may navigate away before
+    taking the next one. Pages are read through navigator.driver, so a browser replaced by
+    the recovery layer is used from the next page on.
+
+    Args:
+        navigator: ClassicNavigator used to open and read the list pages
+        list_url: List URL (nav_to.do or classic); its sysparm_query is kept as the filter
+        table: Table name used in the row ids
+        fields: Fields read from each row (see snapshot_list)
+        paging: 'keyset' or 'offset'
+        start: Resume position - the last sys_id (keyset) or row offset (offset) of a previous run
+        on_page: Optional callback receiving the resume position after each page has been yielded
+    """
+    for _, _, rows in iterate_list_pages(navigator, list_url, table, fields, paging, start, on_page):
+        for row in rows:
+            yield row
+
+
+def iterate_list_pages(navigator, list_url, table='incident', fields=None, paging='keyset', start=None,
+                       on_page=None, fallback_columns=None):
+    """
+    Yield a classic list page by page, for callers that act on a whole page at once (e.g. list actions).
+
+    Same paging as iterate_list_records. The page is still shown in the driver when it is
+    yielded; after navigating away the caller can load it again from the yielded URL.
+
+    Args:
+        fallback_columns: Optional {field: nth-child index} (see snapshot_list); other arguments as above
+
+    Yields:
+        Tuple (url, columns, rows) per page, as returned by snapshot_list
+    """
+    if paging not in ('keyset', 'offset'):
+        raise ValueError(f"unknown paging mode: {paging}")
+    query = list_param(list_url, 'sysparm_query', '')
+    position = start or (0 if paging == 'offset' else None)
+    previous = set()
+    while True:
+        if paging == 'keyset':
+            url = with_list_params(list_url, sysparm_query=keyset_query(query, position), sysparm_first_row=1)
+        else:
+            url = with_list_params(list_url, sysparm_first_row=position + 1)
+        if not navigator.open(url):
+            logger.error("List page could not be opened: %s", url)
+            return
+        columns, rows = snapshot_list(navigator.driver, table=table, fields=fields, fallback_columns=fallback_columns)
+        page = {row['sys_id'] for row in rows}
+        # Past the end the instance shows an empty list or repeats the last page
+        if not rows or page <= previous:
+            return
+        previous = page
+        yield url, columns, rows
+        if paging == 'keyset':
+            last = max(page)
+            if position is not None and last <= position:
+                return
+            position = last
+        else:
+            position += len(rows)
+        if on_page:
+            on_page(position)
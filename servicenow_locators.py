@@ -0,0 +1,172 @@
+"""
+ServiceNow Locator Registry
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Named element locators with a fallback chain and a short timeout budget each.
+All candidates of a locator are tried in one execute_script call per poll, and a locator
+whose element is missing from a page that has finished loading (no AJAX in flight) fails
+after a short grace period instead of waiting out a multi-second timeout - so a changed
+layout shows up as a fast, named failure rather than a stalled run.
+License: MIT
+
+Configuration (environment variables):
+    SERVICENOW_LOCATOR_GRACE=0.3   Seconds a missing element is waited for once the page is idle
+
+Usage:
+    from servicenow_locators import locators
+    cell = locators.find(driver, 'list_cell', row_id=row['row_id'], column=columns['assigned_to'])
+    ok_button = locators.find(driver, 'list_edit_ok')
+"""
+
+import logging
+import os
+import threading
+import time
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import WebDriverException
+from servicenow_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Returns {element, index} for the first candidate that matches, else {element: null, settled}
+LOCATE_SCRIPT = """
+var candidates = arguments[0];
+for (var i = 0; i < candidates.length; i++) {
+    var by = candidates[i][0], value = candidates[i][1], element = null;
+    try {
+        if (by === 'id') element = document.getElementById(value);
+        else if (by === 'css selector') element = document.querySelector(value);
+        else if (by === 'xpath') element = document.evaluate(value, document, null,
+            XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    } catch (e) { element = null; }
+    if (element) return {element: element, index: i};
+}
+return {element: null, index: -1, settled: document.readyState === 'complete'
+    && (typeof Ajax === 'undefined' || !Ajax.activeRequestCount)
+    && (typeof jQuery === 'undefined' || !jQuery.active)};
+"""
+
+# How often a locator is polled while the page is still loading (seconds)
+POLL_FREQUENCY = 0.05
+
+
+class Locator:
+    """
+    One named element: candidate (By, value) pairs in order of preference and a timeout budget.
+
+    Values may contain {placeholders} filled from the keyword arguments of find().
+    """
+
+    def __init__(self, name, candidates, timeout):
+        self.name = name
+        self.candidates = candidates
+        self.timeout = timeout
+
+
+class LocatorRegistry:
+    """
+    Registry of named locators shared by the scripts.
+
+    Args:
+        grace: Seconds a missing element is waited for once the page is idle (defaults to SERVICENOW_LOCATOR_GRACE)
+    """
+
+    def __init__(self, grace=None):
+        self.grace = grace if grace is not None else float(os.getenv('SERVICENOW_LOCATOR_GRACE', '0.3'))
+        self.lock = threading.Lock()
+        self.locators = {}
+        self.fallbacks_reported = set()
+
+    def register(self, name, candidates, timeout=2):
+        """
+        Add or replace a locator.
+
+        Args:
+            name: Name used with find()
+            candidates: List of (By, value) pairs; later ones are fallbacks for older or changed layouts
+            timeout: Longest time in seconds the locator waits while the page is still busy
+        """
+        with self.lock:
+            self.locators[name] = Locator(name, candidates, timeout)
+
+    def find(self, driver, name, timeout=None, **params):
+        """
+        Find the element of a named locator.
+
+        Returns as soon as any candidate matches. Fails after the grace period once the page
+        is idle and nothing matches, and at the latest after the locator's timeout budget.
+
+        Args:
+            driver: WebDriver switched into the document to search
+            name: Registered locator name
+            timeout: Override of the locator's timeout budget (optional)
+            **params: Values for the {placeholders} of the candidates
+
+        Returns:
+            WebElement, or None if no candidate matched
+        """
+        locator = self.locators[name]
+        candidates = [(by, value.format(**params)) for by, value in locator.candidates]
+        deadline = time.monotonic() + (locator.timeout if timeout is None else timeout)
+        idle_since = None
+        with metrics.span('element_find', name) as span:
+            while True:
+                try:
+                    result = driver.execute_script(LOCATE_SCRIPT, candidates)
+                except WebDriverException:
+                    result = None  # The document is being replaced; try again on the next poll
+                if result and result.get('element') is not None:
+                    if result['index'] > 0:
+                        self._report_fallback(name, candidates[0], candidates[result['index']])
+                    return result['element']
+                now = time.monotonic()
+                if result and result.get('settled'):
+                    idle_since = idle_since or now
+                    if now - idle_since >= self.grace:
+                        span.fail('missing')
+                        return None
+                else:
+                    idle_since = None
+                if now >= deadline:
+                    span.fail('timeout')
+                    return None
+                time.sleep(POLL_FREQUENCY)
+
+    def _report_fallback(self, name, primary, fallback):
+        with self.lock:
+            if name in self.fallbacks_reported:
+                return
+            self.fallbacks_reported.add(name)
+        logger.warning("Locator '%s': %s no longer matches, using %s.", name, primary[1], fallback[1])
+
+
+# Locators shared by every script of the process
+locators = LocatorRegistry()
+
+# List rows and in-place (cell) editing
+locators.register('list_cell', [(By.CSS_SELECTOR, "tr[id='{row_id}'] > *:nth-child({column})")], timeout=1)
+locators.register('list_edit_input', [
+    (By.ID, 'sys_display.LIST_EDIT_{table}.{field}'),
+    (By.CSS_SELECTOR, "#cell_edit_window input[id^='sys_display.LIST_EDIT_']"),
+    # Any cell editor of the field, even if the table prefix of its id differs
+    (By.CSS_SELECTOR, "input[id^='sys_display.LIST_EDIT_'][id$='.{field}']"),
+], timeout=3)
+locators.register('list_edit_ok', [
+    (By.CSS_SELECTOR, 'a#cell_edit_ok'),
+    (By.CSS_SELECTOR, "#cell_edit_window a[id$='_ok'], #cell_edit_window button[id$='_ok']"),
+], timeout=3)
+
+# Forms
+locators.register('form_update', [
+    (By.ID, 'sysverb_update'),
+    (By.CSS_SELECTOR, "button[name='sysverb_update']"),
+    (By.ID, 'sysverb_update_bottom'),
+], timeout=5)
+locators.register('form_select_option', [
+    (By.XPATH, "//select[@id='{table}.{field}']/option[@value='{value}']"),
+    (By.XPATH, "//select[@id='{table}.{field}']/option[normalize-space()='{text}']"),
+    (By.XPATH, "//select[@name='{table}.{field}']/option[normalize-space()='{text}']"),
+], timeout=3)
+locators.register('form_reference_input', [
+    (By.ID, 'sys_display.{table}.{field}'),
+    (By.CSS_SELECTOR, "input[name='sys_display.{table}.{field}']"),
+], timeout=3)
@@ -0,0 +1,129 @@
+"""
+ServiceNow List Mass Update
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Applies one set of field values to many records with the classic list's
+"Update Selected" action. Records are grouped by the values they need, the rows of a
+group are ticked on the list page, and the multiple-record form that the action opens
+is filled and saved once - one server transaction per distinct target instead of one
+cell edit or form save per record.
+License: MIT
+
+Usage:
+    for changes, rows in group_by_target(plan, rows, lambda row: row['number'], desired_assignment):
+        updated = update_selected(navigator.driver, 'incident', [row['sys_id'] for row in rows],
+                                  lambda driver: set_assignee(driver, changes['assigned_to']))
+"""
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import Select
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+from servicenow_metrics import metrics
+from servicenow_stages import discard_form_changes, find_element_safe, submit_form
+from servicenow_waits import wait_for_form_load
+
+# Ticks the checkboxes of the given rows (and unticks every other row); returns the sys_ids ticked
+SELECT_ROWS_SCRIPT = """
+var table = arguments[0], wanted = {}, ticked = [];
+arguments[1].forEach(function (id) { wanted[id] = true; });
+var boxes = document.querySelectorAll("input[id^='check_" + table + "_']");
+for (var i = 0; i < boxes.length; i++) {
+    var box = boxes[i], id = box.id.substring(('check_' + table + '_').length);
+    if (box.checked !== !!wanted[id]) box.click();
+    if (box.checked) ticked.push(id);
+}
+return ticked;
+"""
+
+# Text of the list action that opens the multiple-record form
+UPDATE_SELECTED = 'Update Selected'
+
+
+def group_by_target(plan, records, key, desired):
+    """
+    Group the records that need a write by the field values they need.
+
+    Records already in the desired state are counted as skipped by the plan and left out.
+
+    Args:
+        plan: WritePlan of the workflow
+        records: Row dicts from snapshot_list()
+        key: Callable returning the record key for the plan (number, name, ...)
+        desired: Callable returning the desired state of a record (see WritePlan.changes)
+
+    Returns:
+        List of (changes, records) tuples, in the order the first record of each group appeared
+    """
+    groups = {}
+    for record in records:
+        changes = plan.changes(key(record), record, desired(record))
+        if changes:
+            target = tuple(sorted((field, repr(value)) for field, value in changes.items()))
+            groups.setdefault(target, (changes, []))[1].append(record)
+    return list(groups.values())
+
+
+def select_rows(driver, table, sys_ids):
+    """
+    Tick the list checkboxes of the given records on the list page shown in the driver.
+
+    Returns:
+        sys_ids of the rows that are ticked (records not on the page are missing)
+    """
+    return driver.execute_script(SELECT_ROWS_SCRIPT, table, list(sys_ids)) or []
+
+
+def open_update_selected(driver, table, sys_ids, timeout=10):
+    """
+    Tick the given rows and open the "Update Selected" form for them.
+
+    Args:
+        driver: WebDriver showing the list page
+        table: Table name used in the checkbox ids (check_<table>_<sys_id>)
+        sys_ids: Records to update
+        timeout: Seconds to wait for the multiple-record form
+
+    Returns:
+        sys_ids the form was opened for, or an empty list if no row could be ticked or the form did not load
+    """
+    ticked = select_rows(driver, table, sys_ids)
+    if not ticked:
+        print("❌ None of the rows to update are on the list page.")
+        return []
+    try:
+        actions = driver.find_element(By.CSS_SELECTOR, "select[id^='list_action']")
+        Select(actions).select_by_visible_text(UPDATE_SELECTED)
+    except (NoSuchElementException, WebDriverException) as e:
+        print(f"❌ '{UPDATE_SELECTED}' list action not available: {e}")
+        return []
+    # The action replaces the list page with the form; wait for its Update button, then for g_form
+    if not (find_element_safe(driver, By.ID, 'sysverb_update', timeout) and wait_for_form_load(driver, timeout)):
+        print(f"❌ '{UPDATE_SELECTED}' form did not load.")
+        return []
+    return ticked
+
+
+def update_selected(driver, table, sys_ids, fill_form, label=None):
+    """
+    Apply the same field values to a group of records with a single list action save.
+
+    Args:
+        driver: WebDriver showing the list page that holds the records
+        table: Table name (e.g. 'incident', 'label')
+        sys_ids: Records of one group (see group_by_target)
+        fill_form: Callable taking the driver that sets the target values on the open form; falsy result aborts
+        label: Name of the group used in the metrics (e.g. the target implementer)
+
+    Returns:
+        sys_ids the values were saved for, or an empty list if the update was not submitted
+    """
+    with metrics.span('mass_update', label) as span:
+        ticked = open_update_selected(driver, table, sys_ids)
+        if not ticked:
+            span.fail()
+            return []
+        if not fill_form(driver) or not submit_form(driver):
+            discard_form_changes(driver)
+            span.fail()
+            return []
+    print(f"✅ Updated {len(ticked)} {table} records in one save.")
+    return ticked
@@ -0,0 +1,258 @@
+"""
+ServiceNow Workflow Metrics
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Times every step of a workflow (login, list load, frame resolve, element
+find, edit, submit) and records its outcome. Spans are appended to a JSONL file and
+aggregated into per-workflow Prometheus histograms, written to a text file and optionally
+served on a /metrics endpoint.
+License: MIT
+
+Configuration (environment variables):
+    SERVICENOW_METRICS=0           Disable the JSONL and Prometheus exports (spans are still timed in memory)
+    SERVICENOW_METRICS_DIR=<path>  Directory for ServiceNow_Metrics.jsonl and ServiceNow_Metrics.prom
+                                   (defaults to the user profile, next to the other log files)
+    SERVICENOW_METRICS_PORT=<n>    Also serve the Prometheus text on http://127.0.0.1:<n>/metrics
+
+Usage:
+    from servicenow_metrics import metrics
+    metrics.configure('assign')
+    with metrics.span('submit') as span:
+        if not submit_form(driver):
+            span.fail()
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the duration histogram buckets
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Rewrite the Prometheus file after this many spans (it is always written on close)
+FLUSH_EVERY = 20
+
+
+class Span:
+    """One timed step; the outcome is 'ok' unless fail() is called or the step raises."""
+
+    def __init__(self, step, record=None):
+        self.step = step
+        self.record = record
+        self.outcome = 'ok'
+        self.duration = 0.0
+
+    def fail(self, outcome='failed'):
+        """Mark the step as unsuccessful without raising (e.g. an element that was not found)."""
+        self.outcome = outcome
+
+
+class Histogram:
+    """Cumulative-bucket duration histogram in the Prometheus layout."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.total += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class WorkflowMetrics:
+    """
+    Collects step spans for the running workflow and exports them.
+
+    A single module-level instance (`metrics`) is shared by the scripts and the shared
+    modules, so steps timed inside servicenow_nav or servicenow_stages are attributed
+    to the workflow that configured it.
+    """
+
+    def __init__(self):
+        self.workflow = 'unknown'
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.histograms = {}
+        self.outcomes = {}
+        self.events = {}
+        self.jsonl_file = None
+        self.prom_path = None
+        self.server = None
+        self.pending = 0
+
+    def configure(self, workflow, export_dir=None, port=None):
+        """
+        Name the workflow and open the exports.
+
+        Args:
+            workflow: Label used for every span (e.g. 'assign', 'resolve')
+            export_dir: Directory for the JSONL and Prometheus files (defaults to SERVICENOW_METRICS_DIR)
+            port: Port for the /metrics endpoint (defaults to SERVICENOW_METRICS_PORT, disabled if unset)
+        """
+        self.workflow = workflow
+        if os.getenv('SERVICENOW_METRICS', '1') == '0':
+            return
+        export_dir = export_dir or os.getenv('SERVICENOW_METRICS_DIR') or os.getenv('USERPROFILE', os.getcwd())
+        os.makedirs(export_dir, exist_ok=True)
+        self.jsonl_file = open(os.path.join(export_dir, 'ServiceNow_Metrics.jsonl'), 'a', encoding='utf-8')
+        self.prom_path = os.path.join(export_dir, 'ServiceNow_Metrics.prom')
+        port = port or os.getenv('SERVICENOW_METRICS_PORT')
+        if port:
+            self.serve(int(port))
+
+    @contextmanager
+    def span(self, step, record=None):
+        """
+        Time a step.
+
+        Args:
+            step: Step name (login, list_load, frame_resolve, element_find, edit, submit, ...)
+            record: Optional record identifier (number or sys_id) stored with the span
+        """
+        span = Span(step, record)
+        start_time = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.outcome = 'error'
+            raise
+        finally:
+            span.duration = time.perf_counter() - start_time
+            self.observe(span)
+
+    def timed(self, step):
+        """Decorator that times every call as a span, marked failed when the function returns a falsy value."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(step) as span:
+                    result = function(*args, **kwargs)
+                    if not result:
+                        span.fail()
+                    return result
+            return wrapper
+        return decorator
+
+    def observe(self, span):
+        """Aggregate a finished span and append it to the JSONL export."""
+        with self.lock:
+            key = (self.workflow, span.step)
+            self.histograms.setdefault(key, Histogram()).observe(span.duration)
+            outcome_key = key + (span.outcome,)
+            self.outcomes[outcome_key] = self.outcomes.get(outcome_key, 0) + 1
+            if self.jsonl_file:
+                entry = {'ts': round(time.time(), 3), 'workflow': self.workflow, 'step': span.step,
+                         'duration_s': round(span.duration, 4), 'outcome': span.outcome}
+                if span.record:
+                    entry['record'] = span.record
+                self.jsonl_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self.jsonl_file.flush()
+            self.pending += 1
+            flush = self.prom_path and self.pending >= FLUSH_EVERY
+        if flush:
+            self.write_prometheus()
+
+    def event(self, name, reason, **fields):
+        """
+        Record a point-in-time event that is counted, not timed (e.g. a change of the concurrency limit).
+
+        Args:
+            name: Event name (e.g. 'throttle')
+            reason: Why it happened, used as a label (e.g. 'increase', 'throttled')
+            **fields: Extra values stored with the JSONL entry (e.g. old and new limit)
+        """
+        with self.lock:
+            key = (self.workflow, name, reason)
+            self.events[key] = self.events.get(key, 0) + 1
+            if self.jsonl_file:
+                entry = {'ts': round(time.time(), 3), 'workflow': self.workflow, 'event': name, 'reason': reason}
+                entry.update(fields)
+                self.jsonl_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self.jsonl_file.flush()
+
+    def prometheus_text(self):
+        """Render the histograms and outcome counters in the Prometheus text exposition format."""
+        lines = ['# HELP servicenow_step_duration_seconds Duration of workflow steps.',
+                 '# TYPE servicenow_step_duration_seconds histogram']
+        with self.lock:
+            for (workflow, step), histogram in sorted(self.histograms.items()):
+                labels = f'workflow="{workflow}",step="{step}"'
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    lines.append(f'servicenow_step_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'servicenow_step_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.total}')
+                lines.append(f'servicenow_step_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}')
+                lines.append(f'servicenow_step_duration_seconds_count{{{labels}}} {histogram.total}')
+            lines.append('# HELP servicenow_steps_total Workflow steps by outcome.')
+            lines.append('# TYPE servicenow_steps_total counter')
+            for (workflow, step, outcome), count in sorted(self.outcomes.items()):
+                lines.append(f'servicenow_steps_total{{workflow="{workflow}",step="{step}",outcome="{outcome}"}} {count}')
+            lines.append('# HELP servicenow_events_total Point-in-time events by reason.')
+            lines.append('# TYPE servicenow_events_total counter')
+            for (workflow, name, reason), count in sorted(self.events.items()):
+                lines.append(f'servicenow_events_total{{workflow="{workflow}",event="{name}",reason="{reason}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self):
+        """Write the Prometheus text file atomically (e.g. for the node_exporter textfile collector)."""
+        if not self.prom_path:
+            return
+        with self.lock:
+            self.pending = 0
+        temp_path = f'{self.prom_path}.tmp'
+        with self.write_lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus_text())
+            os.replace(temp_path, self.prom_path)
+
+    def summary(self):
+        """Per-step count, total and mean seconds of the current run, slowest first."""
+        with self.lock:
+            rows = [(step, h.total, h.sum, h.sum / h.total) for (_, step), h in self.histograms.items() if h.total]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def serve(self, port):
+        """Serve the Prometheus text on http://127.0.0.1:<port>/metrics in a background thread."""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Metrics available at http://127.0.0.1:{port}/metrics")
+
+    def close(self):
+        """Print where the time went, write the final Prometheus file and close the exports."""
+        for step, count, total, mean in self.summary():
+            print(f"⏱ {step}: {count}x, {total:.1f}s total, {mean * 1000:.0f}ms avg")
+        self.write_prometheus()
+        if self.jsonl_file:
+            self.jsonl_file.close()
+            self.jsonl_file = None
+        if self.server:
+            self.server.shutdown()
+            self.server = None
+
+
+# Shared by the scripts and the shared modules
+metrics = WorkflowMetrics()
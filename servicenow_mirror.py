@@ -0,0 +1,271 @@
+"""
+ServiceNow Local Mirror
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Local SQLite copy of the incident and label fields the workflows decide on
+(number, state, assignment group, assignee, sys_updated_on) plus the actions the scripts
+applied to each record. The mirror is kept current by incremental syncs that only fetch
+records changed after the last synced sys_updated_on, so routing, resolve candidates and
+follow-up selection become indexed local queries - the browser or the Table API is only
+used for the writes themselves.
+License: MIT
+
+Configuration (environment variables):
+    SERVICENOW_MIRROR_PATH=<USERPROFILE>/ServiceNow_Mirror.sqlite3   Database file shared by the scripts
+
+Usage:
+    mirror = RecordMirror()
+    mirror.sync_browser(navigator, incidents_url)
+    for record in mirror.records('incident', active=True, assigned_to=''):
+        ...
+        mirror.mark('incident', record['sys_id'], 'assign', {'assigned_to': 'Implementer A'})
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from servicenow_metrics import metrics
+from servicenow_poller import BrowserTablePoller
+
+# Mirrored columns and the Table API field each is read from, per table
+MIRROR_FIELDS = {
+    'incident': {'number': 'number', 'state': 'state', 'active': 'active',
+                 'assignment_group': 'assignment_group', 'assigned_to': 'assigned_to'},
+    'label': {'number': 'name'},
+}
+
+# Filter of the first (full) sync of a table; later syncs fetch every change so records leaving it are updated
+SEED_FILTERS = {'incident': 'active=true'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    tbl TEXT NOT NULL,
+    sys_id TEXT NOT NULL,
+    number TEXT,
+    state TEXT,
+    active INTEGER,
+    assignment_group TEXT,
+    assigned_to TEXT,
+    assigned_to_id TEXT,
+    sys_updated_on TEXT,
+    PRIMARY KEY (tbl, sys_id)
+);
+CREATE INDEX IF NOT EXISTS records_number ON records (tbl, number);
+CREATE INDEX IF NOT EXISTS records_group ON records (tbl, active, assignment_group);
+CREATE INDEX IF NOT EXISTS records_assignee ON records (tbl, active, assigned_to_id);
+CREATE TABLE IF NOT EXISTS actions (
+    tbl TEXT NOT NULL,
+    sys_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (tbl, sys_id, action)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    tbl TEXT PRIMARY KEY,
+    watermark TEXT,
+    last_sys_id TEXT,
+    synced_at REAL
+);
+"""
+
+
+def split_value(field):
+    """Return (display value, internal value) of a field read with sysparm_display_value=all."""
+    if isinstance(field, dict):
+        return field.get('display_value'), field.get('value')
+    return field, field
+
+
+def current_user_id(driver):
+    """sys_id of the user logged in to the page shown in the driver (None if the page does not expose it)."""
+    return driver.execute_script(
+        "return (window.g_user && g_user.userID) || (window.NOW && NOW.user_id) || null;")
+
+
+class RecordMirror:
+    """
+    SQLite mirror of incident and label records with an incremental sync per table.
+
+    A sync asks for records at the watermark second that come after the last synced sys_id,
+    then for records after the watermark, ordered by sys_updated_on and sys_id - so any
+    number of records updated within one second is paged through without gaps or repeats.
+    Deleted records are not noticed by an incremental sync; reset() the table to reload it.
+    Safe to share between worker threads.
+
+    Args:
+        path: SQLite file (defaults to SERVICENOW_MIRROR_PATH, else ServiceNow_Mirror.sqlite3 in the user profile)
+        page_size: Records per Table API request during a sync
+    """
+
+    def __init__(self, path=None, page_size=500):
+        self.path = path or os.getenv('SERVICENOW_MIRROR_PATH') or os.path.join(
+            os.getenv('USERPROFILE', 'C:\\'), 'ServiceNow_Mirror.sqlite3')
+        self.page_size = page_size
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        with self.lock, self.db:
+            self.db.executescript(SCHEMA)
+
+    def sync(self, source, table='incident'):
+        """
+        Fetch the records of a table changed since the last sync and store them.
+
+        Args:
+            source: BrowserTablePoller, ApiTablePoller or anything with the same get_records()
+            table: 'incident' or 'label' (see MIRROR_FIELDS)
+
+        Returns:
+            Number of records added or updated
+        """
+        columns = MIRROR_FIELDS[table]
+        fields = list(dict.fromkeys(['sys_id', 'sys_updated_on'] + list(columns.values())))
+        with self.lock:
+            state = self.db.execute('SELECT watermark, last_sys_id FROM sync_state WHERE tbl = ?', (table,)).fetchone()
+        watermark, last_sys_id = (state['watermark'], state['last_sys_id']) if state else (None, None)
+        seed = '' if state else SEED_FILTERS.get(table, '')
+        synced = 0
+        with metrics.span('mirror_sync', table) as span:
+            while True:
+                if watermark is None:
+                    query = '^'.join(filter(None, [seed, 'ORDERBYsys_updated_on', 'ORDERBYsys_id']))
+                    page = self._fetch(source, table, query, fields)
+                else:
+                    # Rest of the watermark second first, then everything after it
+                    page = self._fetch(source, table, '^'.join(filter(None, [
+                        seed, f'sys_updated_on={watermark}', f'sys_id>{last_sys_id}', 'ORDERBYsys_id'])), fields)
+                    if len(page) < self.page_size:
+                        page += self._fetch(source, table, '^'.join(filter(None, [
+                            seed, f'sys_updated_on>{watermark}', 'ORDERBYsys_updated_on', 'ORDERBYsys_id'])),
+                            fields, self.page_size - len(page))
+                if not page:
+                    break
+                self._store(table, columns, page)
+                synced += len(page)
+                last = page[-1]
+                watermark, last_sys_id = split_value(last['sys_updated_on'])[1], split_value(last['sys_id'])[1]
+                with self.lock, self.db:
+                    self.db.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)',
+                                    (table, watermark, last_sys_id, time.time()))
+                if len(page) < self.page_size:
+                    break
+            if not synced:
+                span.fail('idle')
+        if synced:
+            print(f"✅ Mirror: {synced} {table} records synced up to {watermark}.")
+        return synced
+
+    def sync_browser(self, navigator, page_url, table='incident'):
+        """
+        Sync a table through the Table API from inside the logged-in browser.
+
+        The page already shown is used when it can call the API (any form or list page); only
+        otherwise page_url is opened first to get a page with the session token.
+
+        Args:
+            navigator: ClassicNavigator of the browser
+            page_url: Instance page opened when the current one cannot call the API (e.g. the list URL)
+            table: 'incident' or 'label'
+
+        Returns:
+            Number of records added or updated
+        """
+        try:
+            return self.sync(BrowserTablePoller(navigator.driver), table)
+        except Exception as e:
+            print(f"⚠️ Mirror sync from the current page failed ({e}), opening {page_url}.")
+        if not navigator.open(page_url):
+            raise RuntimeError(f"{page_url} could not be opened to sync the mirror")
+        return self.sync(BrowserTablePoller(navigator.driver), table)
+
+    def _fetch(self, source, table, query, fields, limit=None):
+        return source.get_records(table, query=query, fields=fields, limit=limit or self.page_size,
+                                  display_value='all')
+
+    def _store(self, table, columns, records):
+        rows = []
+        for record in records:
+            values = {column: split_value(record.get(field)) for column, field in columns.items()}
+            active = values.get('active', (None, None))[1]
+            rows.append((table, split_value(record['sys_id'])[1],
+                         values.get('number', (None, None))[0],
+                         values.get('state', (None, None))[0],
+                         None if active in (None, '') else int(str(active).lower() == 'true'),
+                         values.get('assignment_group', (None, None))[0],
+                         values.get('assigned_to', (None, None))[0] or '',
+                         values.get('assigned_to', (None, None))[1] or '',
+                         split_value(record.get('sys_updated_on'))[1]))
+        with self.lock, self.db:
+            self.db.executemany('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def records(self, table='incident', active=None, exclude_states=(), not_done=None, window=None, **equals):
+        """
+        Query mirrored records.
+
+        Args:
+            table: 'incident' or 'label'
+            active: True/False to filter on the active flag (None = any)
+            exclude_states: State display values to leave out (e.g. ('Resolved',))
+            not_done: Action name - leave out records the action was applied to within the window
+            window: Seconds an applied action counts for (None = forever)
+            **equals: Column filters, e.g. assigned_to='' or assigned_to_id=<sys_id> or assignment_group='Group A'
+
+        Returns:
+            List of row dicts (sys_id, number, state, assignment_group, assigned_to, assigned_to_id, sys_updated_on), by number
+        """
+        where, params = ['r.tbl = ?'], [table]
+        if active is not None:
+            where.append('r.active = ?')
+            params.append(int(active))
+        if exclude_states:
+            where.append(f"COALESCE(r.state, '') NOT IN ({', '.join('?' * len(exclude_states))})")
+            params.extend(exclude_states)
+        for column, value in equals.items():
+            if column not in ('number', 'state', 'assignment_group', 'assigned_to', 'assigned_to_id'):
+                raise ValueError(f"unknown mirror column: {column}")
+            where.append(f"COALESCE(r.{column}, '') = ?")
+            params.append(value)
+        if not_done:
+            where.append('NOT EXISTS (SELECT 1 FROM actions a WHERE a.tbl = r.tbl AND a.sys_id = r.sys_id '
+                         'AND a.action = ? AND a.ts >= ?)')
+            params.extend([not_done, time.time() - window if window is not None else 0])
+        query = (f"SELECT r.sys_id, r.number, r.state, r.assignment_group, r.assigned_to, r.assigned_to_id, "
+                 f"r.sys_updated_on FROM records r WHERE {' AND '.join(where)} ORDER BY r.number")
+        with self.lock:
+            return [dict(row) for row in self.db.execute(query, params)]
+
+    def mark(self, table, sys_id, action, values=None):
+        """
+        Remember that the action was applied to a record, and optionally the field values it wrote.
+
+        The written values show up in queries right away instead of after the next sync.
+
+        Args:
+            table: 'incident' or 'label'
+            sys_id: Record written to
+            action: Action name (e.g. 'assign', 'resolve', 'work_note')
+            values: Dict of mirrored column to new display value (e.g. {'state': 'Resolved'})
+        """
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO actions VALUES (?, ?, ?, ?)', (table, sys_id, action, time.time()))
+            for column, value in (values or {}).items():
+                if column not in ('state', 'assignment_group', 'assigned_to'):
+                    raise ValueError(f"unknown mirror column: {column}")
+                self.db.execute(f'UPDATE records SET {column} = ? WHERE tbl = ? AND sys_id = ?', (value, table, sys_id))
+
+    def last_action(self, table, sys_id):
+        """Return (action, timestamp) of the latest action applied to a record, or None."""
+        with self.lock:
+            row = self.db.execute('SELECT action, ts FROM actions WHERE tbl = ? AND sys_id = ? ORDER BY ts DESC LIMIT 1',
+                                  (table, sys_id)).fetchone()
+        return (row['action'], row['ts']) if row else None
+
+    def reset(self, table):
+        """Forget the mirrored records and the watermark of a table, so the next sync reloads it."""
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM records WHERE tbl = ?', (table,))
+            self.db.execute('DELETE FROM sync_state WHERE tbl = ?', (table,))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
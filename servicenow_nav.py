@@ -0,0 +1,225 @@
+"""
+ServiceNow Classic UI Navigation
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Opens classic UI pages (incident_list.do, label_list.do, forms) as cheaply as
+possible. In direct mode the page is loaded without the Next Experience shell; the
+macroponent shadow DOM / iframe path is only used when the instance does not allow
+direct loads, and the resolved iframe is then reused across iterations.
+License: MIT
+"""
+
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qs, urlencode, quote
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from servicenow_metrics import metrics
+from servicenow_throttle import ERROR, OK, throttle
+
+# Classifies the loaded top-level document: the Next Experience shell or a classic UI page
+PAGE_KIND_SCRIPT = """
+if (Array.prototype.some.call(document.body ? document.body.children : [], function (el) {
+        return el.tagName.toLowerCase().indexOf('macroponent') === 0;
+    }) || document.querySelector('[id^="macroponent"]')) {
+    return 'shell';
+}
+if (document.readyState === 'complete' && (typeof g_form !== 'undefined'
+        || document.querySelector("table.list2_table, tr[id^='row_'], a.linked.formlink, tr.list2_no_records"))) {
+    return 'classic';
+}
+return null;
+"""
+
+# True once a frame navigated with location.replace() has finished loading its new document
+FRAME_LOADED_SCRIPT = "return !window.__snNavMarker && document.readyState === 'complete';"
+
+
+def classic_url(url):
+    """
+    Turn a nav_to.do URL into the classic page URL it wraps.
+
+    Example:
+        .../nav_to.do?uri=incident_list.do%3Fsysparm_view%3Ddefault -> .../incident_list.do?sysparm_view=default
+    """
+    parts = urlsplit(url)
+    if not parts.path.endswith('nav_to.do'):
+        return url
+    uri = parse_qs(parts.query).get('uri', [''])[0]
+    if not uri:
+        return url
+    return f"{parts.scheme}://{parts.netloc}/{uri.lstrip('/')}"
+
+
+def with_list_params(url, **params):
+    """
+    Add or replace query parameters of a classic page, keeping nav_to.do wrapping intact.
+
+    Example:
+        with_list_params('.../nav_to.do?uri=incident_list.do%3Fsysparm_view%3Ddefault', sysparm_first_row=21)
+        -> .../nav_to.do?uri=incident_list.do%3Fsysparm_view%3Ddefault%26sysparm_first_row%3D21
+    """
+    parts = urlsplit(url)
+    if parts.path.endswith('nav_to.do'):
+        uri = parse_qs(parts.query).get('uri', [''])[0]
+        if uri:
+            return urlunsplit(parts._replace(query='uri=' + quote(with_list_params(uri, **params), safe='')))
+    query = {key: values[0] for key, values in parse_qs(parts.query, keep_blank_values=True).items()}
+    query.update({key: str(value) for key, value in params.items()})
+    return urlunsplit(parts._replace(query=urlencode(query, safe=':()^')))
+
+
+def list_param(url, name, default=None):
+    """Read a query parameter of a classic page, looking inside nav_to.do wrapping."""
+    parts = urlsplit(url)
+    if parts.path.endswith('nav_to.do'):
+        uri = parse_qs(parts.query).get('uri', [''])[0]
+        if uri:
+            return list_param(uri, name, default)
+    return parse_qs(parts.query, keep_blank_values=True).get(name, [default])[0]
+
+
+def find_shadow_frame(driver, timeout=10):
+    """
+    Resolve the classic UI iframe inside the macroponent shadow DOM.
+
+    Returns:
+        The iframe WebElement, or None if it could not be found
+    """
+    try:
+        shadow_host = WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.XPATH, "//*[starts-with(name(), 'macroponent')]")))
+    except TimeoutException:
+        return None
+    try:
+        shadow_root = driver.execute_script("return arguments[0].shadowRoot", shadow_host)
+        return shadow_root.find_element(By.CSS_SELECTOR, 'iframe')
+    except Exception:
+        return None
+
+
+class ClassicNavigator:
+    """
+    Opens classic UI pages and leaves the driver in the document that shows them.
+
+    Args:
+        driver: WebDriver instance
+        direct: Try to load classic pages without the Next Experience shell
+        timeout: Seconds to wait for a page or frame to load
+        retries: How often the shell page is reloaded when its iframe is missing
+    """
+
+    def __init__(self, driver, direct=True, timeout=10, retries=3):
+        self.driver = driver
+        self.direct = direct
+        self.timeout = timeout
+        self.retries = retries
+        # None until the first load tells us whether direct loads are allowed
+        self.direct_allowed = None if direct else False
+        self.frame = None
+
+    def open(self, url):
+        """
+        Open a page given as nav_to.do or classic URL.
+
+        The load time is reported to the shared throttle, so slow pages make every
+        workflow of the process back off.
+
+        Returns:
+            True if the page is loaded and the driver is switched to it, False otherwise
+        """
+        target = classic_url(url)
+        step = 'list_load' if '_list.do' in target else 'form_load'
+        throttle.wait()
+        opened = False
+        try:
+            with metrics.span(step) as span:
+                opened = self._open(url, target)
+                if not opened:
+                    span.fail()
+        finally:
+            throttle.observe(span.duration, OK if opened else ERROR)
+        return opened
+
+    def reset(self, driver=None):
+        """
+        Forget the resolved iframe so the next open() finds it again, e.g. after it was detached.
+
+        Args:
+            driver: Replacement WebDriver after the previous browser died (optional)
+        """
+        if driver is not None:
+            self.driver = driver
+        self.frame = None
+        try:
+            self.driver.switch_to.default_content()
+        except WebDriverException:
+            pass
+
+    def _open(self, url, target):
+        """Load the classic page directly or through the shell, as allowed."""
+        if self.direct_allowed is not False:
+            self.driver.switch_to.default_content()
+            self.driver.get(target)
+            kind = self._page_kind()
+            if kind == 'classic':
+                self.direct_allowed = True
+                return True
+            if kind == 'shell':
+                # The instance redirected into the Next Experience shell - use the iframe from now on
+                print("⚠️ Direct classic UI load not allowed, using the shell iframe.")
+                self.direct_allowed = False
+                self.frame = None
+                return self._enter_shell(url, already_loaded=True)
+            if self.direct_allowed is None:
+                self.direct_allowed = False
+            return False
+
+        if self.direct and self.frame is not None and self._navigate_cached_frame(target):
+            return True
+        return self._enter_shell(url)
+
+    def _page_kind(self):
+        """Wait until the top-level document is recognisably the shell or a classic page."""
+        try:
+            return WebDriverWait(self.driver, self.timeout, poll_frequency=0.1,
+                                 ignored_exceptions=(WebDriverException,)).until(
+                lambda d: d.execute_script(PAGE_KIND_SCRIPT))
+        except TimeoutException:
+            return None
+
+    def _navigate_cached_frame(self, target):
+        """Load the target inside the already resolved iframe instead of reloading the shell."""
+        try:
+            self.driver.switch_to.default_content()
+            self.driver.switch_to.frame(self.frame)
+            self.driver.execute_script("window.__snNavMarker = true; window.location.replace(arguments[0]);", target)
+            WebDriverWait(self.driver, self.timeout, poll_frequency=0.1,
+                          ignored_exceptions=(WebDriverException,)).until(
+                lambda d: d.execute_script(FRAME_LOADED_SCRIPT))
+            return True
+        except (WebDriverException, TimeoutException):
+            # Frame is stale or detached - resolve it again through the shell
+            self.frame = None
+            self.driver.switch_to.default_content()
+            return False
+
+    def _enter_shell(self, url, already_loaded=False):
+        """Load the page through the shell, resolve its iframe and switch into it."""
+        for attempt in range(self.retries):
+            if not already_loaded or attempt > 0:
+                self.driver.switch_to.default_content()
+                self.driver.get(url)
+            with metrics.span('frame_resolve') as span:
+                iframe = find_shadow_frame(self.driver, self.timeout)
+                if iframe is None:
+                    span.fail()
+                else:
+                    self.driver.switch_to.frame(iframe)
+            if iframe is None:
+                time.sleep(0.5)
+                continue
+            if self.direct:
+                self.frame = iframe
+            return True
+        return False
@@ -0,0 +1,113 @@
+"""
+ServiceNow Desired-State Plan
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Compares the field values a record already has with the values a workflow
+wants it to have, so writes are only sent for records that differ. Every record that is
+already in the desired state saves a full edit/save round-trip and an audit entry. The
+plan counts the records that needed a write, the ones skipped and the writes applied.
+License: MIT
+
+Usage:
+    plan = WritePlan('assign')
+    changes = plan.changes(row['number'], row, {'assigned_to': 'Implementer A'})
+    if changes:
+        ...  # write only the fields in changes
+        plan.applied(row['number'])
+    print(plan.summary())
+"""
+
+import threading
+from servicenow_metrics import metrics
+
+
+class Contains:
+    """
+    Desired state of a glide list field (e.g. group_list): the item must be in the list,
+    other entries may stay.
+
+    Args:
+        item: Display value that must be present (compared case-insensitively)
+    """
+
+    def __init__(self, item):
+        self.item = item
+
+    def satisfied_by(self, current):
+        return self.item.strip().lower() in [value.strip().lower() for value in current.split(',')]
+
+    def __repr__(self):
+        return f'Contains({self.item!r})'
+
+
+def field_matches(current, desired):
+    """
+    True if a current field value already satisfies the desired one.
+
+    Values are compared as trimmed, case-insensitive display text. A current value of
+    None means the field could not be read (e.g. the column is not on the list view)
+    and never matches, so the write is sent rather than silently skipped.
+    """
+    if current is None:
+        return False
+    current = str(current)
+    if isinstance(desired, Contains):
+        return desired.satisfied_by(current)
+    return current.strip().lower() == str(desired).strip().lower()
+
+
+class WritePlan:
+    """
+    Per-run record of which records needed a write.
+
+    A record is classified the first time it is checked; checking it again (e.g. after the
+    list was reloaded or the record was retried) does not count it twice. Safe to share
+    between worker threads.
+
+    Args:
+        workflow: Name used in the summary (e.g. 'assign')
+    """
+
+    def __init__(self, workflow):
+        self.workflow = workflow
+        self.lock = threading.Lock()
+        self.planned = set()
+        self.skipped = set()
+        self.done = set()
+
+    def changes(self, key, current, desired):
+        """
+        Return the fields whose current value differs from the desired state.
+
+        Args:
+            key: Record number, name or sys_id
+            current: Dict of current field values (display values; missing fields count as unknown)
+            desired: Dict of field name to desired value or Contains(...)
+
+        Returns:
+            Dict of field name to desired value for the fields that need a write (empty if none)
+        """
+        changes = {field: value for field, value in desired.items() if not field_matches(current.get(field), value)}
+        with self.lock:
+            first_check = key not in self.planned and key not in self.skipped
+            if first_check:
+                (self.planned if changes else self.skipped).add(key)
+        if first_check:
+            with metrics.span('plan', key) as span:
+                if not changes:
+                    span.fail('skipped')
+        return changes
+
+    def applied(self, key):
+        """Count the write for a planned record as sent and confirmed."""
+        with self.lock:
+            self.done.add(key)
+
+    def counts(self):
+        with self.lock:
+            return {'planned': len(self.planned), 'skipped': len(self.skipped), 'applied': len(self.done)}
+
+    def summary(self):
+        """One-line report of the run, e.g. for the log or the console."""
+        counts = self.counts()
+        return (f"{self.workflow}: {counts['planned']} records needed a write, {counts['skipped']} were already "
+                f"in the desired state, {counts['applied']} writes applied")
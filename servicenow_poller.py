@@ -0,0 +1,186 @@
+"""
+ServiceNow Incremental Poller
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Daemon building blocks that keep a session open and only ask ServiceNow for
+records whose sys_updated_on is past the last seen watermark. The interval backs off
+exponentially while nothing changes and drops back to the minimum as soon as work arrives.
+Polls go through the Table API - either with a TableAPIClient or from inside the logged-in
+browser page (session cookie + g_ck token), so no list page has to be reloaded to find out
+whether there is anything to do.
+License: MIT
+"""
+
+import time
+from urllib.parse import urlencode
+from servicenow_metrics import metrics
+from servicenow_throttle import ERROR, THROTTLE_STATUSES, THROTTLED, parse_retry_after, throttle
+
+# Calls the Table API from the current page with the browser's session; returns {status, result, retryAfter}
+FETCH_TABLE_SCRIPT = """
+var url = arguments[0], done = arguments[arguments.length - 1];
+var headers = {'Accept': 'application/json'};
+if (window.g_ck) headers['X-UserToken'] = window.g_ck;
+fetch(url, {headers: headers, credentials: 'same-origin'})
+    .then(function (response) {
+        if (!response.ok) {
+            done({status: response.status, result: null, retryAfter: response.headers.get('Retry-After')});
+            return;
+        }
+        return response.json().then(function (payload) { done({status: response.status, result: payload.result}); });
+    })
+    .catch(function (error) { done({status: 0, result: null, error: String(error)}); });
+"""
+
+
+class BrowserTablePoller:
+    """
+    Reads records through the Table API from inside the browser's current ServiceNow page.
+
+    Args:
+        driver: WebDriver switched to any page of the instance (list, form or shell)
+        timeout: Seconds to wait for the request
+    """
+
+    def __init__(self, driver, timeout=30):
+        self.driver = driver
+        self.timeout = timeout
+
+    def get_records(self, table, query=None, fields=None, limit=None, offset=None, display_value=None):
+        params = {'sysparm_exclude_reference_link': 'true'}
+        if query:
+            params['sysparm_query'] = query
+        if fields:
+            params['sysparm_fields'] = ','.join(fields)
+        if limit is not None:
+            params['sysparm_limit'] = limit
+        if offset is not None:
+            params['sysparm_offset'] = offset
+        if display_value is not None:
+            params['sysparm_display_value'] = display_value
+        self.driver.set_script_timeout(self.timeout)
+        throttle.wait()
+        start_time = time.perf_counter()
+        response = self.driver.execute_async_script(FETCH_TABLE_SCRIPT, f'/api/now/table/{table}?{urlencode(params)}')
+        latency = time.perf_counter() - start_time
+        if not response or response.get('result') is None:
+            status = response.get('status') if response else None
+            if status in THROTTLE_STATUSES:
+                throttle.observe(latency, THROTTLED, parse_retry_after(response.get('retryAfter')))
+            else:
+                throttle.observe(latency, ERROR)
+            raise RuntimeError(f"Table API poll failed with status {status or 'none'}")
+        throttle.observe(latency)
+        return response['result']
+
+
+class ApiTablePoller:
+    """Reads records with a TableAPIClient (same interface as BrowserTablePoller)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get_records(self, table, query=None, fields=None, limit=None, offset=None, display_value=None):
+        return self.client.get_records(table, query=query, fields=fields, limit=limit, offset=offset,
+                                       display_value=display_value)
+
+
+class WatermarkPoller:
+    """
+    Returns only the records changed since the previous poll.
+
+    The watermark is the newest sys_updated_on seen so far. Polls ask for records at or
+    after it (sys_updated_on has one-second resolution) and drop the ones already returned
+    at exactly that second. Timestamps are the instance's internal (UTC) values.
+
+    Args:
+        poller: BrowserTablePoller or ApiTablePoller
+        table: Table to watch (e.g. 'incident')
+        query: Encoded filter the records must match, without ORDERBY (e.g. 'active=true^assigned_toISEMPTY')
+        fields: Fields returned for each changed record (sys_id and sys_updated_on are always included)
+        limit: Maximum records per poll; the rest is picked up by the next poll
+    """
+
+    def __init__(self, poller, table, query, fields=None, limit=200):
+        self.poller = poller
+        self.table = table
+        self.query = query
+        self.fields = list(dict.fromkeys(['sys_id', 'sys_updated_on'] + list(fields or [])))
+        self.limit = limit
+        self.watermark = None
+        self.seen_at_watermark = set()
+
+    def start(self):
+        """Set the watermark to the newest update on the table, so only changes from now on are returned."""
+        latest = self.poller.get_records(self.table, query='ORDERBYDESCsys_updated_on',
+                                         fields=['sys_id', 'sys_updated_on'], limit=1)
+        self.watermark = latest[0]['sys_updated_on'] if latest else '1970-01-01 00:00:00'
+        self.seen_at_watermark = {latest[0]['sys_id']} if latest else set()
+        print(f"✅ Watching {self.table} for changes after {self.watermark}.")
+
+    def poll(self):
+        """Return the records that match the filter and changed after the watermark, oldest first."""
+        if self.watermark is None:
+            self.start()
+        query = f"{self.query}^sys_updated_on>={self.watermark}^ORDERBYsys_updated_on"
+        with metrics.span('poll') as span:
+            records = self.poller.get_records(self.table, query=query, fields=self.fields, limit=self.limit)
+            changed = [r for r in records
+                       if not (r['sys_updated_on'] == self.watermark and r['sys_id'] in self.seen_at_watermark)]
+            if not changed:
+                span.fail('idle')
+        for record in changed:
+            if record['sys_updated_on'] > self.watermark:
+                self.watermark = record['sys_updated_on']
+                self.seen_at_watermark = set()
+            self.seen_at_watermark.add(record['sys_id'])
+        return changed
+
+
+class AdaptiveBackoff:
+    """
+    Poll interval that doubles while polls come back empty and resets when work arrives.
+
+    Args:
+        min_interval: Seconds between polls while there is work
+        max_interval: Upper bound for the idle interval
+        factor: Growth factor per empty poll
+    """
+
+    def __init__(self, min_interval=5, max_interval=300, factor=2):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.interval = min_interval
+
+    def record(self, found_work):
+        """Update the interval after a poll and return it."""
+        if found_work:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.factor, self.max_interval)
+        return self.interval
+
+
+def run_daemon(watcher, handle, backoff):
+    """
+    Poll until interrupted and hand every batch of changed records to the workflow.
+
+    Args:
+        watcher: WatermarkPoller
+        handle: Callable taking the list of changed records
+        backoff: AdaptiveBackoff controlling the poll interval
+    """
+    print("✅ Daemon mode: waiting for new records (Ctrl+C to stop).")
+    try:
+        while True:
+            try:
+                records = watcher.poll()
+            except Exception as e:
+                print(f"⚠️ Poll failed: {e}")
+                records = []
+            if records:
+                print(f"✅ {len(records)} new or changed records.")
+                handle(records)
+            time.sleep(backoff.record(bool(records)))
+    except KeyboardInterrupt:
+        print("❌ Daemon stopped.")
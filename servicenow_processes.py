@@ -0,0 +1,512 @@
+"""
+ServiceNow Browser Process Lifecycle
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Starts Edge/Chrome through the driver bundled with the repository (falling back
+to Selenium Manager) and records the PIDs of every driver and browser a script started.
+Only those processes are stopped when the script ends, and processes left behind by a run
+that crashed are cleaned up on the next start - instead of "taskkill /IM msedge.exe", which
+closes every browser on the machine, the operator's windows and other automations included.
+License: MIT
+
+Every running script keeps its PIDs in ServiceNow_Processes/<script pid>.json in the user
+profile (SERVICENOW_PROCESS_DIR overrides the location), so several scripts and worker
+pools can run side by side on one host without touching each other's browsers.
+
+Usage:
+    from servicenow_processes import processes
+    processes.cleanup_orphans()
+    driver = processes.start('edge', edge_options)
+    ...
+    processes.quit(driver)
+
+    python servicenow_processes.py --status     # Browsers started by the scripts that are still running
+    python servicenow_processes.py --cleanup    # Stop the ones whose script is gone
+"""
+
+import argparse
+import atexit
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.webdriver.edge.service import Service as EdgeService
+
+# Driver folders shipped next to the scripts (as unpacked from the vendor downloads), by browser and platform
+REPO_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DRIVER_DIRECTORIES = {
+    'edge': {
+        ('Windows', 'x64'): 'edgedriver_win64',
+        ('Windows', 'arm64'): 'edgedriver_arm64',
+        ('Linux', 'x64'): 'edgedriver_linux64',
+        ('Darwin', 'x64'): 'edgedriver_mac64',
+        ('Darwin', 'arm64'): 'edgedriver_mac64_m1',
+    },
+    'chrome': {
+        ('Windows', 'x64'): 'chromedriver-win64',
+        ('Windows', 'arm64'): 'chromedriver-win64',
+        ('Linux', 'x64'): 'chromedriver-linux64',
+        ('Darwin', 'x64'): 'chromedriver-mac-x64',
+        ('Darwin', 'arm64'): 'chromedriver-mac-arm64',
+    },
+}
+DRIVER_EXECUTABLES = {'edge': 'msedgedriver', 'chrome': 'chromedriver'}
+
+# Message of the driver when the full user profile is already open in another browser
+PROFILE_IN_USE = 'user data directory is already in use'
+
+
+def machine_architecture():
+    """'x64' or 'arm64' for the running machine."""
+    machine = platform.machine().lower()
+    return 'arm64' if machine in ('arm64', 'aarch64') else 'x64'
+
+
+def find_driver(browser):
+    """
+    Path of the bundled driver for this platform, or None to let Selenium Manager provide one.
+
+    The vendor zips unpack either straight into the folder or into a folder of the same
+    name inside it (chromedriver-win64/chromedriver-win64/chromedriver.exe); both are searched.
+
+    Args:
+        browser: 'edge' or 'chrome'
+    """
+    folder = DRIVER_DIRECTORIES[browser].get((platform.system(), machine_architecture()))
+    if not folder:
+        return None
+    executable = DRIVER_EXECUTABLES[browser] + ('.exe' if platform.system() == 'Windows' else '')
+    for path in (os.path.join(REPO_DIRECTORY, folder, executable),
+                 os.path.join(REPO_DIRECTORY, folder, folder, executable)):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def process_name(pid):
+    """Executable name of a running process (e.g. 'msedge.exe', 'chromedriver'), or None if it is not running."""
+    if sys.platform == 'win32':
+        try:
+            output = subprocess.run(['tasklist', '/FI', f'PID eq {pid}', '/FO', 'CSV', '/NH'],
+                                    capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+        line = output.strip().splitlines()[0] if output.strip() else ''
+        return line.split('","')[0].strip('"') if line.startswith('"') else None
+    try:
+        with open(f'/proc/{pid}/stat', 'r', encoding='utf-8') as f:
+            stat = f.read()
+        # "<pid> (<name>) <state> ..."; a killed process that was not reaped yet (zombie) is not running
+        name, state = stat[stat.index('(') + 1:stat.rindex(')')], stat[stat.rindex(')') + 2:].split()[0]
+        return None if state == 'Z' else name
+    except FileNotFoundError:
+        if os.path.isdir('/proc'):
+            return None
+    except OSError:
+        return None
+    try:
+        output = subprocess.run(['ps', '-p', str(pid), '-o', 'comm='], capture_output=True, text=True,
+                                timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return os.path.basename(output) or None
+
+
+def process_created(pid):
+    """Creation time of a running process as a Unix timestamp, or None if it is not running or unreadable."""
+    if sys.platform == 'win32':
+        command = (f"$p = Get-Process -Id {int(pid)} -ErrorAction SilentlyContinue; "
+                   "if ($p) { [int64]($p.StartTime.ToUniversalTime() - [datetime]'1970-01-01').TotalSeconds }")
+        try:
+            output = subprocess.run(['powershell', '-NoProfile', '-Command', command], capture_output=True,
+                                    text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return float(output) if output.isdigit() else None
+    if os.path.isdir('/proc'):
+        try:
+            with open(f'/proc/{pid}/stat', 'r', encoding='utf-8') as f:
+                stat = f.read()
+            with open('/proc/stat', 'r', encoding='utf-8') as f:
+                boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime '))
+            # Field 22 (starttime, in clock ticks since boot) is the 20th after the parenthesised name
+            ticks = int(stat[stat.rindex(')') + 2:].split()[19])
+        except (OSError, ValueError, IndexError, StopIteration):
+            return None
+        return round(boot_time + ticks / os.sysconf('SC_CLK_TCK'), 2)
+    try:
+        output = subprocess.run(['ps', '-p', str(pid), '-o', 'lstart='], capture_output=True, text=True, timeout=10,
+                                env=dict(os.environ, LC_ALL='C')).stdout.strip()
+        return time.mktime(time.strptime(output, '%a %b %d %H:%M:%S %Y'))
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def same_process(pid, created):
+    """True if the process running under the PID was created at `created` (within a second), i.e. the PID was not reused."""
+    current = process_created(pid)
+    return current is not None and abs(current - created) <= 1
+
+
+def child_processes(pid):
+    """PIDs of the processes started directly by a process (used to find the browser of a driver)."""
+    if sys.platform == 'win32':
+        command = (f"Get-CimInstance Win32_Process -Filter 'ParentProcessId={int(pid)}' "
+                   "| ForEach-Object { $_.ProcessId }")
+        try:
+            output = subprocess.run(['powershell', '-NoProfile', '-Command', command], capture_output=True,
+                                    text=True, timeout=30).stdout
+        except (OSError, subprocess.SubprocessError):
+            return []
+        return [int(line) for line in output.split() if line.isdigit()]
+    if os.path.isdir('/proc'):
+        children = []
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat', 'r', encoding='utf-8') as f:
+                    # The parent PID follows the parenthesised command name, which may contain spaces
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        children.append(int(entry))
+            except (OSError, ValueError, IndexError):
+                continue
+        return children
+    try:
+        output = subprocess.run(['pgrep', '-P', str(pid)], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+    return [int(line) for line in output.split() if line.isdigit()]
+
+
+def process_tree(pid):
+    """A process and all of its descendants (browser -> renderers, GPU, utility processes)."""
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(child for child in child_processes(current) if child not in tree)
+    return tree
+
+
+def process_memory(pids):
+    """
+    Resident memory of a set of processes, in bytes (working set on Windows).
+
+    Shared pages are counted once per process, so the sum is an upper bound - good enough
+    for noticing a browser that keeps growing.
+    """
+    pids = [int(pid) for pid in pids]
+    if not pids:
+        return 0
+    if sys.platform == 'win32':
+        command = (f"(Get-Process -Id {','.join(map(str, pids))} -ErrorAction SilentlyContinue "
+                   "| Measure-Object WorkingSet64 -Sum).Sum")
+        try:
+            output = subprocess.run(['powershell', '-NoProfile', '-Command', command], capture_output=True,
+                                    text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return 0
+        return int(output) if output.isdigit() else 0
+    if os.path.isdir('/proc'):
+        total = 0
+        for pid in pids:
+            try:
+                with open(f'/proc/{pid}/status', 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total += int(line.split()[1]) * 1024
+                            break
+            except (OSError, ValueError, IndexError):
+                continue
+        return total
+    try:
+        output = subprocess.run(['ps', '-o', 'rss=', '-p', ','.join(map(str, pids))], capture_output=True,
+                                text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return 0
+    return sum(int(line) for line in output.split() if line.isdigit()) * 1024
+
+
+def is_renderer(pid):
+    """True if a Chromium child process is a renderer (--type=renderer); False where the command line is unreadable."""
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return b'--type=renderer' in f.read()
+    except OSError:
+        return False
+
+
+def kill_process(pid):
+    """Force-stop one process and, on Windows, the processes it started (renderers, GPU, ...)."""
+    if sys.platform == 'win32':
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(pid)], capture_output=True, timeout=30)
+        return
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def default_registry_directory():
+    """Where the per-run PID files live: SERVICENOW_PROCESS_DIR, else the user profile (temp dir as fallback)."""
+    return (os.getenv('SERVICENOW_PROCESS_DIR')
+            or os.path.join(os.getenv('USERPROFILE') or tempfile.gettempdir(), 'ServiceNow_Processes'))
+
+
+class BrowserProcesses:
+    """
+    Registry of the drivers and browsers started by this script.
+
+    Each process is stored with its executable name and creation time, so a PID that was
+    reused after a crash - by an unrelated program or by a new browser of the same name -
+    is never killed. Browsers that were not quit when the
+    script exits (exception, Ctrl+C) are stopped by an atexit hook.
+
+    Args:
+        directory: Directory of the per-run PID files (see default_registry_directory)
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_registry_directory()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.entries = {}    # id(driver) -> list of {pid, name, created, role, browser}
+        # The owner's executable name and creation time are looked up on the first save, so importing stays cheap
+        self.owner = {'pid': os.getpid(), 'name': None, 'created': None, 'script': os.path.basename(sys.argv[0]),
+                      'started': round(time.time(), 3)}
+        atexit.register(self.quit_all)
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{self.owner['pid']}.json")
+
+    def start(self, browser, options, own_browser=True):
+        """
+        Start a WebDriver with the bundled driver and register its processes.
+
+        Args:
+            browser: 'edge' or 'chrome'
+            options: EdgeOptions / ChromeOptions
+            own_browser: False when the driver only attaches to a browser started elsewhere
+                (debuggerAddress, e.g. a session-service lease) - only the driver is then tracked
+
+        Returns:
+            The WebDriver
+        """
+        driver_path = find_driver(browser)
+        service_class = EdgeService if browser == 'edge' else ChromeService
+        service = service_class(executable_path=driver_path) if driver_path else service_class()
+        try:
+            if browser == 'edge':
+                driver = webdriver.Edge(options=options, service=service)
+            else:
+                driver = webdriver.Chrome(options=options, service=service)
+        except WebDriverException as e:
+            if PROFILE_IN_USE in str(e).lower():
+                print("❌ The browser profile is open in another window. Close that browser or use --slim-profile.")
+            raise
+        self.register(driver, browser, own_browser)
+        return driver
+
+    def register(self, driver, browser, own_browser=True):
+        """Record the driver process and, through DevTools, the browser process of a started WebDriver."""
+        entries = []
+        process = getattr(getattr(driver, 'service', None), 'process', None)
+        if process is not None and process.pid:
+            entries.append({'pid': process.pid, 'name': process_name(process.pid),
+                            'created': process_created(process.pid), 'role': 'driver'})
+        if own_browser:
+            try:
+                info = driver.execute_cdp_cmd('SystemInfo.getProcessInfo', {}).get('processInfo', [])
+                browser_pids = [item['id'] for item in info if item.get('type') == 'browser']
+            except Exception:
+                browser_pids = []
+            if not browser_pids and entries:
+                # The browser is started by the driver, so it is one of its children
+                browser_pids = child_processes(entries[0]['pid'])
+            if not browser_pids:
+                # Without the browser PID a crashed run can leave the browser behind; the driver is still tracked
+                print("⚠️ Browser process could not be identified.")
+            for pid in browser_pids:
+                entries.append({'pid': pid, 'name': process_name(pid), 'created': process_created(pid),
+                                'role': 'browser'})
+        for entry in entries:
+            entry['browser'] = browser
+        with self.lock:
+            self.entries[id(driver)] = [entry for entry in entries if entry['name']]
+        self._save()
+
+    def usage(self, driver):
+        """
+        Memory and renderer count of a browser started through start().
+
+        The processes are listed through DevTools (SystemInfo.getProcessInfo); when that is
+        not available, the process tree below the registered browser PID is used.
+
+        Returns:
+            Dict with rss_mb (resident memory of all browser processes) and renderers, or None
+            if the browser processes could not be found
+        """
+        try:
+            info = driver.execute_cdp_cmd('SystemInfo.getProcessInfo', {}).get('processInfo', [])
+        except Exception:
+            info = []
+        if info:
+            pids = [item['id'] for item in info]
+            renderers = sum(1 for item in info if item.get('type') == 'renderer')
+        else:
+            with self.lock:
+                browsers = [entry['pid'] for entry in self.entries.get(id(driver), []) if entry['role'] == 'browser']
+            pids = [pid for browser_pid in browsers for pid in process_tree(browser_pid)]
+            renderers = sum(1 for pid in pids if is_renderer(pid))
+        if not pids:
+            return None
+        return {'rss_mb': round(process_memory(pids) / 1024 / 1024, 1), 'renderers': renderers, 'processes': len(pids)}
+
+    def quit(self, driver):
+        """
+        Quit a WebDriver and stop whatever is left of its driver and browser processes.
+
+        Returns:
+            Number of processes that had to be killed after quit()
+        """
+        try:
+            driver.quit()
+        except Exception:
+            pass  # The session is already gone; its processes are handled below
+        with self.lock:
+            entries = self.entries.pop(id(driver), [])
+        killed = self._kill(entries)
+        self._save()
+        return killed
+
+    def quit_all(self):
+        """Stop every process this script started that is still running (atexit hook)."""
+        with self.lock:
+            entries = [entry for group in self.entries.values() for entry in group]
+            self.entries = {}
+        self._kill(entries)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def cleanup_orphans(self):
+        """
+        Stop browsers and drivers whose script is no longer running (crashed or killed runs).
+
+        Processes of scripts that are still running are left alone, so several automations
+        can share the host.
+
+        Returns:
+            Number of processes stopped
+        """
+        killed = 0
+        try:
+            files = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+        except OSError:
+            return 0
+        for name in files:
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    registry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            owner = registry.get('owner', {})
+            if owner.get('pid') == os.getpid() or self._alive(owner):
+                continue
+            count = self._kill(registry.get('processes', []))
+            if count:
+                print(f"⚠️ Stopped {count} browser processes left behind by {owner.get('script')} (PID {owner.get('pid')}).")
+            killed += count
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return killed
+
+    def status(self):
+        """Registries of all scripts: owner, whether it still runs, and its processes."""
+        result = []
+        try:
+            files = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        except OSError:
+            return result
+        for name in files:
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                    registry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            registry['running'] = self._alive(registry.get('owner', {}))
+            result.append(registry)
+        return result
+
+    def _alive(self, entry):
+        """
+        True if the PID still belongs to the process that was recorded (not a reused PID).
+
+        Both the executable name and, where it was recorded, the creation time must match;
+        a process whose creation time cannot be read any more counts as gone.
+        """
+        if not entry.get('pid') or process_name(entry['pid']) != entry.get('name'):
+            return False
+        if entry.get('created') is None:
+            return True  # Registry written before creation times were recorded
+        return same_process(entry['pid'], entry['created'])
+
+    def _kill(self, entries):
+        killed = 0
+        # Browsers first, so the driver does not restart or wait for them
+        for entry in sorted(entries, key=lambda e: e['role'] != 'browser'):
+            if self._alive(entry):
+                kill_process(entry['pid'])
+                killed += 1
+        return killed
+
+    def _save(self):
+        with self.lock:
+            entries = [entry for group in self.entries.values() for entry in group]
+        if not entries:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f'{self.path}.tmp'
+        with self.write_lock:
+            if not self.owner['name']:
+                self.owner['name'] = process_name(self.owner['pid'])
+                self.owner['created'] = process_created(self.owner['pid'])
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'owner': self.owner, 'processes': entries}, f, indent=2)
+            os.replace(temp_path, self.path)
+
+
+# Registry shared by every script, worker pool and the session service of the process
+processes = BrowserProcesses()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Show or clean up the browsers started by the automation scripts")
+    parser.add_argument('--status', action='store_true', help="List the scripts and the browser processes they started")
+    parser.add_argument('--cleanup', action='store_true', help="Stop browsers whose script is no longer running")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        print(f"✅ {processes.cleanup_orphans()} orphaned browser processes stopped.")
+    for registry in processes.status():
+        owner = registry.get('owner', {})
+        state = 'running' if registry['running'] else 'gone'
+        print(f"{owner.get('script')} (PID {owner.get('pid')}, {state}): "
+              + ', '.join(f"{p['name']} {p['pid']}" for p in registry.get('processes', [])))
@@ -0,0 +1,283 @@
+"""
+ServiceNow Slim Browser Profile
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Starts the automation browsers from a small snapshot of the user profile
+instead of the full Edge/Chrome "User Data" directory. Only the files that carry the
+ServiceNow and SSO session (cookie store and its encryption key) are copied, plus the
+instance and SSO cookies of the last successful login, so a browser starts in a couple of
+seconds, the user's own browser does not have to be killed, and several workers can run
+side by side. Snapshot and cookie files are only readable by the user running the scripts.
+License: MIT
+
+Configuration (environment variables):
+    SERVICENOW_PROFILE_ROOT=<path>  Directory for the snapshots. Defaults to /dev/shm (tmpfs) when it
+                                    exists, otherwise the temp directory. Point it at a RAM disk on Windows.
+    SERVICENOW_SSO_DOMAINS=login.microsoftonline.com
+                                    Comma separated identity provider domains whose cookies are captured
+                                    along with the instance's
+
+Usage:
+    python servicenow_profile.py --refresh    # Take a new snapshot (e.g. after signing in again)
+    python servicenow_profile.py --status
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+# Profile files that hold the session: the cookie store (current and pre-Network layout) and
+# "Local State", which carries the key the cookie store is encrypted with
+SESSION_FILES = [
+    'Local State',
+    '{profile}/Network/Cookies',
+    '{profile}/Network/Cookies-journal',
+    '{profile}/Cookies',
+    '{profile}/Cookies-journal',
+]
+
+# Start-up switches that skip work a throwaway profile does not need
+SLIM_SWITCHES = [
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-extensions',
+    '--disable-sync',
+    '--disable-features=msEdgeSidebarV2,msImplicitSignin,EdgeCollections',
+]
+
+# File in the snapshot holding the instance and SSO cookies of the last successful login (CDP format)
+COOKIES_FILE = 'session_cookies.json'
+
+
+def sso_domains():
+    """Identity provider domains whose cookies are kept with the instance's (SERVICENOW_SSO_DOMAINS)."""
+    value = os.getenv('SERVICENOW_SSO_DOMAINS', 'login.microsoftonline.com')
+    return [domain.strip().lower() for domain in value.split(',') if domain.strip()]
+
+
+def cookie_matches(cookie_domain, domains):
+    """True if a cookie of cookie_domain is sent to one of the domains, or belongs to a subdomain of one."""
+    cookie_domain = cookie_domain.lstrip('.').lower()
+    return any(cookie_domain == domain or domain.endswith('.' + cookie_domain) or cookie_domain.endswith('.' + domain)
+               for domain in domains)
+
+
+def write_private(path, text):
+    """Write a file that only the current user can read (mode 0600), replacing it atomically."""
+    temp_path = f'{path}.tmp'
+    try:
+        os.remove(temp_path)  # A leftover temp file would keep its old permissions
+    except OSError:
+        pass
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def default_profile_root():
+    """Snapshot location: SERVICENOW_PROFILE_ROOT, else tmpfs when available, else the temp directory."""
+    root = os.getenv('SERVICENOW_PROFILE_ROOT')
+    if root:
+        return root
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm/servicenow_profile'
+    return os.path.join(tempfile.gettempdir(), 'servicenow_profile')
+
+
+class SlimProfile:
+    """
+    Minimal copy of a browser profile that carries only the ServiceNow/SSO session.
+
+    The snapshot is taken from the full profile on first use and again whenever it is
+    older than max_age or the session turned out to be expired (refresh()). Every login
+    that succeeds stores the browser's instance and SSO cookies in the snapshot (capture()),
+    and every browser started from it gets them back (apply_cookies()), so the snapshot
+    stays usable even when the cookie store of a running browser could not be copied.
+
+    Args:
+        source: Full "User Data" directory of the user's Edge or Chrome
+        profile_directory: Profile inside it (e.g. 'Default', 'Profile 2')
+        name: Snapshot directory name (one per browser/profile)
+        root: Directory the snapshot is kept in (see default_profile_root)
+        max_age: Seconds after which the snapshot is taken again
+    """
+
+    def __init__(self, source, profile_directory='Default', name='edge', root=None, max_age=8 * 3600):
+        self.source = source
+        self.profile_directory = profile_directory
+        self.path = os.path.join(root or default_profile_root(), name)
+        self.max_age = max_age
+        self.clones = []
+        self.lock = threading.Lock()
+
+    @property
+    def age(self):
+        """Seconds since the snapshot was taken (None if there is none)."""
+        try:
+            return time.time() - os.path.getmtime(os.path.join(self.path, 'Local State'))
+        except OSError:
+            return None
+
+    def ensure(self):
+        """Take the snapshot if it is missing or too old, and return its path."""
+        age = self.age
+        if age is None or age > self.max_age:
+            self.refresh()
+        return self.path
+
+    def refresh(self, keep_cookies=True):
+        """
+        Take a new snapshot of the session files.
+
+        Args:
+            keep_cookies: Keep the cookies captured from the last login (False once they turned out to be expired)
+        """
+        cookies = self._load_cookies() if keep_cookies else []
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(os.path.join(self.path, self.profile_directory), mode=0o700, exist_ok=True)
+        copied = 0
+        for pattern in SESSION_FILES:
+            relative = pattern.format(profile=self.profile_directory)
+            source_file = os.path.join(self.source, relative)
+            if not os.path.exists(source_file):
+                continue
+            target_file = os.path.join(self.path, relative)
+            os.makedirs(os.path.dirname(target_file), exist_ok=True)
+            try:
+                shutil.copyfile(source_file, target_file)
+                os.chmod(target_file, 0o600)
+                copied += 1
+            except OSError as e:
+                # The running browser can hold the cookie store open; captured cookies cover for it
+                print(f"⚠️ Could not copy {relative} from the user profile: {e}")
+        # "Local State" also dates the snapshot
+        local_state = os.path.join(self.path, 'Local State')
+        if not os.path.exists(local_state):
+            write_private(local_state, '{}')
+        if cookies:
+            self._save_cookies(cookies)
+        print(f"✅ Slim profile snapshot taken in {self.path} ({copied} session files).")
+        return self.path
+
+    def options(self, options):
+        """
+        Point Edge/Chrome options at a private copy of the snapshot (taking the snapshot first if needed).
+
+        Every browser gets its own copy, so scripts and workers never wait for each other's profile lock.
+        Delete a copy with remove_clone() when its browser is replaced, and the rest with
+        remove_clones() once the browsers have quit.
+
+        Args:
+            options: webdriver.EdgeOptions or webdriver.ChromeOptions
+
+        Returns:
+            The same options object
+        """
+        options.add_argument(f'user-data-dir={self.clone()}')
+        options.add_argument(f'profile-directory={self.profile_directory}')
+        for switch in SLIM_SWITCHES:
+            options.add_argument(switch)
+        return options
+
+    def clone(self):
+        """Copy the snapshot to a new directory for one more parallel browser and return its path."""
+        self.ensure()
+        path = tempfile.mkdtemp(prefix='servicenow_profile_', dir=os.path.dirname(self.path))
+        shutil.copytree(self.path, path, dirs_exist_ok=True)
+        with self.lock:
+            self.clones.append(path)
+        return path
+
+    def apply_cookies(self, driver):
+        """Load the captured session cookies into a freshly started browser (all domains, no page load needed)."""
+        cookies = self._load_cookies()
+        if cookies:
+            driver.execute_cdp_cmd('Network.setCookies', {'cookies': cookies})
+        return len(cookies)
+
+    def capture(self, driver, url):
+        """
+        Store the session cookies of a logged-in browser in the snapshot for the next start.
+
+        Only cookies of the instance and of the SSO domains (SERVICENOW_SSO_DOMAINS) are kept;
+        the browser's other cookies never reach the disk.
+
+        Args:
+            driver: WebDriver that has just logged in
+            url: Any URL of the instance (e.g. the login URL)
+
+        Returns:
+            Number of cookies stored
+        """
+        domains = [urlparse(url).hostname.lower()] + sso_domains()
+        cookies = [cookie for cookie in driver.execute_cdp_cmd('Network.getAllCookies', {}).get('cookies', [])
+                   if cookie_matches(cookie.get('domain', ''), domains)]
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        self._save_cookies(cookies)
+        return len(cookies)
+
+    def remove_clone(self, driver):
+        """
+        Delete the private copy a quit browser was started from (e.g. after it was recycled).
+
+        The copy is found by the user data directory the driver reports; one that cannot be
+        matched is left to remove_clones().
+
+        Returns:
+            True if a copy was deleted
+        """
+        capabilities = getattr(driver, 'capabilities', None) or {}
+        reported = {os.path.normcase(os.path.abspath(value['userDataDir'])) for value in capabilities.values()
+                    if isinstance(value, dict) and value.get('userDataDir')}
+        with self.lock:
+            matched = [path for path in self.clones if os.path.normcase(os.path.abspath(path)) in reported]
+            for path in matched:
+                self.clones.remove(path)
+        for path in matched:
+            shutil.rmtree(path, ignore_errors=True)
+        return bool(matched)
+
+    def remove_clones(self):
+        """Delete the private copies handed out by clone()."""
+        with self.lock:
+            clones, self.clones = self.clones, []
+        for path in clones:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _load_cookies(self):
+        try:
+            with open(os.path.join(self.path, COOKIES_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save_cookies(self, cookies):
+        # CDP setCookies takes the fields getAllCookies returns, minus the read-only ones;
+        # session cookies come back with expires=-1 and must be set without an expiry
+        keep = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires', 'priority',
+                'sourceScheme', 'sourcePort', 'partitionKey')
+        cookies = [{key: cookie[key] for key in keep
+                    if key in cookie and not (key == 'expires' and (cookie.get('session') or cookie[key] < 0))}
+                   for cookie in cookies]
+        write_private(os.path.join(self.path, COOKIES_FILE), json.dumps(cookies))
+
+
+if __name__ == '__main__':
+    from servicenow_session import edge_profile_path
+
+    parser = argparse.ArgumentParser(description="Manage the slim browser profile snapshot")
+    parser.add_argument('--refresh', action='store_true', help="Take a new snapshot from the user profile")
+    parser.add_argument('--status', action='store_true', help="Show where the snapshot is and how old it is")
+    args = parser.parse_args()
+
+    profile = SlimProfile(edge_profile_path)
+    if args.refresh:
+        profile.refresh()
+    age = profile.age
+    print(f"{profile.path}: " + ("no snapshot" if age is None else
+          f"taken {age / 60:.0f} minutes ago, {len(profile._load_cookies())} captured cookies"))
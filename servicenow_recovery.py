@@ -0,0 +1,201 @@
+"""
+ServiceNow Record Recovery
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Keeps a batch running when a single record fails. Failures are classified
+(stale element, timeout, frame detached, session dead), the record is retried with a
+bounded exponential backoff after the matching recovery step - the shell iframe is
+resolved again, a dead browser is replaced - and a record that keeps failing is moved
+to a dead-letter list instead of stopping the run.
+License: MIT
+
+Usage:
+    recovery = RecordRecovery(DeadLetterList(path, 'update'), navigator, restart_driver=restart_browser)
+    for record in records:
+        recovery.run(record['number'], lambda: post_follow_up(record))
+        if recovery.exhausted:
+            break
+"""
+
+import json
+import threading
+import time
+from selenium.common.exceptions import (InvalidSessionIdException, NoSuchFrameException, NoSuchWindowException,
+                                        StaleElementReferenceException, TimeoutException)
+from servicenow_metrics import metrics
+from servicenow_throttle import ERROR as THROTTLE_ERROR, throttle
+
+# Failure kinds
+STALE = 'stale_element'
+TIMEOUT = 'timeout'
+FRAME = 'frame_detached'
+SESSION = 'session_dead'
+FAILED = 'failed'    # The workflow step returned False (e.g. a required element was not found)
+ERROR = 'error'      # Anything else
+
+# Fragments of WebDriver / HTTP error messages by failure kind (Edge and Chrome drivers)
+SESSION_MESSAGES = ('invalid session id', 'session deleted', 'no such session', 'not reachable', 'disconnected',
+                    'target window already closed', 'max retries exceeded', 'connection refused',
+                    'failed to establish a new connection', 'remote end closed connection')
+FRAME_MESSAGES = ('frame was detached', 'frame detached', 'no such frame', 'execution context was destroyed',
+                  'cannot find context')
+
+
+def classify_failure(error):
+    """
+    Map an exception raised while working on a record to a failure kind.
+
+    Args:
+        error: The exception, or None when the step returned a falsy result
+
+    Returns:
+        One of STALE, TIMEOUT, FRAME, SESSION, FAILED, ERROR
+    """
+    if error is None:
+        return FAILED
+    if isinstance(error, StaleElementReferenceException):
+        return STALE
+    if isinstance(error, (InvalidSessionIdException, NoSuchWindowException, ConnectionError)):
+        return SESSION
+    if isinstance(error, NoSuchFrameException):
+        return FRAME
+    if isinstance(error, TimeoutException):
+        return TIMEOUT
+    message = str(error).lower()
+    if any(fragment in message for fragment in SESSION_MESSAGES):
+        return SESSION
+    if any(fragment in message for fragment in FRAME_MESSAGES):
+        return FRAME
+    if 'stale element' in message:
+        return STALE
+    if 'timed out' in message or 'timeout' in message:
+        return TIMEOUT
+    return ERROR
+
+
+class DeadLetterList:
+    """
+    Append-only JSONL list of the records a workflow gave up on.
+
+    Each line holds the record key (number or sys_id), the workflow, the failure kind,
+    the last error message and a timestamp, so the records can be rerun or handled by hand.
+
+    Args:
+        path: JSONL file the list is appended to
+        workflow: Workflow name stored with every entry (e.g. 'update')
+    """
+
+    def __init__(self, path, workflow):
+        self.path = path
+        self.workflow = workflow
+        self.lock = threading.Lock()
+        self.keys = []
+
+    def add(self, key, reason, error=None):
+        entry = {
+            'key': key,
+            'workflow': self.workflow,
+            'reason': reason,
+            'error': str(error).splitlines()[0][:300] if error and str(error) else None,
+            'ts': round(time.time(), 3),
+        }
+        with self.lock:
+            self.keys.append(key)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.keys
+
+    def __len__(self):
+        with self.lock:
+            return len(self.keys)
+
+
+class RecordRecovery:
+    """
+    Runs the work for one record with retries and recovery between the attempts.
+
+    Stale elements and timeouts are retried after the backoff alone. A detached frame
+    makes the navigator resolve the shell iframe again. A dead session replaces the
+    browser through restart_driver and points the navigator at the new driver.
+
+    Args:
+        dead_letter: DeadLetterList receiving the records that keep failing
+        navigator: ClassicNavigator to reset after frame and session failures (optional)
+        restart_driver: Callable that replaces a dead browser and returns the new driver (optional)
+        retries: Extra attempts per record
+        base_delay: Seconds before the first retry; doubled for every further one
+        max_delay: Upper bound for the delay between attempts
+        max_consecutive: Records dead-lettered in a row after which exhausted becomes True
+    """
+
+    def __init__(self, dead_letter, navigator=None, restart_driver=None, retries=2, base_delay=2, max_delay=30,
+                 max_consecutive=5):
+        self.dead_letter = dead_letter
+        self.navigator = navigator
+        self.restart_driver = restart_driver
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_consecutive = max_consecutive
+        self.consecutive_failures = 0
+
+    @property
+    def exhausted(self):
+        """True when so many records failed in a row that the instance itself is probably unavailable."""
+        return self.consecutive_failures >= self.max_consecutive
+
+    def run(self, key, action, retry=None):
+        """
+        Run the work for one record until it succeeds or the retries are used up.
+
+        Args:
+            key: Record number or sys_id (used in messages and the dead-letter list)
+            action: Callable doing the work; a truthy result means success
+            retry: Callable used for the retries instead of action (e.g. one that reloads the page first)
+
+        Returns:
+            The truthy result of the successful attempt, or None if the record was dead-lettered
+        """
+        for attempt in range(self.retries + 1):
+            step = action if attempt == 0 or retry is None else retry
+            try:
+                result = step()
+                if result:
+                    self.consecutive_failures = 0
+                    return result
+                kind, error = FAILED, None
+            except Exception as e:
+                kind, error = classify_failure(e), e
+                if kind == TIMEOUT:
+                    # Timeouts are the instance falling behind - let every workflow of the process back off
+                    throttle.observe(outcome=THROTTLE_ERROR)
+
+            if attempt < self.retries:
+                delay = min(self.base_delay * 2 ** attempt, self.max_delay)
+                print(f"⚠️ {key}: {kind}, retry {attempt + 1}/{self.retries} in {delay:.0f}s.")
+                self.recover(kind, key)
+                # Other workers may use this worker's throttle slot while it waits
+                with throttle.released():
+                    time.sleep(delay)
+
+        print(f"❌ {key}: still failing after {self.retries + 1} attempts ({kind}), moved to the dead-letter list.")
+        self.dead_letter.add(key, kind, error)
+        self.consecutive_failures += 1
+        return None
+
+    def recover(self, kind, key=None):
+        """Apply the recovery step for a failure kind before the next attempt."""
+        with metrics.span('recover', key) as span:
+            span.fail(kind)
+            try:
+                if kind == SESSION and self.restart_driver:
+                    print("⚠️ Browser session is gone, starting a new browser.")
+                    driver = self.restart_driver()
+                    if self.navigator:
+                        self.navigator.reset(driver)
+                elif kind in (FRAME, SESSION) and self.navigator:
+                    self.navigator.reset()
+            except Exception as e:
+                print(f"⚠️ Recovery after {kind} failed: {e}")
@@ -0,0 +1,161 @@
+"""
+ServiceNow Browser Recycling
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Keeps long runs (daemon mode, big lists, worker pools) from slowing down as
+the headless browser grows over hours of list reloads. Between records the browser's
+process tree is sampled - resident memory and number of renderers - and once it crosses
+the watermark it is replaced by a standby browser that was started and logged in while
+the old one kept working. The old browser is quit in the background, so memory stays
+flat without a pause in throughput.
+License: MIT
+
+Configuration (environment variables):
+    SERVICENOW_BROWSER_MAX_MB=1500       Resident memory of the browser process tree that triggers a swap (0 = off)
+    SERVICENOW_BROWSER_MAX_RENDERERS=20  Renderer processes that trigger a swap (0 = no renderer limit)
+    SERVICENOW_RECYCLE_INTERVAL=30       Seconds between two samples of the same browser
+
+Usage:
+    recycler = BrowserRecycler(start_browser, standby=args.slim_profile)
+    for record in records:
+        driver = recycler.recycle(driver)   # Same driver, or the warm standby once the watermark is crossed
+        ...
+    recycler.close()
+"""
+
+import os
+import threading
+import time
+from servicenow_metrics import metrics
+from servicenow_processes import processes
+
+
+class BrowserRecycler:
+    """
+    Replaces a browser that has grown past a memory or renderer watermark between records.
+
+    At warm_fraction of the watermark a standby browser is started (and logged in) in a
+    background thread; at the watermark itself the caller gets the standby and the old
+    browser is quit in the background. Until the standby is ready the old browser keeps
+    working. Without a standby (the full user profile can only be opened by one browser)
+    the old browser is quit first and the new one started in its place.
+
+    Args:
+        start_browser: Callable returning a new, logged-in WebDriver (or None if the login failed)
+        quit_browser: Callable quitting a WebDriver (defaults to processes.quit)
+        max_rss_mb: Memory watermark in MB (defaults to SERVICENOW_BROWSER_MAX_MB, 0 = off)
+        max_renderers: Renderer watermark (defaults to SERVICENOW_BROWSER_MAX_RENDERERS, 0 = no limit)
+        interval: Seconds between samples (defaults to SERVICENOW_RECYCLE_INTERVAL)
+        standby: Start the replacement ahead of time while the old browser keeps working
+        warm_fraction: Fraction of the watermark at which the standby is started
+        enabled: False turns recycle() into a no-op (e.g. for browsers leased from the session service)
+    """
+
+    def __init__(self, start_browser, quit_browser=None, max_rss_mb=None, max_renderers=None, interval=None,
+                 standby=True, warm_fraction=0.8, enabled=True):
+        self.start_browser = start_browser
+        self.quit_browser = quit_browser or processes.quit
+        self.max_rss_mb = max_rss_mb if max_rss_mb is not None else float(os.getenv('SERVICENOW_BROWSER_MAX_MB', '1500'))
+        self.max_renderers = (max_renderers if max_renderers is not None
+                              else int(os.getenv('SERVICENOW_BROWSER_MAX_RENDERERS', '20')))
+        self.interval = interval if interval is not None else float(os.getenv('SERVICENOW_RECYCLE_INTERVAL', '30'))
+        self.use_standby = standby
+        self.warm_fraction = warm_fraction
+        self.enabled = enabled and self.max_rss_mb > 0
+        self.lock = threading.Lock()
+        self.standby = None
+        self.warming = None
+        self.next_sample = time.monotonic() + self.interval
+        self.next_warm = 0.0
+        self.recycled = 0
+        self.last_usage = None
+
+    def level(self, usage):
+        """Largest fraction of a watermark the sampled usage has reached (1.0 = at the watermark)."""
+        level = usage['rss_mb'] / self.max_rss_mb
+        if self.max_renderers:
+            level = max(level, usage['renderers'] / self.max_renderers)
+        return level
+
+    def recycle(self, driver):
+        """
+        Sample the browser (at most once per interval) and swap it out once it crossed the watermark.
+
+        Call between records, when no page of the old browser is needed any more.
+
+        Returns:
+            The driver to continue with - the same one, or its replacement
+        """
+        if not self.enabled or time.monotonic() < self.next_sample:
+            return driver
+        self.next_sample = time.monotonic() + self.interval
+        usage = processes.usage(driver)
+        if usage is None:
+            return driver
+        self.last_usage = usage
+        level = self.level(usage)
+        if self.use_standby and level >= self.warm_fraction:
+            self._warm()
+        if level < 1:
+            return driver
+
+        reason = 'renderers' if self.max_renderers and usage['renderers'] >= self.max_renderers else 'memory'
+        if self.use_standby:
+            with self.lock:
+                replacement, self.standby = self.standby, None
+            if replacement is None:
+                # The standby is still logging in - keep working with the old browser until it is ready
+                self.next_sample = time.monotonic() + min(self.interval, 5)
+                return driver
+            threading.Thread(target=self._retire, args=(driver,), daemon=True).start()
+        else:
+            self._retire(driver)
+            replacement = self.start_browser()
+            if replacement is None:
+                raise RuntimeError("Login failed while replacing the browser")
+        self.recycled += 1
+        with metrics.span('recycle') as span:
+            span.fail(reason)
+        print(f"✅ Browser replaced at {usage['rss_mb']:.0f} MB / {usage['renderers']} renderers ({reason}).")
+        # Give the new browser a full interval before it is sampled
+        self.next_sample = time.monotonic() + self.interval
+        return replacement
+
+    def close(self):
+        """Quit a standby browser that was never used (call when the script ends)."""
+        warming = self.warming
+        if warming is not None:
+            warming.join()
+        with self.lock:
+            standby, self.standby = self.standby, None
+        if standby is not None:
+            self._retire(standby)
+
+    def _warm(self):
+        with self.lock:
+            if self.standby is not None or (self.warming is not None and self.warming.is_alive()):
+                return
+            if time.monotonic() < self.next_warm:
+                return
+            self.warming = threading.Thread(target=self._start_standby, daemon=True)
+            self.warming.start()
+
+    def _start_standby(self):
+        try:
+            with metrics.span('standby_start') as span:
+                standby = self.start_browser()
+                if standby is None:
+                    span.fail()
+        except Exception as e:
+            print(f"⚠️ Standby browser could not be started: {e}")
+            standby = None
+        with self.lock:
+            if standby is None:
+                # Do not retry the login on every sample
+                self.next_warm = time.monotonic() + 10 * self.interval
+            self.standby = standby
+
+    def _retire(self, driver):
+        try:
+            self.quit_browser(driver)
+        except Exception as e:
+            print(f"⚠️ Old browser could not be quit: {e}")
@@ -0,0 +1,113 @@
+"""
+ServiceNow Reference Cache
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Persistent cache of reference field sys_ids (e.g. implementer name -> sys_user
+sys_id) so reference fields can be set directly instead of typing the display name and
+waiting for the autocomplete lookup every time.
+License: MIT
+"""
+
+import json
+import os
+import threading
+import time
+
+# Sets the hidden sys_id input behind a reference display input and the display text itself
+SET_REFERENCE_SCRIPT = """
+var display = arguments[0], sysId = arguments[1], text = arguments[2];
+var hidden = document.getElementById(display.id.replace(/^sys_display\\./, ''));
+if (!hidden) return false;
+display.value = text;
+hidden.value = sysId;
+hidden.dispatchEvent(new Event('change', {bubbles: true}));
+return true;
+"""
+
+# Reads the sys_id the reference input has resolved to (empty while unresolved)
+READ_REFERENCE_SCRIPT = """
+var display = arguments[0];
+var hidden = document.getElementById(display.id.replace(/^sys_display\\./, ''));
+return hidden ? hidden.value : '';
+"""
+
+
+class ReferenceCache:
+    """
+    Display value to sys_id cache, stored as JSON and expired after a TTL.
+
+    Args:
+        path: JSON file the cache is persisted to
+        ttl: Seconds an entry stays valid (users are rarely re-created, so this can be long)
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                # A damaged cache is simply rebuilt
+                self.entries = {}
+
+    def get(self, key):
+        """Return the cached sys_id for a display value, or None if missing or expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            if time.time() - entry['stored_at'] > self.ttl:
+                del self.entries[key]
+                return None
+            return entry['sys_id']
+
+    def set(self, key, sys_id):
+        """Store a sys_id for a display value and persist the cache."""
+        with self.lock:
+            self.entries[key] = {'sys_id': sys_id, 'stored_at': time.time()}
+        self.save()
+
+    def invalidate(self, key=None):
+        """Drop one entry (e.g. after it was rejected by the instance) or the whole cache."""
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+        self.save()
+
+    def save(self):
+        """Write the cache to disk atomically."""
+        with self.lock:
+            data = json.dumps(self.entries, indent=2, ensure_ascii=False)
+        temp_path = f'{self.path}.tmp'
+        # Parallel API workers can store entries at the same moment
+        with self.write_lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+
+
+def set_reference_value(driver, display_input, sys_id, display_value):
+    """
+    Set a reference field directly from a cached sys_id, skipping the autocomplete.
+
+    Args:
+        driver: WebDriver instance
+        display_input: The sys_display.* input of the reference field
+        sys_id: sys_id of the referenced record
+        display_value: Text shown in the field
+
+    Returns:
+        True if the hidden value input was found and set
+    """
+    return driver.execute_script(SET_REFERENCE_SCRIPT, display_input, sys_id, display_value)
+
+
+def read_reference_value(driver, display_input):
+    """Return the sys_id a reference input has resolved to, or an empty string."""
+    return driver.execute_script(READ_REFERENCE_SCRIPT, display_input) or ''
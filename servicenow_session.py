@@ -0,0 +1,388 @@
+"""
+ServiceNow Session Service
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Resident service that keeps warm, logged-in Edge browsers alive and leases
+them to the automation scripts. Scripts attach to a leased browser through its DevTools
+port, so they skip the browser cold start and the login click.
+License: MIT
+
+Run the service once (e.g. at logon):
+    python servicenow_session.py --sessions 2
+
+Then start any script with --session-service:
+    python assign_task_edge.py --session-service
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import uuid
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from servicenow_lean import enable_lean_network, lean_options
+from servicenow_metrics import metrics
+from servicenow_processes import process_created, process_name, processes, same_process
+from servicenow_profile import SlimProfile
+
+# Address the lease service listens on (local connections only)
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = int(os.getenv('SERVICENOW_SESSION_PORT', '8765'))
+
+# First DevTools port; session N uses DEBUG_PORT_BASE + N
+DEBUG_PORT_BASE = 9300
+
+# Path to Edge profile - using a generic path
+# Note: Update this path according to your environment
+edge_profile_path = os.path.join(os.getenv('USERPROFILE', 'C:\\'), 'AppData', 'Local', 'Microsoft', 'Edge', 'User Data')
+
+# ServiceNow URLs
+# Note: Replace with your organization's ServiceNow URLs
+instance_url = 'https://your_instance.service-now.com'
+login_url = f'{instance_url}/'
+
+# Login element - replace with the selector used by your login page
+login_selector = "[data-test-id='login.button']"
+
+# Page loaded periodically to keep idle sessions authenticated
+keepalive_url = f'{instance_url}/stats.do'
+
+
+def login(driver):
+    """
+    Open the login page and click the login element if the instance asks for it.
+
+    Returns:
+        True if the browser is logged in afterwards, False otherwise
+    """
+    with metrics.span('login') as span:
+        driver.get(login_url)
+        try:
+            next_button = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, login_selector)))
+            next_button.click()
+        except (NoSuchElementException, TimeoutException):
+            # No login prompt - the profile is already authenticated
+            pass
+        logged_in = 'login' not in driver.current_url
+        if not logged_in:
+            span.fail()
+    return logged_in
+
+
+class SessionPool:
+    """
+    Pool of warm browser sessions and their leases.
+
+    The first session uses the Edge user profile (which holds the SSO state); the
+    others use throwaway profiles seeded with the first session's cookies so they
+    do not fight over the profile lock. With a slim profile every session starts
+    from its own copy of the session snapshot and the user profile is not opened at all.
+
+    A session whose login failed is not leased until a keep-alive pass has logged it in. A
+    lease older than lease_ttl is only reclaimed once the process that holds it has exited;
+    the lease of a holder that exited is reclaimed right away.
+    """
+
+    def __init__(self, size, headless=True, lease_ttl=4 * 3600, lean=False, slim_profile=None):
+        self.size = size
+        self.headless = headless
+        self.lean = lean
+        self.slim_profile = slim_profile
+        self.lease_ttl = lease_ttl
+        self.sessions = []
+        self.lock = threading.Lock()
+
+    def _start_browser(self, index, cookies=None):
+        """Start one Edge instance with a DevTools port and log it in."""
+        port = DEBUG_PORT_BASE + index
+        options = webdriver.EdgeOptions()
+        if self.slim_profile:
+            self.slim_profile.options(options)
+            profile_dir = self.slim_profile.clones[-1]
+        elif index == 0:
+            profile_dir = None
+            options.add_argument(f'user-data-dir={edge_profile_path}')
+            options.add_argument('profile-directory=Default')
+        else:
+            profile_dir = tempfile.mkdtemp(prefix='servicenow_session_')
+            options.add_argument(f'user-data-dir={profile_dir}')
+        options.add_argument(f'--remote-debugging-port={port}')
+        options.add_argument('--window-size=1920,1080')
+        if self.headless:
+            options.add_argument('--headless=new')
+        if self.lean:
+            lean_options(options)
+        driver = processes.start('edge', options)
+        if self.lean:
+            enable_lean_network(driver)
+        if self.slim_profile:
+            self.slim_profile.apply_cookies(driver)
+
+        if cookies:
+            # Cookies can only be set for the domain that is currently loaded
+            driver.get(f'{instance_url}/robots.txt')
+            for cookie in cookies:
+                cookie.pop('sameSite', None)
+                try:
+                    driver.add_cookie(cookie)
+                except Exception as e:
+                    print(f"⚠️ Could not copy cookie {cookie.get('name')}: {e}")
+
+        usable = login(driver)
+        if not usable:
+            print(f"❌ Session {index} could not log in, it is not leased until a keep-alive pass logs it in.")
+        elif self.slim_profile:
+            self.slim_profile.capture(driver, login_url)
+        return {
+            'index': index,
+            'driver': driver,
+            'debugger_address': f'127.0.0.1:{port}',
+            'profile_dir': profile_dir,
+            'lease_id': None,
+            'leased_by': None,
+            'leased_at': None,
+            'holder': None,
+            'usable': usable,
+        }
+
+    def start(self):
+        """Start and log in every session."""
+        # Clear browsers left over from crashed runs so the user profile is not locked by them
+        processes.cleanup_orphans()
+        first = self._start_browser(0)
+        self.sessions.append(first)
+        cookies = first['driver'].get_cookies()
+        for index in range(1, self.size):
+            self.sessions.append(self._start_browser(index, [dict(cookie) for cookie in cookies]))
+        print(f"✅ {len(self.sessions)} warm sessions ready.")
+
+    def lease(self, client, holder=None):
+        """
+        Lease a free, logged-in session to a client.
+
+        Leases whose holder process has exited are reclaimed first, as are leases older than
+        lease_ttl whose holder is unknown (clients that do not send it).
+
+        Args:
+            client: Name of the calling script
+            holder: {'pid', 'created'} of the calling process
+        """
+        now = time.time()
+        with self.lock:
+            for session in self.sessions:
+                if session['lease_id'] and self._abandoned(session, now):
+                    print(f"⚠️ Reclaiming the lease of session {session['index']} from {session['leased_by']}.")
+                    session['lease_id'] = None
+                    session['holder'] = None
+            for session in self.sessions:
+                if session['lease_id'] is None and session['usable']:
+                    session['lease_id'] = uuid.uuid4().hex
+                    session['leased_by'] = client
+                    session['leased_at'] = now
+                    session['holder'] = holder
+                    print(f"✅ Session {session['index']} leased to {client}.")
+                    return {'lease_id': session['lease_id'], 'debugger_address': session['debugger_address']}
+        return {'error': 'no free session'}
+
+    def _abandoned(self, session, now):
+        """True if the holder of a lease has exited, or it is unknown and the lease is older than lease_ttl."""
+        holder = session['holder']
+        if holder and holder.get('pid'):
+            if process_name(holder['pid']) is None:
+                return True
+            return holder.get('created') is not None and not same_process(holder['pid'], holder['created'])
+        return now - session['leased_at'] > self.lease_ttl
+
+    def release(self, lease_id):
+        """Return a leased session to the pool."""
+        with self.lock:
+            for session in self.sessions:
+                if session['lease_id'] == lease_id:
+                    print(f"✅ Session {session['index']} released by {session['leased_by']}.")
+                    session['lease_id'] = None
+                    session['leased_by'] = None
+                    session['holder'] = None
+                    return {'released': True}
+        return {'error': 'unknown lease'}
+
+    def status(self):
+        """Describe every session and who holds it."""
+        with self.lock:
+            return {'sessions': [
+                {'index': s['index'], 'debugger_address': s['debugger_address'], 'leased_by': s['leased_by'],
+                 'usable': s['usable']}
+                for s in self.sessions
+            ]}
+
+    def keep_warm(self, interval):
+        """Periodically touch idle sessions, re-login expired ones and restart dead browsers."""
+        while True:
+            time.sleep(interval)
+            for session in self.sessions:
+                with self.lock:
+                    if session['lease_id'] is not None:
+                        continue
+                    # Mark the session as busy so it is not leased while it is refreshed
+                    session['lease_id'] = 'keepalive'
+                    session['leased_at'] = time.time()
+                    session['holder'] = {'pid': os.getpid(), 'created': process_created(os.getpid())}
+                try:
+                    session['driver'].get(keepalive_url)
+                    usable = 'login' not in session['driver'].current_url
+                    if not usable:
+                        print(f"⚠️ Session {session['index']} is not logged in, logging in again.")
+                        usable = login(session['driver'])
+                        if usable:
+                            if self.slim_profile:
+                                self.slim_profile.capture(session['driver'], login_url)
+                        elif self.slim_profile:
+                            # Take the session files from the user profile again for the next restart
+                            self.slim_profile.refresh(keep_cookies=False)
+                    if usable != session['usable']:
+                        print(f"{'✅' if usable else '❌'} Session {session['index']} is "
+                              f"{'usable again' if usable else 'not usable until it logs in'}.")
+                    session['usable'] = usable
+                except Exception as e:
+                    print(f"❌ Session {session['index']} is not responding ({e}), restarting it.")
+                    processes.quit(session['driver'])
+                    if self.slim_profile:
+                        self.slim_profile.remove_clone(session['driver'])
+                    try:
+                        cookies = None if session['index'] == 0 else self.sessions[0]['driver'].get_cookies()
+                        session.update(self._start_browser(session['index'], cookies))
+                    except Exception as e:
+                        print(f"❌ Session {session['index']} could not be restarted: {e}")
+                finally:
+                    with self.lock:
+                        session['lease_id'] = None
+                        session['holder'] = None
+
+    def stop(self):
+        """Quit every browser and remove the throwaway profiles."""
+        for session in self.sessions:
+            processes.quit(session['driver'])
+            if session['profile_dir']:
+                shutil.rmtree(session['profile_dir'], ignore_errors=True)
+
+
+class LeaseRequestHandler(socketserver.StreamRequestHandler):
+    """Answers one JSON request per line: lease, release or status."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.get('op')
+                if op == 'lease':
+                    response = self.server.pool.lease(request.get('client', 'unknown'), request.get('holder'))
+                elif op == 'release':
+                    response = self.server.pool.release(request.get('lease_id'))
+                elif op == 'status':
+                    response = self.server.pool.status()
+                else:
+                    response = {'error': f'unknown op {op}'}
+            except ValueError as e:
+                response = {'error': f'invalid request: {e}'}
+            self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+
+
+def _send(request, timeout=10):
+    """Send one request to the session service and return its JSON answer."""
+    with socket.create_connection((SERVICE_HOST, SERVICE_PORT), timeout=timeout) as connection:
+        connection.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        with connection.makefile('r', encoding='utf-8') as reader:
+            return json.loads(reader.readline())
+
+
+class SessionLease:
+    """
+    A browser leased from the session service.
+
+    Attributes:
+        driver: WebDriver attached to the warm, logged-in browser
+        lease_id: Identifier used to return the browser to the service
+    """
+
+    def __init__(self, driver, lease_id):
+        self.driver = driver
+        self.lease_id = lease_id
+
+    def release(self):
+        """Detach from the browser (it keeps running) and return it to the service."""
+        try:
+            processes.quit(self.driver)
+        finally:
+            _send({'op': 'release', 'lease_id': self.lease_id})
+
+
+def lease_session(client, timeout=120):
+    """
+    Lease a warm, logged-in browser from the session service.
+
+    Args:
+        client: Name of the calling script (shown in the service log)
+        timeout: Seconds to wait for a free session
+
+    Returns:
+        SessionLease whose driver is ready to use
+    """
+    deadline = time.time() + timeout
+    # Lets the service tell a crashed script's lease from one that is still in use
+    holder = {'pid': os.getpid(), 'created': process_created(os.getpid())}
+    while True:
+        response = _send({'op': 'lease', 'client': client, 'holder': holder})
+        if 'lease_id' in response:
+            break
+        if time.time() > deadline:
+            raise RuntimeError(f"No session available from the session service: {response.get('error')}")
+        time.sleep(1)
+
+    # Attach a new driver to the running browser instead of launching one
+    options = webdriver.EdgeOptions()
+    options.add_experimental_option('debuggerAddress', response['debugger_address'])
+    try:
+        # Only the attaching driver is ours; the browser belongs to the session service
+        driver = processes.start('edge', options, own_browser=False)
+    except Exception:
+        _send({'op': 'release', 'lease_id': response['lease_id']})
+        raise
+    return SessionLease(driver, response['lease_id'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Keep warm, logged-in ServiceNow browser sessions for the automation scripts")
+    parser.add_argument('--sessions', type=int, default=1, help="Number of browsers to keep warm")
+    parser.add_argument('--visible', action='store_true', help="Show the browsers instead of running headless")
+    parser.add_argument('--keepalive', type=int, default=300, help="Seconds between keep-alive page loads")
+    parser.add_argument('--lean', action='store_true', help="Block fonts, images and analytics in every session")
+    parser.add_argument('--slim-profile', action='store_true',
+                        help="Start every session from a snapshot of the profile's session instead of the full profile")
+    args = parser.parse_args()
+
+    metrics.configure('session_service')
+    pool = SessionPool(args.sessions, headless=not args.visible, lean=args.lean,
+                       slim_profile=SlimProfile(edge_profile_path) if args.slim_profile else None)
+    pool.start()
+    threading.Thread(target=pool.keep_warm, args=(args.keepalive,), daemon=True).start()
+
+    server = socketserver.ThreadingTCPServer((SERVICE_HOST, SERVICE_PORT), LeaseRequestHandler)
+    server.daemon_threads = True
+    server.pool = pool
+    print(f"✅ Session service listening on {SERVICE_HOST}:{SERVICE_PORT}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.stop()
+        metrics.close()
+        print("❌ Session service stopped.")
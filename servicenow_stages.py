@@ -0,0 +1,203 @@
+"""
+ServiceNow Incident Form Stages
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Actions that can be applied to an open incident form (assign, work note,
+resolve) without saving it, plus the single submit that saves them together. Used by
+resolve_incidents_edge.py and by the single-pass pipeline in incident_pipeline_edge.py.
+License: MIT
+"""
+
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import Select
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from servicenow_metrics import metrics
+from servicenow_reference import read_reference_value
+from servicenow_throttle import ERROR, OK, throttle
+from servicenow_waits import wait_for_ajax_idle, wait_for_autocomplete, wait_for_form_submit
+
+# Sets a field through the form's client API; returns false if the form is not initialised
+SET_FORM_VALUE_SCRIPT = """
+if (typeof g_form === 'undefined') return false;
+if (arguments[2]) { g_form.setValue(arguments[0], arguments[1], arguments[2]); }
+else { g_form.setValue(arguments[0], arguments[1]); }
+return true;
+"""
+
+
+@metrics.timed('element_find')
+def find_element_safe(driver, by, value, timeout=10):
+    """
+    Safely find an element with explicit wait.
+    Returns None if element is not found within the timeout period.
+    """
+    try:
+        return WebDriverWait(driver, timeout).until(EC.presence_of_element_located((by, value)))
+    except TimeoutException:
+        return None
+
+
+def click_element_safe(wait, element):
+    """
+    Clicks an element using WebDriverWait with an explicit wait for clickability.
+    """
+    wait.until(EC.element_to_be_clickable(element)).click()
+
+
+def select_tab_by_text(wait, tab_text):
+    """
+    Selects a tab by its text content.
+    """
+    tab_headers = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "span.tab_header")))
+    for tab_header in tab_headers:
+        try:
+            tab_element = tab_header.find_element(By.CSS_SELECTOR, "span.tabs2_tab")
+
+            if tab_text in tab_element.text:
+                click_element_safe(wait, tab_element)
+                return  # Tab found and clicked, exit the function
+        except Exception as e:
+            print(f"Error processing tab: {e}")
+    raise Exception(f"Tab with text '{tab_text}' not found.")
+
+
+@metrics.timed('edit')
+def set_assignee(driver, implementer_text, reference_cache=None):
+    """
+    Set assigned_to on the open incident form.
+
+    Uses the cached sys_user sys_id when available, otherwise types the name into the
+    reference field and stores the sys_id it resolves to.
+
+    Returns:
+        True if the field was set, False if it was not found
+    """
+    cache_key = f"sys_user:{implementer_text}"
+    cached_sys_id = reference_cache.get(cache_key) if reference_cache else None
+    if cached_sys_id and driver.execute_script(SET_FORM_VALUE_SCRIPT, 'assigned_to', cached_sys_id, implementer_text):
+        print(f"✅ Assigned to '{implementer_text}' (cached).")
+        return True
+
+    assignee = find_element_safe(driver, By.ID, "sys_display.incident.assigned_to")
+    if not assignee:
+        print("❌ Assigned to field not found.")
+        return False
+    assignee.clear()
+    assignee.send_keys(implementer_text)
+    wait_for_autocomplete(driver, assignee)
+    resolved_sys_id = read_reference_value(driver, assignee)
+    if reference_cache and resolved_sys_id:
+        reference_cache.set(cache_key, resolved_sys_id)
+    print(f"✅ Assigned to '{implementer_text}'.")
+    return True
+
+
+@metrics.timed('edit')
+def add_work_note(driver, text):
+    """
+    Add a work note to the open incident form; it is saved together with the form.
+
+    Returns:
+        True if the work note was entered, False if the field was not found
+    """
+    if driver.execute_script(SET_FORM_VALUE_SCRIPT, 'work_notes', text, None):
+        print("✅ Work notes updated.")
+        return True
+
+    work_notes = find_element_safe(driver, By.ID, "activity-stream-work_notes-textarea")
+    if not work_notes:
+        print("❌ Work notes textarea not found.")
+        return False
+    work_notes.send_keys(text)
+    print("✅ Work notes updated.")
+    return True
+
+
+@metrics.timed('edit')
+def set_resolution(driver, wait, close_code, close_notes):
+    """
+    Set the state to Resolved and fill the Resolution Information tab, without saving.
+
+    Args:
+        driver: WebDriver showing the incident form
+        wait: WebDriverWait bound to that driver
+        close_code: Visible text of the resolution code (e.g. "Solution provided")
+        close_notes: Resolution notes text
+
+    Returns:
+        True if every field was set, False if a required element was missing
+    """
+    # Find incident state dropdown
+    set_state = find_element_safe(driver, By.CSS_SELECTOR, "select#incident\\.state")
+    if not set_state:
+        print("❌ Incident state dropdown not found.")
+        return False
+
+    # Change incident state to "Resolved"
+    select_state = Select(set_state)
+    select_state.select_by_visible_text("Resolved")
+    print("✅ Changed state to Resolved.")
+    wait_for_ajax_idle(driver)  # UI policies make the resolution fields mandatory
+
+    # Switch to the Resolution Information tab
+    select_tab_by_text(wait, "Resolution Information")
+    print("✅ Switched to Resolution Information tab.")
+    wait_for_ajax_idle(driver)
+
+    # Select resolution code
+    set_code = find_element_safe(driver, By.ID, "incident.close_code")
+    if not set_code:
+        print("❌ Resolution code dropdown not found.")
+        return False
+
+    select_code = Select(set_code)
+    select_code.select_by_visible_text(close_code)
+    print(f"✅ Selected '{close_code}' resolution code.")
+    wait_for_ajax_idle(driver)
+
+    # Add resolution notes
+    resolution_notes = find_element_safe(driver, By.CSS_SELECTOR, "textarea#incident\\.close_notes")
+    if not resolution_notes:
+        print("❌ Resolution notes field not found.")
+        return False
+
+    resolution_notes.send_keys(close_notes)
+    print("✅ Added resolution notes.")
+    return True
+
+
+@metrics.timed('submit')
+def submit_form(driver):
+    """
+    Save the open form with the Update button and wait for the round-trip.
+
+    A save blocked on the client (mandatory fields, UI policies, onSubmit scripts) leaves
+    the form in place, so the Update button never goes stale and the save counts as failed.
+
+    Returns:
+        True if the form was submitted and replaced by the server's answer, False if the
+        button was not found or the save did not go through
+    """
+    update_button = find_element_safe(driver, By.ID, "sysverb_update")
+    if not update_button:
+        print("❌ Update button not found.")
+        return False
+
+    throttle.wait()
+    start_time = time.perf_counter()
+    update_button.click()
+    print("✅ Clicked update button.")
+    # With fixed sleeps the wait does not check the page; the button is then checked once afterwards
+    submitted = wait_for_form_submit(driver, update_button) or EC.staleness_of(update_button)(driver)
+    # The save round-trip is the transaction the instance queues under load
+    throttle.observe(time.perf_counter() - start_time, OK if submitted else ERROR)
+    if not submitted:
+        print("❌ Form was not saved (blocked by validation or no answer from the instance).")
+    return submitted
+
+
+def discard_form_changes(driver):
+    """Mark the open form as unmodified so leaving it does not trigger the unsaved-changes prompt."""
+    driver.execute_script("if (typeof g_form !== 'undefined') { g_form.modified = false; }")
@@ -0,0 +1,292 @@
+"""
+ServiceNow Adaptive Throttle
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: AIMD (additive increase, multiplicative decrease) controller shared by the
+Table API client, the classic UI navigator and the worker pools. It measures the latency
+and error rate of every request, page load and form submit, allows one more request in
+flight for every window of fast successes, halves the limit on HTTP 429/503, error bursts
+or latency spikes, and pauses all callers for as long as Retry-After asks. Throughput
+therefore settles just below what the instance tolerates - semaphore queues and rate
+limit rules included - instead of depending on fixed sleeps.
+License: MIT
+
+Configuration (environment variables):
+    SERVICENOW_MAX_CONCURRENCY=8    Upper bound for requests / browsers working at the same time
+    SERVICENOW_MIN_CONCURRENCY=1    Lower bound the limit never drops below
+    SERVICENOW_LATENCY_SPIKE=2.5    Latency (smoothed) above this multiple of the baseline counts as a spike
+
+Usage:
+    from servicenow_throttle import throttle
+    throttle.configure(max_limit=args.workers)
+    with throttle.slot():             # Wait for a free slot before working on a record
+        with throttle.measure():      # Time one request / page load and report it
+            driver.get(url)
+"""
+
+import collections
+import email.utils
+import os
+import threading
+import time
+from contextlib import contextmanager
+from servicenow_metrics import metrics
+
+# Outcomes reported with observe()
+OK = 'ok'
+ERROR = 'error'
+THROTTLED = 'throttled'
+
+# HTTP statuses the instance uses to shed load (rate limit rules, semaphore exhaustion)
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value):
+    """
+    Seconds to wait according to a Retry-After header (delta-seconds or HTTP date).
+
+    Returns:
+        Seconds as float, or None if the header is missing or unreadable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that follows the instance's capacity.
+
+    Every OK observation updates a smoothed latency (EWMA) and a baseline - the lowest
+    smoothed latency seen, drifting slowly upwards so a permanently slower instance
+    becomes the new normal. Once as many fast successes as the current limit have come
+    in (roughly one round of all slots), the limit grows by one - four times slower
+    next to the limit the instance last throttled at. A throttle response,
+    an error rate above max_error_rate over the last window, or a smoothed latency above
+    spike_factor x baseline multiplies the limit by decrease, at most once per cooldown
+    so one burst of slow responses is not punished several times.
+
+    Args:
+        min_limit: Lowest limit (defaults to SERVICENOW_MIN_CONCURRENCY)
+        max_limit: Highest limit (defaults to SERVICENOW_MAX_CONCURRENCY)
+        initial: Starting limit (defaults to half of max_limit)
+        spike_factor: Latency multiple of the baseline treated as a spike (defaults to SERVICENOW_LATENCY_SPIKE)
+        decrease: Factor applied to the limit on back-off
+        window: Number of recent outcomes the error rate is measured over
+        max_error_rate: Error fraction of the window that triggers a back-off
+        max_pause: Upper bound in seconds for a pause (Retry-After or own back-off)
+    """
+
+    def __init__(self, min_limit=None, max_limit=None, initial=None, spike_factor=None, decrease=0.5, window=20,
+                 max_error_rate=0.2, max_pause=120):
+        self.min_limit = min_limit or int(os.getenv('SERVICENOW_MIN_CONCURRENCY', '1'))
+        self.max_limit = max(self.min_limit, max_limit or int(os.getenv('SERVICENOW_MAX_CONCURRENCY', '8')))
+        self.spike_factor = spike_factor or float(os.getenv('SERVICENOW_LATENCY_SPIKE', '2.5'))
+        self.decrease = decrease
+        self.max_error_rate = max_error_rate
+        self.max_pause = max_pause
+        self.condition = threading.Condition()
+        self.local = threading.local()
+        self.limit = self._bounded(initial or self.max_limit // 2)
+        self.in_flight = 0
+        self.successes = 0
+        self.recent = collections.deque(maxlen=window)
+        self.latency = None
+        self.baseline = None
+        self.paused_until = 0.0
+        self.throttle_streak = 0
+        self.last_decrease = 0.0
+        # Limit at which the instance last answered with 429/503; growth slows down near it
+        self.ceiling = None
+        # Limit changes made under the lock, recorded as metrics events once it is released
+        self.changes = []
+
+    def _bounded(self, limit):
+        return max(self.min_limit, min(self.max_limit, int(limit)))
+
+    def configure(self, min_limit=None, max_limit=None, initial=None):
+        """
+        Change the bounds, e.g. to the number of worker browsers a script starts.
+
+        Args:
+            min_limit: New lower bound (optional)
+            max_limit: New upper bound (optional)
+            initial: New current limit (optional, defaults to the current one within the new bounds)
+        """
+        with self.condition:
+            if min_limit is not None:
+                self.min_limit = max(1, min_limit)
+            if max_limit is not None:
+                self.max_limit = max(self.min_limit, max_limit)
+            self.limit = self._bounded(initial if initial is not None else self.limit)
+            self.condition.notify_all()
+
+    def acquire(self):
+        """
+        Block until a slot is free and no pause is active, then take the slot.
+
+        A thread that already holds a slot does not take a second one (e.g. a Table API call
+        made while a worker works on a record), so nested use cannot deadlock - but it still
+        waits out an active pause, so a retry after 429/503 honours Retry-After.
+        """
+        held = getattr(self.local, 'held', 0)
+        if held:
+            self.wait()
+            self.local.held = held + 1
+            return
+        with self.condition:
+            while True:
+                remaining = self.paused_until - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                elif self.in_flight >= self.limit:
+                    self.condition.wait()
+                else:
+                    self.in_flight += 1
+                    break
+        self.local.held = 1
+
+    def release(self):
+        """Give back the slot taken by the same thread's acquire()."""
+        self.local.held -= 1
+        if self.local.held:
+            return
+        with self.condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Hold one slot while the block runs."""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def released(self):
+        """
+        Give up the calling thread's slot while the block runs (e.g. a retry backoff), then take it again.
+
+        Does nothing for a thread that holds no slot.
+        """
+        held = getattr(self.local, 'held', 0)
+        if not held:
+            yield
+            return
+        self.local.held = 0
+        with self.condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.condition.notify_all()
+        try:
+            yield
+        finally:
+            self.acquire()
+            self.local.held = held
+
+    def wait(self):
+        """Block while a pause is active (used by callers that are already inside a slot)."""
+        with self.condition:
+            while True:
+                remaining = self.paused_until - time.monotonic()
+                if remaining <= 0:
+                    return
+                self.condition.wait(remaining)
+
+    @contextmanager
+    def measure(self):
+        """Wait out an active pause, then time the block and report it as OK, or as an error if it raises."""
+        self.wait()
+        start_time = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(time.perf_counter() - start_time, ERROR)
+            raise
+        self.observe(time.perf_counter() - start_time)
+
+    def observe(self, latency=None, outcome=OK, retry_after=None):
+        """
+        Feed one finished request, page load or submit into the controller.
+
+        Args:
+            latency: Seconds the operation took (optional for errors and throttle responses)
+            outcome: OK, ERROR or THROTTLED
+            retry_after: Seconds the instance asked to wait (THROTTLED only)
+        """
+        with self.condition:
+            self.recent.append(outcome != OK)
+            if outcome == THROTTLED:
+                self.throttle_streak += 1
+                pause = retry_after if retry_after is not None else 2 ** min(self.throttle_streak, 6)
+                self.paused_until = max(self.paused_until, time.monotonic() + min(pause, self.max_pause))
+                self.ceiling = min(self.ceiling or self.limit, self.limit)
+                self._back_off('throttled')
+            elif outcome == ERROR:
+                if sum(self.recent) > self.max_error_rate * self.recent.maxlen:
+                    self._back_off('errors')
+            else:
+                self.throttle_streak = 0
+                if latency is not None:
+                    self._observe_latency(latency)
+            self.condition.notify_all()
+        self._report_changes()
+
+    def _report_changes(self):
+        """Record the limit changes made by the last observation (outside the lock, the export writes a file)."""
+        with self.condition:
+            changes, self.changes = self.changes, []
+        for old_limit, new_limit, reason in changes:
+            metrics.event('throttle', reason, limit_from=old_limit, limit_to=new_limit)
+
+    def _observe_latency(self, latency):
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        self.baseline = self.latency if self.baseline is None else min(self.baseline * 1.01, self.latency)
+        # A spike must also be noticeably slower in absolute terms, so 50 ms -> 150 ms does not count
+        if self.latency > self.baseline * self.spike_factor and self.latency - self.baseline > 0.25:
+            self._back_off('latency')
+            return
+        self.successes += 1
+        # Probe carefully at the limit that was throttled last time instead of running straight into it again
+        needed = self.limit * (4 if self.ceiling and self.limit + 1 >= self.ceiling else 1)
+        if self.successes >= needed and self.limit < self.max_limit:
+            self.successes = 0
+            if self.ceiling and self.limit + 1 > self.ceiling:
+                self.ceiling = None
+            self._set_limit(self.limit + 1, 'increase')
+
+    def _back_off(self, reason):
+        now = time.monotonic()
+        # One back-off per round trip: the responses already in flight were sent at the old limit
+        if now - self.last_decrease < max(1.0, self.latency or 0):
+            return
+        self.last_decrease = now
+        self.successes = 0
+        self.recent.clear()
+        self._set_limit(self.limit * self.decrease, reason)
+
+    def _set_limit(self, limit, reason):
+        """Change the limit (caller holds the lock); only real changes are queued for the metrics."""
+        limit = self._bounded(limit)
+        if limit != self.limit:
+            self.changes.append((self.limit, limit, reason))
+            self.limit = limit
+
+    def status(self):
+        """Snapshot of the controller state for log lines."""
+        with self.condition:
+            return {'limit': self.limit, 'in_flight': self.in_flight,
+                    'latency_s': round(self.latency, 3) if self.latency is not None else None,
+                    'baseline_s': round(self.baseline, 3) if self.baseline is not None else None,
+                    'paused_s': round(max(0.0, self.paused_until - time.monotonic()), 1)}
+
+
+# Controller shared by every client, navigator and worker pool of the process
+throttle = AdaptiveLimiter()
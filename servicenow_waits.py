@@ -0,0 +1,146 @@
+"""
+ServiceNow Readiness Waits
+Author: Abdullah Omer (https://github.com/AbdullahOmerDev)
+Description: Event-driven waits shared by the automation scripts. Each wait returns as
+soon as ServiceNow is actually ready (autocomplete rendered, AJAX idle, form saved,
+cell editor closed) instead of sleeping for a fixed time.
+License: MIT
+
+Configuration (environment variables):
+    SERVICENOW_FIXED_SLEEPS=1      Ignore readiness checks and sleep the fallback time (old behaviour)
+    SERVICENOW_FALLBACK_DELAY=<s>  Override the fallback sleep used when a readiness check times out
+"""
+
+import os
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+# Restore the old fixed time.sleep() behaviour everywhere
+FIXED_SLEEPS = os.getenv('SERVICENOW_FIXED_SLEEPS', '0') == '1'
+
+# Optional global override of every fallback delay (seconds)
+FALLBACK_DELAY = os.getenv('SERVICENOW_FALLBACK_DELAY')
+
+# How often readiness conditions are polled (seconds)
+POLL_FREQUENCY = 0.1
+
+# True when the page has finished loading and neither Prototype (classic UI) nor jQuery has AJAX in flight
+AJAX_IDLE_SCRIPT = """
+return document.readyState === 'complete'
+    && (typeof Ajax === 'undefined' || !Ajax.activeRequestCount)
+    && (typeof jQuery === 'undefined' || !jQuery.active);
+"""
+
+# True once the classic form has initialised its client-side g_form object
+FORM_READY_SCRIPT = """
+return document.readyState === 'complete'
+    && typeof g_form !== 'undefined'
+    && (typeof Ajax === 'undefined' || !Ajax.activeRequestCount);
+"""
+
+# True when the reference autocomplete for the given input has rendered or resolved
+AUTOCOMPLETE_SCRIPT = """
+var input = arguments[0];
+if (input.getAttribute('aria-expanded') === 'true') return true;
+var dropdowns = document.querySelectorAll('.ac_dropdown, div[id^="AC."], [role="listbox"]');
+for (var i = 0; i < dropdowns.length; i++) {
+    if (dropdowns[i].offsetParent !== null && dropdowns[i].textContent.trim()) return true;
+}
+return false;
+"""
+
+
+def _fallback(fallback):
+    """Resolve the fallback delay, honouring the SERVICENOW_FALLBACK_DELAY override."""
+    if FALLBACK_DELAY is not None and fallback:
+        return float(FALLBACK_DELAY)
+    return fallback
+
+
+def wait_until(driver, condition, timeout=10, fallback=2):
+    """
+    Wait for a condition, falling back to a fixed sleep if it never becomes true.
+
+    Args:
+        driver: WebDriver instance
+        condition: Callable taking the driver (e.g. an expected_conditions object)
+        timeout: Maximum time to wait for the condition in seconds
+        fallback: Seconds to sleep when the condition times out or fixed sleeps are enabled
+
+    Returns:
+        True if the condition was met or fixed sleeps are enabled, False if the condition timed out
+    """
+    if FIXED_SLEEPS:
+        # The old behaviour assumed the page was ready after the sleep
+        time.sleep(_fallback(fallback))
+        return True
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY,
+                      ignored_exceptions=(WebDriverException,)).until(condition)
+        return True
+    except TimeoutException:
+        time.sleep(_fallback(fallback))
+        return False
+
+
+def wait_for_ajax_idle(driver, timeout=10, fallback=2):
+    """Wait until the page is loaded and no AJAX request is in flight."""
+    return wait_until(driver, lambda d: d.execute_script(AJAX_IDLE_SCRIPT), timeout, fallback)
+
+
+def wait_for_form_load(driver, timeout=10, fallback=2):
+    """Wait until a classic UI form (incident, label, ...) has loaded and initialised g_form."""
+    return wait_until(driver, lambda d: d.execute_script(FORM_READY_SCRIPT), timeout, fallback)
+
+
+def wait_for_autocomplete(driver, input_element, timeout=5, fallback=2):
+    """
+    Wait until the reference autocomplete for an input has rendered its suggestions.
+
+    Args:
+        driver: WebDriver instance
+        input_element: The reference input (e.g. sys_display.LIST_EDIT_incident.assigned_to)
+        timeout: Maximum time to wait in seconds
+        fallback: Seconds to sleep if no dropdown appears
+    """
+    rendered = wait_until(driver, lambda d: d.execute_script(AUTOCOMPLETE_SCRIPT, input_element), timeout, fallback)
+    # The lookup that filled the dropdown must also have returned before it is confirmed
+    if rendered:
+        wait_for_ajax_idle(driver, timeout, fallback=0)
+    return rendered
+
+
+def wait_for_cell_editor_closed(driver, timeout=5, fallback=3):
+    """Wait until the list cell editor has closed after confirming an in-place edit."""
+    condition = EC.invisibility_of_element_located((By.CSS_SELECTOR, "a#cell_edit_ok"))
+    closed = wait_until(driver, condition, timeout, fallback)
+    if closed:
+        wait_for_ajax_idle(driver, timeout, fallback=0)
+    return closed
+
+
+def wait_for_form_submit(driver, submit_element, timeout=15, fallback=2):
+    """
+    Wait until the round-trip triggered by a form button (e.g. sysverb_update) has completed.
+
+    Args:
+        driver: WebDriver instance
+        submit_element: The button that was clicked; it goes stale when the page is replaced
+        timeout: Maximum time to wait in seconds
+        fallback: Seconds to sleep if the page does not change
+    """
+    submitted = wait_until(driver, EC.staleness_of(submit_element), timeout, fallback)
+    if submitted:
+        wait_for_ajax_idle(driver, timeout, fallback=0)
+    return submitted
+
+
+def wait_for_work_note_posted(driver, textarea, timeout=10, fallback=2):
+    """Wait until an activity stream post has been accepted (the textarea is cleared)."""
+    posted = wait_until(driver, lambda d: not textarea.get_attribute('value'), timeout, fallback)
+    if posted:
+        wait_for_ajax_idle(driver, timeout, fallback=0)
+    return posted
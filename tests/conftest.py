@@ -0,0 +1,38 @@
+"""
+Shared fixtures: the repository modules and benchmark/mock_servicenow.py are imported from
+the checkout, and every test gets its own mock instance and throttle.
+"""
+
+import os
+import sys
+
+import pytest
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIRECTORY)
+sys.path.insert(0, os.path.join(REPO_DIRECTORY, 'benchmark'))
+
+from mock_servicenow import start_server  # noqa: E402
+from servicenow_throttle import AdaptiveLimiter  # noqa: E402
+
+
+@pytest.fixture
+def mock_instance():
+    """Factory starting mock instances (start_server arguments); all of them are stopped after the test."""
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_server(**kwargs)
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def limiter():
+    """A throttle of its own, so pauses and limit changes do not leak into other tests."""
+    return AdaptiveLimiter(min_limit=1, max_limit=8)
@@ -0,0 +1,196 @@
+"""Tests for servicenow_api.py: paging, retries and keep-alive connection reuse."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from servicenow_api import TableAPIClient, TableAPIError, iterate_records, keyset_query
+
+
+def count_connections(server):
+    """Record the client address of every TCP connection the server accepts."""
+    connections = []
+    finish_request = server.finish_request
+
+    def counting(request, client_address):
+        connections.append(client_address)
+        finish_request(request, client_address)
+
+    server.finish_request = counting
+    return connections
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Answers requests from the server's script: (status, headers, payload, close the connection afterwards)."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.paths.append(self.path)
+            status, headers, payload, close = self.server.script.pop(0) if self.server.script else (200, {}, {}, False)
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        # Drop the connection without announcing it, like a server closing an idle keep-alive connection
+        self.close_connection = close
+
+
+@pytest.fixture
+def scripted_server():
+    """In-process HTTP server answering with a list of scripted responses."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ScriptedHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.script = []
+    server.paths = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_keyset_query_replaces_the_sort_order():
+    assert keyset_query('active=true^ORDERBYDESCsys_created_on', 'abc') == 'active=true^sys_id>abc^ORDERBYsys_id'
+    assert keyset_query(None) == 'ORDERBYsys_id'
+
+
+@pytest.mark.parametrize('paging', ['keyset', 'offset'])
+def test_iterate_records_pages_through_every_record(mock_instance, limiter, paging):
+    server, base_url = mock_instance(records=1234)
+    positions = []
+    with TableAPIClient(base_url, limiter=limiter) as client:
+        records = list(iterate_records(client, 'incident', query='active=true', fields=['number'], page_size=100,
+                                       paging=paging, on_page=positions.append))
+
+    assert len(records) == 1234
+    assert len({record['sys_id'] for record in records}) == 1234
+    assert len(positions) == 13
+    assert positions[-1] == (records[-1]['sys_id'] if paging == 'keyset' else 1234)
+
+
+def test_keyset_paging_resumes_after_the_last_sys_id(mock_instance, limiter):
+    server, base_url = mock_instance(records=300)
+    with TableAPIClient(base_url, limiter=limiter) as client:
+        first = list(iterate_records(client, 'incident', fields=['number'], page_size=100))
+        rest = list(iterate_records(client, 'incident', fields=['number'], page_size=100, start=first[99]['sys_id']))
+
+    assert [record['sys_id'] for record in rest] == [record['sys_id'] for record in first[100:]]
+
+
+def test_keyset_paging_keeps_records_that_later_pages_would_shift(mock_instance, limiter):
+    server, base_url = mock_instance(records=250)
+    with TableAPIClient(base_url, limiter=limiter) as client:
+        resolved = []
+        for record in iterate_records(client, 'incident', query='active=true', fields=['number'], page_size=50):
+            # Resolving a record drops it out of the query while the iteration is still running
+            client.patch_record('incident', record['sys_id'], {'state': 'Resolved'})
+            resolved.append(record['sys_id'])
+
+    assert len(resolved) == len(set(resolved)) == 250
+    assert all(record['state'] == 'Resolved' for record in server.instance.incidents.values())
+
+
+def test_throttled_request_is_sent_again_after_retry_after(scripted_server, limiter):
+    scripted_server.script = [
+        (429, {'Retry-After': '0'}, {'error': {'message': 'Rate limit exceeded'}}, False),
+        (503, {'Retry-After': '0'}, {'error': {'message': 'Instance busy'}}, False),
+        (200, {}, {'result': [{'sys_id': 'a'}]}, False),
+    ]
+    client = TableAPIClient(f'http://127.0.0.1:{scripted_server.server_port}', limiter=limiter, throttle_retries=3)
+    try:
+        assert client.get_records('incident') == [{'sys_id': 'a'}]
+    finally:
+        client.close()
+
+    assert len(scripted_server.paths) == 3
+
+
+def test_throttled_request_gives_up_after_throttle_retries(scripted_server, limiter):
+    scripted_server.script = [(429, {'Retry-After': '0'}, {'error': {'message': 'Rate limit exceeded'}}, False)] * 3
+    client = TableAPIClient(f'http://127.0.0.1:{scripted_server.server_port}', limiter=limiter, throttle_retries=1)
+    try:
+        with pytest.raises(TableAPIError) as error:
+            client.get_records('incident')
+    finally:
+        client.close()
+
+    assert error.value.status == 429
+    assert error.value.message == 'Rate limit exceeded'
+    assert len(scripted_server.paths) == 2
+
+
+def test_rate_limited_mock_request_waits_for_a_free_slot(mock_instance, limiter):
+    server, base_url = mock_instance(records=10, api_limit=1)
+    # Another client holds the only API slot of the instance for a moment
+    server.instance.api_in_flight = 1
+    threading.Timer(0.3, lambda: setattr(server.instance, 'api_in_flight', 0)).start()
+    with TableAPIClient(base_url, limiter=limiter) as client:
+        records = client.get_records('incident', limit=5)
+
+    assert len(records) == 5
+    assert server.instance.throttled >= 1
+
+
+def test_errors_are_raised_without_retrying(mock_instance, limiter):
+    server, base_url = mock_instance(records=10)
+    with TableAPIClient(base_url, limiter=limiter) as client:
+        with pytest.raises(TableAPIError) as error:
+            client.patch_record('incident', 'missing', {'state': 'Resolved'})
+
+    assert error.value.status == 404
+
+
+def test_sequential_requests_reuse_one_connection(mock_instance, limiter):
+    server, base_url = mock_instance(records=50)
+    connections = count_connections(server)
+    with TableAPIClient(base_url, limiter=limiter) as client:
+        for record in client.get_records('incident', limit=20):
+            client.get_record('incident', record['sys_id'], fields=['number'])
+
+    assert server.instance.requests == 21
+    assert len(connections) == 1
+
+
+def test_concurrent_requests_share_the_pooled_connections(mock_instance, limiter):
+    server, base_url = mock_instance(records=50, latency_ms=20)
+    connections = count_connections(server)
+    with TableAPIClient(base_url, pool_size=4, limiter=limiter) as client:
+        def read():
+            for _ in range(10):
+                client.get_records('incident', limit=1)
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert server.instance.requests == 40
+    assert len(connections) <= 4
+
+
+def test_connection_dropped_while_idle_is_replaced(scripted_server, limiter):
+    scripted_server.script = [
+        (200, {}, {'result': [{'sys_id': 'a'}]}, True),
+        (200, {}, {'result': [{'sys_id': 'b'}]}, False),
+    ]
+    connections = count_connections(scripted_server)
+    client = TableAPIClient(f'http://127.0.0.1:{scripted_server.server_port}', limiter=limiter)
+    try:
+        assert client.get_records('incident') == [{'sys_id': 'a'}]
+        assert client.get_records('incident') == [{'sys_id': 'b'}]
+    finally:
+        client.close()
+
+    assert len(connections) == 2
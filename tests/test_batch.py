@@ -0,0 +1,208 @@
+"""Tests for servicenow_batch.py: sub-request mapping, single retries and the fallback to single PATCHes."""
+
+import pytest
+
+from servicenow_api import TableAPIClient, TableAPIError
+from servicenow_batch import BATCH_PATH, BatchWriter
+
+
+@pytest.fixture
+def client_for(limiter):
+    """Factory of TableAPIClients for a mock base URL; all of them are closed after the test."""
+    clients = []
+
+    def create(base_url):
+        client = TableAPIClient(base_url, limiter=limiter)
+        clients.append(client)
+        return client
+
+    yield create
+    for client in clients:
+        client.close()
+
+
+def count_single_patches(client):
+    """Record the sys_id of every single PATCH the writer sends outside a batch."""
+    patched = []
+    patch_record = client.patch_record
+
+    def counting(table, sys_id, values, **kwargs):
+        patched.append(sys_id)
+        return patch_record(table, sys_id, values, **kwargs)
+
+    client.patch_record = counting
+    return patched
+
+
+def rewrite_batch_responses(client, rewrite):
+    """Pass every Batch API response through rewrite(payload) before the writer reads it."""
+    request = client.request
+
+    def rewriting(method, path, params=None, body=None):
+        payload = request(method, path, params=params, body=body)
+        return rewrite(payload) if path == BATCH_PATH else payload
+
+    client.request = rewriting
+
+
+def test_every_sub_request_is_mapped_to_its_record(mock_instance, client_for):
+    server, base_url = mock_instance(records=25)
+    client = client_for(base_url)
+    sys_ids = sorted(server.instance.incidents)
+    # The instance does not have to answer in request order
+    rewrite_batch_responses(client, lambda payload: dict(
+        payload, serviced_requests=list(reversed(payload['serviced_requests']))))
+    writer = BatchWriter(client, batch_size=10, fields=['sys_id', 'close_notes'])
+
+    results = writer.patch_many('incident', ((sys_id, {'close_notes': f'note {sys_id}'}) for sys_id in sys_ids))
+
+    assert list(results) == sys_ids
+    assert writer.batches == 3
+    assert server.instance.batch_requests == 3
+    for sys_id, result in results.items():
+        assert result.ok and not result.retried
+        assert result.record == {'sys_id': sys_id, 'close_notes': f'note {sys_id}'}
+        assert server.instance.incidents[sys_id]['close_notes'] == f'note {sys_id}'
+
+
+def test_on_batch_receives_each_written_batch(mock_instance, client_for):
+    server, base_url = mock_instance(records=25)
+    writer = BatchWriter(client_for(base_url), batch_size=10)
+    written = []
+
+    writer.patch_many('incident', ((sys_id, {'work_notes': 'Any updates?'}) for sys_id in server.instance.incidents),
+                      on_batch=lambda results: written.append(len(results)))
+
+    assert written == [10, 10, 5]
+
+
+def test_unserviced_sub_requests_are_sent_again_once(mock_instance, client_for):
+    server, base_url = mock_instance(records=20, batch_limit=4)
+    client = client_for(base_url)
+    patched = count_single_patches(client)
+    sys_ids = sorted(server.instance.incidents)
+    writer = BatchWriter(client, batch_size=10, input_display_value=True)
+
+    results = writer.patch_many('incident', ((sys_id, {'state': 'Resolved'}) for sys_id in sys_ids))
+
+    assert all(result.ok for result in results.values())
+    assert [sys_id for sys_id, result in results.items() if result.retried] == patched
+    assert patched == sys_ids[4:10] + sys_ids[14:20]
+    assert all(record['state'] == 'Resolved' for record in server.instance.incidents.values())
+
+
+def test_failed_sub_request_is_sent_again_once(mock_instance, client_for):
+    server, base_url = mock_instance(records=5)
+    client = client_for(base_url)
+    patched = count_single_patches(client)
+
+    def fail_first(payload):
+        served = payload['serviced_requests']
+        served[0] = dict(served[0], status_code=500, status_text='Internal Server Error', body='')
+        return payload
+
+    rewrite_batch_responses(client, fail_first)
+    sys_ids = sorted(server.instance.incidents)
+
+    results = BatchWriter(client).patch_many('incident', ((sys_id, {'state': 'Resolved'}) for sys_id in sys_ids))
+
+    assert patched == [sys_ids[0]]
+    assert results[sys_ids[0]].ok and results[sys_ids[0]].retried
+    assert all(result.ok and not result.retried for result in list(results.values())[1:])
+
+
+def test_single_retry_failure_is_reported(mock_instance, client_for):
+    server, base_url = mock_instance(records=3)
+    client = client_for(base_url)
+    rewrite_batch_responses(client, lambda payload: dict(payload, serviced_requests=[]))
+    sys_id = sorted(server.instance.incidents)[0]
+    del server.instance.incidents[sys_id]  # Deleted between the batch and its retry
+
+    result = BatchWriter(client).patch_many('incident', [(sys_id, {'state': 'Resolved'})])[sys_id]
+
+    assert not result.ok
+    assert result.retried
+    assert result.status == 404
+
+
+@pytest.mark.parametrize('status', [400, 403, 404])
+def test_permanent_sub_request_errors_are_not_retried(mock_instance, client_for, status):
+    server, base_url = mock_instance(records=3)
+    client = client_for(base_url)
+    patched = count_single_patches(client)
+    sys_ids = sorted(server.instance.incidents)
+
+    def reject_last(payload):
+        served = payload['serviced_requests']
+        served[-1] = dict(served[-1], status_code=status, status_text='Error', body='')
+        return payload
+
+    rewrite_batch_responses(client, reject_last)
+    results = BatchWriter(client).patch_many('incident', ((sys_id, {'state': 'Resolved'}) for sys_id in sys_ids))
+
+    assert patched == []
+    assert results[sys_ids[-1]].status == status
+    assert not results[sys_ids[-1]].ok and not results[sys_ids[-1]].retried
+
+
+def test_missing_record_is_a_permanent_failure(mock_instance, client_for):
+    server, base_url = mock_instance(records=3)
+    client = client_for(base_url)
+    patched = count_single_patches(client)
+    updates = [(sys_id, {'state': 'Resolved'}) for sys_id in sorted(server.instance.incidents)] + \
+              [('0' * 32, {'state': 'Resolved'})]
+
+    results = BatchWriter(client).patch_many('incident', updates)
+
+    assert patched == []
+    assert results['0' * 32].status == 404
+    assert results['0' * 32].error == 'No Record found'
+    assert sum(1 for result in results.values() if result.ok) == 3
+
+
+def refuse_batches(client, status, sent):
+    """Answer every Batch API request with a whole-batch error; single PATCHes still reach the mock."""
+    request = client.request
+
+    def refusing(method, path, params=None, body=None):
+        if path == BATCH_PATH:
+            sent.append(body)
+            raise TableAPIError(status, 'Requested URI does not represent any resource')
+        return request(method, path, params=params, body=body)
+
+    client.request = refusing
+
+
+@pytest.mark.parametrize('status', [400, 403, 404])
+def test_refused_batch_api_falls_back_to_single_patches(mock_instance, client_for, status):
+    server, base_url = mock_instance(records=12)
+    client = client_for(base_url)
+    sent = []
+    refuse_batches(client, status, sent)
+    patched = count_single_patches(client)
+    sys_ids = sorted(server.instance.incidents)
+    writer = BatchWriter(client, batch_size=5, input_display_value=True)
+
+    results = writer.patch_many('incident', ((sys_id, {'state': 'Resolved'}) for sys_id in sys_ids))
+
+    assert writer.available is False
+    # Only the first batch is tried; the next ones go straight to single PATCHes
+    assert len(sent) == 1
+    assert writer.batches == 1
+    assert patched == sys_ids
+    assert all(result.ok and result.retried for result in results.values())
+    assert all(record['state'] == 'Resolved' for record in server.instance.incidents.values())
+
+
+def test_failed_batch_request_keeps_using_the_batch_api(mock_instance, client_for):
+    server, base_url = mock_instance(records=10)
+    client = client_for(base_url)
+    sent = []
+    refuse_batches(client, 500, sent)
+    writer = BatchWriter(client, batch_size=5)
+
+    results = writer.patch_many('incident', ((sys_id, {'state': 'Resolved'}) for sys_id in server.instance.incidents))
+
+    assert writer.available is True
+    assert len(sent) == 2
+    assert all(result.ok and result.retried for result in results.values())
@@ -0,0 +1,120 @@
+"""Tests for servicenow_journal.py: the skip window, reloading and compacting the journal, and list cursors."""
+
+import json
+import time
+
+import pytest
+
+pytest.importorskip('selenium')
+
+from servicenow_journal import ProcessedJournal  # noqa: E402
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / 'journal.jsonl')
+
+
+@pytest.fixture
+def open_journal(journal_path):
+    """Factory opening ProcessedJournals on the same file; all of them are closed after the test."""
+    journals = []
+
+    def create(window=3600):
+        journal = ProcessedJournal(journal_path, window=window)
+        journals.append(journal)
+        return journal
+
+    yield create
+    for journal in journals:
+        journal.close()
+
+
+def write_entries(path, *entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write((json.dumps(entry) if isinstance(entry, dict) else entry) + '\n')
+
+
+def read_entries(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_recorded_action_is_seen_for_that_action_only(open_journal):
+    journal = open_journal()
+    journal.record('a' * 32, 'work_note')
+
+    assert journal.seen('a' * 32, 'work_note')
+    assert abs(journal.handled_at('a' * 32, 'work_note') - time.time()) < 5
+    assert not journal.seen('a' * 32, 'resolve')
+    assert not journal.seen('b' * 32, 'work_note')
+    assert journal.handled_at('b' * 32, 'work_note') is None
+
+
+def test_entries_expire_while_the_journal_is_open(open_journal):
+    journal = open_journal(window=0.2)
+    journal.record('a' * 32, 'work_note')
+    assert journal.seen('a' * 32, 'work_note')
+
+    time.sleep(0.3)
+
+    assert not journal.seen('a' * 32, 'work_note')
+    assert journal.handled_at('a' * 32, 'work_note') is None
+
+
+def test_reopened_journal_keeps_the_entries_within_the_window(open_journal, journal_path):
+    journal = open_journal()
+    journal.record('a' * 32, 'work_note')
+    journal.set_cursor('work_note', 'a' * 32)
+    journal.close()
+
+    reopened = open_journal()
+
+    assert reopened.seen('a' * 32, 'work_note')
+    assert reopened.cursor('work_note') == 'a' * 32
+
+
+def test_expired_and_cut_off_entries_are_dropped_when_the_journal_is_opened(open_journal, journal_path):
+    now = time.time()
+    write_entries(journal_path,
+                  {'sys_id': 'a' * 32, 'action': 'work_note', 'ts': now - 7200},
+                  {'sys_id': 'b' * 32, 'action': 'work_note', 'ts': now - 60},
+                  {'sys_id': 'b' * 32, 'action': 'work_note', 'ts': now - 30},
+                  {'cursor': 40, 'action': 'resolve', 'ts': now - 7200},
+                  {'cursor': 20, 'action': 'work_note', 'ts': now - 60},
+                  '{"sys_id": "cccc')
+
+    journal = open_journal()
+
+    assert not journal.seen('a' * 32, 'work_note')
+    assert journal.seen('b' * 32, 'work_note')
+    assert journal.cursor('resolve') == 0
+    assert journal.cursor('work_note') == 20
+    # The file is rewritten with one line per live entry, the latest one
+    assert read_entries(journal_path) == [
+        {'sys_id': 'b' * 32, 'action': 'work_note', 'ts': now - 30},
+        {'cursor': 20, 'action': 'work_note', 'ts': now - 60},
+    ]
+
+
+def test_cursor_defaults_to_the_top_of_the_list(open_journal):
+    journal = open_journal()
+
+    assert journal.cursor('work_note') == 0
+    journal.set_cursor('work_note', 100)
+    journal.set_cursor('work_note', 200)
+    assert journal.cursor('work_note') == 200
+
+
+def test_reset_forgets_everything(open_journal, journal_path):
+    journal = open_journal()
+    journal.record('a' * 32, 'work_note')
+    journal.set_cursor('work_note', 100)
+
+    journal.reset()
+    journal.record('b' * 32, 'work_note')
+
+    assert not journal.seen('a' * 32, 'work_note')
+    assert journal.cursor('work_note') == 0
+    assert [entry['sys_id'] for entry in read_entries(journal_path)] == ['b' * 32]
@@ -0,0 +1,133 @@
+"""Tests for servicenow_mirror.py: seed and incremental syncs against the mock instance, local queries and marks."""
+
+import time
+
+import pytest
+
+from servicenow_api import TableAPIClient
+from servicenow_mirror import RecordMirror
+from servicenow_poller import ApiTablePoller
+
+
+@pytest.fixture
+def mirrored(mock_instance, limiter, tmp_path):
+    """Factory of (server, source, mirror) for a mock instance; the client and the mirror are closed after the test."""
+    opened = []
+
+    def create(page_size=500, **kwargs):
+        server, base_url = mock_instance(**kwargs)
+        client = TableAPIClient(base_url, limiter=limiter)
+        mirror = RecordMirror(str(tmp_path / 'mirror.sqlite3'), page_size=page_size)
+        opened.append((client, mirror))
+        return server, ApiTablePoller(client), mirror
+
+    yield create
+    for client, mirror in opened:
+        mirror.close()
+        client.close()
+
+
+def test_first_sync_loads_the_active_incidents(mirrored):
+    server, source, mirror = mirrored(records=30, page_size=7)
+    resolved = sorted(server.instance.incidents)[:5]
+    for sys_id in resolved:
+        server.instance.incidents[sys_id]['state'] = 'Resolved'
+
+    assert mirror.sync(source) == 25
+    records = mirror.records('incident')
+    assert len(records) == 25
+    assert not set(resolved) & {record['sys_id'] for record in records}
+    assert [record['number'] for record in records] == sorted(record['number'] for record in records)
+
+
+def test_next_sync_fetches_only_the_changed_records(mirrored):
+    server, source, mirror = mirrored(records=30, page_size=7)
+    mirror.sync(source)
+    requests = server.instance.requests
+    sys_id = sorted(server.instance.incidents)[3]
+    source.client.patch_record('incident', sys_id, {'state': 'Resolved'})
+
+    assert mirror.sync(source) == 1
+    assert mirror.records('incident', number=server.instance.incidents[sys_id]['number'])[0]['state'] == 'Resolved'
+    # Records leaving the seed filter are updated, and drop out of active queries
+    assert sys_id not in {record['sys_id'] for record in mirror.records('incident', active=True)}
+    assert mirror.sync(source) == 0
+    assert server.instance.requests - requests <= 5
+
+
+def test_records_updated_in_the_same_second_are_paged_without_gaps(mirrored):
+    server, source, mirror = mirrored(records=23, page_size=5)
+
+    # Every mock label has the same sys_updated_on
+    assert mirror.sync(source, 'label') == 23
+    assert len(mirror.records('label')) == 23
+    assert mirror.sync(source, 'label') == 0
+
+
+def test_assignee_is_stored_as_display_value_and_sys_id(mirrored):
+    server, source, mirror = mirrored(records=5)
+    user_id, user = next(iter(server.instance.users.items()))
+    sys_id = sorted(server.instance.incidents)[0]
+    server.instance.incidents[sys_id]['assigned_to'] = user_id
+    mirror.sync(source)
+
+    [record] = mirror.records('incident', assigned_to_id=user_id)
+    assert record['sys_id'] == sys_id
+    assert record['assigned_to'] == user['name']
+    assert len(mirror.records('incident', active=True, assigned_to='')) == 4
+
+
+def test_records_filters(mirrored):
+    server, source, mirror = mirrored(records=12)
+    mirror.sync(source)
+
+    assert len(mirror.records('incident', exclude_states=('On Hold',))) == 6
+    assert len(mirror.records('incident', state='On Hold')) == 6
+    group = server.instance.incidents[sorted(server.instance.incidents)[0]]['assignment_group']
+    expected = sum(1 for record in server.instance.incidents.values() if record['assignment_group'] == group)
+    assert len(mirror.records('incident', assignment_group=group)) == expected
+    with pytest.raises(ValueError):
+        mirror.records('incident', short_description='Mock incident 1')
+
+
+def test_mark_updates_the_mirror_before_the_next_sync(mirrored):
+    server, source, mirror = mirrored(records=4)
+    mirror.sync(source)
+    sys_id = sorted(server.instance.incidents)[0]
+
+    mirror.mark('incident', sys_id, 'assign', {'assigned_to': 'Implementer A'})
+
+    assert mirror.records('incident', number='INC0000001')[0]['assigned_to'] == 'Implementer A'
+    action, ts = mirror.last_action('incident', sys_id)
+    assert action == 'assign'
+    assert time.time() - ts < 5
+    assert mirror.last_action('incident', sorted(server.instance.incidents)[1]) is None
+    with pytest.raises(ValueError):
+        mirror.mark('incident', sys_id, 'assign', {'number': 'INC9999999'})
+
+
+def test_not_done_leaves_out_records_the_action_was_applied_to(mirrored):
+    server, source, mirror = mirrored(records=4)
+    mirror.sync(source)
+    sys_id = sorted(server.instance.incidents)[0]
+    mirror.mark('incident', sys_id, 'work_note')
+
+    assert sys_id not in {record['sys_id'] for record in mirror.records('incident', not_done='work_note')}
+    assert len(mirror.records('incident', not_done='work_note', window=3600)) == 3
+    # Outside the window the action no longer counts
+    assert len(mirror.records('incident', not_done='work_note', window=-1)) == 4
+    assert len(mirror.records('incident', not_done='resolve')) == 4
+
+
+def test_reset_reloads_the_table_on_the_next_sync(mirrored):
+    server, source, mirror = mirrored(records=10)
+    mirror.sync(source)
+    del server.instance.incidents[sorted(server.instance.incidents)[0]]
+
+    # An incremental sync does not notice deleted records
+    assert mirror.sync(source) == 0
+    assert len(mirror.records('incident')) == 10
+    mirror.reset('incident')
+    assert mirror.records('incident') == []
+    assert mirror.sync(source) == 9
+    assert len(mirror.records('incident')) == 9
@@ -0,0 +1,98 @@
+"""Tests for keyset_query() and iterate_records() in servicenow_api.py against an in-memory record source."""
+
+import pytest
+
+from servicenow_api import iterate_records, keyset_query
+
+
+class FakeSource:
+    """get_records() over a list of records, answering keyset and offset pages and logging every call."""
+
+    def __init__(self, count):
+        self.records = [{'sys_id': f'{i:032x}', 'number': f'INC{i:07d}'} for i in range(count)]
+        self.calls = []
+
+    def get_records(self, table, query=None, fields=None, limit=None, offset=None, **kwargs):
+        self.calls.append({'table': table, 'query': query, 'fields': fields, 'limit': limit, 'offset': offset,
+                           **kwargs})
+        records = self.records
+        for term in (query or '').split('^'):
+            if term.startswith('sys_id>'):
+                records = [record for record in records if record['sys_id'] > term[len('sys_id>'):]]
+        start = offset or 0
+        return [dict(record) for record in records[start:start + limit]]
+
+
+def test_keyset_query_drops_every_sort_term_and_empty_term():
+    query = 'ORDERBYnumber^active=true^^priority=1^ORDERBYDESCsys_updated_on'
+    assert keyset_query(query) == 'active=true^priority=1^ORDERBYsys_id'
+    assert keyset_query(query, 'f00') == 'active=true^priority=1^sys_id>f00^ORDERBYsys_id'
+    assert keyset_query('', 'f00') == 'sys_id>f00^ORDERBYsys_id'
+
+
+def test_keyset_pages_start_after_the_last_sys_id_of_the_previous_page():
+    source = FakeSource(25)
+    records = list(iterate_records(source, 'incident', query='active=true', page_size=10))
+
+    assert records == source.records
+    assert [call['query'] for call in source.calls] == [
+        'active=true^ORDERBYsys_id',
+        f"active=true^sys_id>{source.records[9]['sys_id']}^ORDERBYsys_id",
+        f"active=true^sys_id>{source.records[19]['sys_id']}^ORDERBYsys_id",
+    ]
+    assert all(call['offset'] is None for call in source.calls)
+
+
+def test_short_page_ends_the_iteration_without_another_request():
+    source = FakeSource(25)
+    list(iterate_records(source, 'incident', page_size=10))
+
+    assert len(source.calls) == 3
+
+
+def test_full_last_page_is_followed_by_one_empty_request():
+    source = FakeSource(20)
+    positions = []
+    records = list(iterate_records(source, 'incident', page_size=10, on_page=positions.append))
+
+    assert len(records) == 20
+    assert len(source.calls) == 3
+    # No position is reported for the empty page, so a resumed run starts after the last record
+    assert positions == [source.records[9]['sys_id'], source.records[19]['sys_id']]
+
+
+def test_offset_paging_keeps_the_query_and_counts_records():
+    source = FakeSource(27)
+    positions = []
+    records = list(iterate_records(source, 'incident', query='active=true^ORDERBYnumber', page_size=10,
+                                   paging='offset', start=5, on_page=positions.append))
+
+    assert records == source.records[5:]
+    assert [call['offset'] for call in source.calls] == [5, 15, 25]
+    assert {call['query'] for call in source.calls} == {'active=true^ORDERBYnumber'}
+    assert positions == [15, 25, 27]
+
+
+def test_sys_id_is_always_requested_and_kwargs_are_passed_through():
+    source = FakeSource(3)
+    list(iterate_records(source, 'incident', fields=['number'], display_value='true'))
+
+    assert source.calls[0]['fields'] == ['sys_id', 'number']
+    assert source.calls[0]['display_value'] == 'true'
+
+
+def test_pages_are_only_requested_as_the_caller_reaches_them():
+    source = FakeSource(25)
+    records = iterate_records(source, 'incident', page_size=10)
+
+    assert source.calls == []
+    for _ in range(10):
+        next(records)
+    assert len(source.calls) == 1
+    next(records)
+    assert len(source.calls) == 2
+
+
+def test_unknown_paging_mode_is_rejected():
+    with pytest.raises(ValueError):
+        list(iterate_records(FakeSource(1), 'incident', paging='cursor'))
@@ -0,0 +1,87 @@
+"""Tests for servicenow_plan.py: field comparison, change sets and the per-run counts."""
+
+import threading
+
+import pytest
+
+from servicenow_plan import Contains, WritePlan, field_matches
+
+
+@pytest.mark.parametrize('current, desired, matches', [
+    ('Implementer A', 'Implementer A', True),
+    (' implementer a ', 'Implementer A', True),
+    ('Implementer B', 'Implementer A', False),
+    ('', 'Implementer A', False),
+    ('', '', True),
+    (None, '', False),
+    (None, 'Implementer A', False),
+    (3, '3', True),
+    ('Group A, Group B', Contains('group b'), True),
+    ('Group A,Group B', Contains(' Group A '), True),
+    ('Group A, Group B', Contains('Group'), False),
+    ('', Contains('Group A'), False),
+    (None, Contains('Group A'), False),
+])
+def test_field_matches(current, desired, matches):
+    assert field_matches(current, desired) is matches
+
+
+def test_changes_lists_only_the_fields_that_differ():
+    plan = WritePlan('assign')
+    current = {'assigned_to': 'Implementer A', 'state': 'New', 'group_list': 'Group A'}
+    desired = {'assigned_to': 'implementer a', 'state': 'In Progress', 'group_list': Contains('Group B'),
+               'work_notes': 'Any updates?'}
+
+    changes = plan.changes('INC0000001', current, desired)
+
+    assert changes == {'state': 'In Progress', 'group_list': desired['group_list'], 'work_notes': 'Any updates?'}
+
+
+def test_records_in_the_desired_state_are_skipped():
+    plan = WritePlan('assign')
+
+    assert plan.changes('INC0000001', {'assigned_to': 'Implementer A'}, {'assigned_to': 'Implementer A'}) == {}
+    assert plan.counts() == {'planned': 0, 'skipped': 1, 'applied': 0}
+
+
+def test_records_are_classified_on_their_first_check_only():
+    plan = WritePlan('assign')
+    desired = {'assigned_to': 'Implementer A'}
+
+    plan.changes('INC0000001', {'assigned_to': ''}, desired)
+    # Checked again after the write (or a reload): still one planned record, not a skipped one as well
+    assert plan.changes('INC0000001', {'assigned_to': 'Implementer A'}, desired) == {}
+    plan.changes('INC0000001', {'assigned_to': ''}, desired)
+    plan.applied('INC0000001')
+    plan.applied('INC0000001')
+
+    assert plan.counts() == {'planned': 1, 'skipped': 0, 'applied': 1}
+
+
+def test_summary_reports_the_counts():
+    plan = WritePlan('update')
+    plan.changes('INC0000001', {'state': 'New'}, {'state': 'Resolved'})
+    plan.changes('INC0000002', {'state': 'New'}, {'state': 'Resolved'})
+    plan.changes('INC0000003', {'state': 'Resolved'}, {'state': 'Resolved'})
+    plan.applied('INC0000001')
+
+    assert plan.summary() == ('update: 2 records needed a write, 1 were already in the desired state, '
+                              '1 writes applied')
+
+
+def test_plan_can_be_shared_between_threads():
+    plan = WritePlan('assign')
+
+    def check(worker):
+        for i in range(200):
+            key = f'INC{i:07d}'
+            if plan.changes(key, {'assigned_to': ''}, {'assigned_to': 'Implementer A'}) and i % 2 == worker:
+                plan.applied(key)
+
+    threads = [threading.Thread(target=check, args=(worker % 2,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert plan.counts() == {'planned': 200, 'skipped': 0, 'applied': 200}
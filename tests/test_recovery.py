@@ -0,0 +1,181 @@
+"""Tests for servicenow_recovery.py: failure classification, retries, recovery steps and the dead-letter list."""
+
+import json
+
+import pytest
+
+pytest.importorskip('selenium')
+
+from selenium.common.exceptions import (InvalidSessionIdException, NoSuchFrameException,  # noqa: E402
+                                        StaleElementReferenceException, TimeoutException, WebDriverException)
+
+import servicenow_recovery  # noqa: E402
+from servicenow_recovery import (ERROR, FAILED, FRAME, SESSION, STALE, TIMEOUT, DeadLetterList,  # noqa: E402
+                                 RecordRecovery, classify_failure)
+
+
+@pytest.mark.parametrize('error, kind', [
+    (None, FAILED),
+    (StaleElementReferenceException('element is not attached'), STALE),
+    (TimeoutException(''), TIMEOUT),
+    (NoSuchFrameException('gsft_main'), FRAME),
+    (InvalidSessionIdException(''), SESSION),
+    (ConnectionRefusedError(), SESSION),
+    (WebDriverException('invalid session id'), SESSION),
+    (WebDriverException('chrome not reachable'), SESSION),
+    (WebDriverException('Max retries exceeded with url: /session'), SESSION),
+    (WebDriverException('Frame was detached'), FRAME),
+    (WebDriverException('Execution context was destroyed'), FRAME),
+    (WebDriverException('stale element reference: element is not attached'), STALE),
+    (WebDriverException('script timed out'), TIMEOUT),
+    (WebDriverException('element click intercepted'), ERROR),
+    (ValueError('bad value'), ERROR),
+])
+def test_classify_failure(error, kind):
+    assert classify_failure(error) == kind
+
+
+class FakeNavigator:
+    """Records every reset() call and the driver it was given."""
+
+    def __init__(self):
+        self.resets = []
+
+    def reset(self, driver=None):
+        self.resets.append(driver)
+
+
+def steps(*outcomes):
+    """Callable returning the outcomes in order; exceptions are raised instead of returned."""
+    calls = []
+
+    def step():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    step.calls = calls
+    return step
+
+
+@pytest.fixture
+def recovery_for(tmp_path, limiter, monkeypatch):
+    """Factory of RecordRecovery objects without backoff delays, writing to a dead-letter list in tmp_path."""
+    # Timeouts are reported to the shared throttle; give them the test's own
+    monkeypatch.setattr(servicenow_recovery, 'throttle', limiter)
+
+    def create(**kwargs):
+        kwargs.setdefault('base_delay', 0)
+        return RecordRecovery(DeadLetterList(str(tmp_path / 'dead_letter.jsonl'), 'update'), **kwargs)
+
+    return create
+
+
+def read_dead_letter(tmp_path):
+    with open(tmp_path / 'dead_letter.jsonl', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_successful_result_is_returned_without_retries(recovery_for):
+    recovery = recovery_for()
+    action = steps('saved')
+
+    assert recovery.run('INC0000001', action) == 'saved'
+    assert len(action.calls) == 1
+
+
+def test_failures_are_retried_with_the_retry_step(recovery_for):
+    recovery = recovery_for(retries=2)
+    action = steps(False)
+    retry = steps(StaleElementReferenceException(''), True)
+
+    assert recovery.run('INC0000001', action, retry=retry) is True
+    assert len(action.calls) == 1
+    assert len(retry.calls) == 2
+    assert len(recovery.dead_letter) == 0
+
+
+def test_record_that_keeps_failing_is_dead_lettered(recovery_for, tmp_path):
+    recovery = recovery_for(retries=1)
+    action = steps(False, TimeoutException('Timed out waiting for the form\nStacktrace: ...'))
+
+    assert recovery.run('INC0000001', action) is None
+    assert len(action.calls) == 2
+    assert 'INC0000001' in recovery.dead_letter
+    [entry] = read_dead_letter(tmp_path)
+    assert entry['key'] == 'INC0000001'
+    assert entry['workflow'] == 'update'
+    assert entry['reason'] == TIMEOUT
+    # Only the first line of the message is kept
+    assert entry['error'] == 'Timed out waiting for the form'
+
+
+def test_returned_failure_is_dead_lettered_without_an_error(recovery_for, tmp_path):
+    recovery = recovery_for(retries=0)
+
+    recovery.run('INC0000001', steps(False))
+
+    [entry] = read_dead_letter(tmp_path)
+    assert entry['reason'] == FAILED
+    assert entry['error'] is None
+
+
+def test_timeouts_are_reported_to_the_throttle(recovery_for, limiter):
+    recovery = recovery_for(retries=1)
+
+    recovery.run('INC0000001', steps(TimeoutException('')), retry=steps(StaleElementReferenceException('')))
+
+    # Only the timeout counts towards the throttle's error rate
+    assert list(limiter.recent) == [True]
+
+
+def test_detached_frame_resets_the_navigator(recovery_for):
+    navigator = FakeNavigator()
+    recovery = recovery_for(navigator=navigator)
+
+    recovery.run('INC0000001', steps(NoSuchFrameException(''), True))
+
+    assert navigator.resets == [None]
+
+
+def test_dead_session_replaces_the_browser(recovery_for):
+    navigator = FakeNavigator()
+    drivers = []
+    recovery = recovery_for(navigator=navigator, restart_driver=lambda: drivers.append(object()) or drivers[-1])
+
+    recovery.run('INC0000001', steps(InvalidSessionIdException(''), True))
+
+    assert len(drivers) == 1
+    assert navigator.resets == drivers
+
+
+def test_stale_elements_need_no_recovery_step(recovery_for):
+    navigator = FakeNavigator()
+    recovery = recovery_for(navigator=navigator, restart_driver=lambda: pytest.fail('browser replaced'))
+
+    recovery.run('INC0000001', steps(StaleElementReferenceException(''), True))
+
+    assert navigator.resets == []
+
+
+def test_failed_recovery_step_does_not_stop_the_retries(recovery_for):
+    def restart_driver():
+        raise WebDriverException('msedgedriver could not be started')
+
+    recovery = recovery_for(restart_driver=restart_driver)
+
+    assert recovery.run('INC0000001', steps(InvalidSessionIdException(''), True)) is True
+
+
+def test_exhausted_after_consecutive_dead_letters_only(recovery_for):
+    recovery = recovery_for(retries=0, max_consecutive=2)
+
+    recovery.run('INC0000001', steps(False))
+    assert not recovery.exhausted
+    recovery.run('INC0000002', steps(True))
+    recovery.run('INC0000003', steps(False))
+    assert not recovery.exhausted
+    recovery.run('INC0000004', steps(False))
+    assert recovery.exhausted
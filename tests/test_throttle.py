@@ -0,0 +1,168 @@
+"""Tests for servicenow_throttle.py: AIMD limit changes, Retry-After pauses and slot handling."""
+
+import email.utils
+import threading
+import time
+
+import pytest
+
+from servicenow_throttle import ERROR, THROTTLED, AdaptiveLimiter, parse_retry_after
+
+
+@pytest.mark.parametrize('value, seconds', [
+    ('3', 3.0),
+    ('0.5', 0.5),
+    ('-5', 0.0),
+    (None, None),
+    ('', None),
+    ('soon', None),
+    ('Wed, 21 Oct 2015 07:28:00 GMT', 0.0),
+])
+def test_parse_retry_after(value, seconds):
+    assert parse_retry_after(value) == seconds
+
+
+def test_parse_retry_after_http_date():
+    value = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 28 <= parse_retry_after(value) <= 30
+
+
+def test_limit_grows_by_one_per_round_of_fast_successes(limiter):
+    assert limiter.limit == 4
+
+    for _ in range(3):
+        limiter.observe(0.05)
+    assert limiter.limit == 4
+    limiter.observe(0.05)
+    assert limiter.limit == 5
+    for _ in range(5):
+        limiter.observe(0.05)
+    assert limiter.limit == 6
+
+
+def test_limit_stays_within_its_bounds():
+    limiter = AdaptiveLimiter(min_limit=2, max_limit=3, initial=3)
+
+    for _ in range(20):
+        limiter.observe(0.05)
+    assert limiter.limit == 3
+    limiter.observe(outcome=THROTTLED, retry_after=0)
+    assert limiter.limit == 2
+
+
+def test_throttle_response_halves_the_limit_and_pauses_for_retry_after(limiter):
+    limiter.observe(outcome=THROTTLED, retry_after=30)
+
+    assert limiter.limit == 2
+    assert limiter.ceiling == 4
+    assert 29 <= limiter.status()['paused_s'] <= 30
+    assert limiter.changes == []
+
+
+def test_throttle_without_retry_after_pauses_exponentially(limiter):
+    limiter.observe(outcome=THROTTLED)
+    first = limiter.paused_until - time.monotonic()
+    limiter.observe(outcome=THROTTLED)
+    second = limiter.paused_until - time.monotonic()
+
+    assert 1 < first <= 2
+    assert 3 < second <= 4
+
+
+def test_pause_is_bounded_by_max_pause():
+    limiter = AdaptiveLimiter(min_limit=1, max_limit=8, max_pause=5)
+    limiter.observe(outcome=THROTTLED, retry_after=3600)
+
+    assert limiter.status()['paused_s'] <= 5
+
+
+def test_one_back_off_per_cooldown(limiter):
+    limiter.observe(outcome=THROTTLED, retry_after=0)
+    limiter.observe(outcome=THROTTLED, retry_after=0)
+    assert limiter.limit == 2
+
+    # Once the cooldown is over the next throttle response halves the limit again
+    limiter.last_decrease -= 1.0
+    limiter.observe(outcome=THROTTLED, retry_after=0)
+    assert limiter.limit == 1
+
+
+def test_growth_slows_down_next_to_the_throttled_limit(limiter):
+    limiter.observe(outcome=THROTTLED, retry_after=0)
+    assert limiter.limit == 2
+
+    # 2 -> 3 is not next to the ceiling of 4 yet
+    for _ in range(2):
+        limiter.observe(0.05)
+    assert limiter.limit == 3
+    # 3 -> 4 would reach it, so four rounds are needed
+    for _ in range(11):
+        limiter.observe(0.05)
+    assert limiter.limit == 3
+    limiter.observe(0.05)
+    assert limiter.limit == 4
+    # Probing past the ceiling is just as careful, and forgets the ceiling once it succeeds
+    for _ in range(15):
+        limiter.observe(0.05)
+    assert limiter.limit == 4
+    limiter.observe(0.05)
+    assert limiter.limit == 5
+    assert limiter.ceiling is None
+
+
+def test_error_burst_backs_off(limiter):
+    for _ in range(4):
+        limiter.observe(outcome=ERROR)
+    assert limiter.limit == 4
+    limiter.observe(outcome=ERROR)
+    assert limiter.limit == 2
+
+
+def test_latency_spike_backs_off(limiter):
+    for _ in range(3):
+        limiter.observe(0.1)
+    while limiter.limit == 4:
+        limiter.observe(2.0)
+
+    assert limiter.limit == 2
+    assert limiter.latency > limiter.baseline * limiter.spike_factor
+
+
+def test_small_absolute_latency_increase_is_not_a_spike(limiter):
+    for _ in range(3):
+        limiter.observe(0.01)
+    for _ in range(20):
+        limiter.observe(0.2)
+
+    assert limiter.limit > 4
+
+
+def test_wait_blocks_until_the_pause_is_over(limiter):
+    limiter.observe(outcome=THROTTLED, retry_after=0.3)
+    start_time = time.monotonic()
+    limiter.wait()
+
+    assert time.monotonic() - start_time >= 0.25
+
+
+def test_slots_limit_the_threads_working_at_the_same_time():
+    limiter = AdaptiveLimiter(min_limit=1, max_limit=1)
+    entered = threading.Event()
+
+    def work():
+        with limiter.slot():
+            entered.set()
+
+    with limiter.slot():
+        thread = threading.Thread(target=work)
+        thread.start()
+        assert not entered.wait(0.2)
+        # Nested use by the same thread does not take a second slot
+        with limiter.slot():
+            assert limiter.in_flight == 1
+        # Giving the slot up during a backoff lets the other thread in
+        with limiter.released():
+            assert entered.wait(1)
+            thread.join(1)
+        assert limiter.in_flight == 1
+    assert limiter.in_flight == 0
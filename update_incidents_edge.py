@@ -8,45 +8,218 @@ Credits: Abdullah Omer (https://github.com/AbdullahOmerDev)
 
 import time
 import os
+import argparse
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
+from servicenow_api import TableAPIClient, iterate_records
+from servicenow_batch import BatchWriter
+from servicenow_journal import ProcessedJournal, iterate_list
+from servicenow_lean import enable_lean_network, lean_options
+from servicenow_metrics import metrics
+from servicenow_mirror import RecordMirror
+from servicenow_nav import ClassicNavigator
+from servicenow_processes import processes
+from servicenow_profile import SlimProfile
+from servicenow_recovery import DeadLetterList, RecordRecovery
+from servicenow_recycle import BrowserRecycler
+from servicenow_session import lease_session
+from servicenow_waits import wait_for_ajax_idle, wait_for_form_load, wait_for_work_note_posted
 
-# Kill any existing Edge processes to prevent conflicts
-os.system("taskkill /F /IM msedge.exe /T")
+# Command line options
+parser = argparse.ArgumentParser(description="Post follow-up work notes on ServiceNow incidents")
+parser.add_argument('--backend', choices=['browser', 'api'], default='browser',
+                    help="'browser' drives Edge, 'api' posts the notes with Table API PATCHes packed into Batch API requests")
+parser.add_argument('--batch-size', type=int, default=None,
+                    help="API backend: incidents per Batch API request (default SERVICENOW_BATCH_SIZE or 100)")
+parser.add_argument('--session-service', action='store_true',
+                    help="Lease a warm, logged-in browser from servicenow_session.py")
+parser.add_argument('--direct-nav', action='store_true',
+                    help="Load classic UI lists directly instead of through the macroponent shell iframe")
+parser.add_argument('--lean', action='store_true',
+                    help="Block fonts, images and analytics the script never reads to cut page weight")
+parser.add_argument('--skip-window', type=float, default=24,
+                    help="Hours during which an incident that already got a note is skipped")
+parser.add_argument('--reset-journal', action='store_true',
+                    help="Forget which incidents were already handled and start from the top of the list")
+parser.add_argument('--retries', type=int, default=2,
+                    help="Extra attempts for an incident that fails before it is moved to the dead-letter list")
+parser.add_argument('--slim-profile', action='store_true',
+                    help="Start from a small snapshot of the profile's session instead of the full Edge profile")
+parser.add_argument('--mirror', action='store_true',
+                    help="Pick the incidents from the local SQLite mirror (synced incrementally) instead of reading the list")
+args = parser.parse_args()
+
+# Step timings go to ServiceNow_Metrics.jsonl / ServiceNow_Metrics.prom in the user profile
+metrics.configure('update' if args.backend == 'browser' else 'update_api')
 
 # Path to Edge profile - replace with a generic path that will be configured by the user
 edge_profile_path = r'C:\Users\[USERNAME]\AppData\Local\Microsoft\Edge\User Data'  # User should update this
 
-# Set up Edge options
-edge_options = webdriver.EdgeOptions()
-edge_options.add_argument(f'user-data-dir={edge_profile_path}')
-edge_options.add_argument('profile-directory=Default')
-
-# Initialize WebDriver with extended timeout for slower connections
-driver = webdriver.Edge(options=edge_options)
-wait = WebDriverWait(driver, 10)
+# Snapshot of the session files of that profile, used with --slim-profile
+slim_profile = SlimProfile(edge_profile_path)
 
 # Navigate to the service portal login page
 login_url = 'https://your-instance.service-now.com/login.do'  # Replace with actual login URL
-driver.get(login_url)
 
-try:
-    # Look for the login element - using a generic selector reference
-    # User should replace with their own username element selector
-    next_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-test-id='YOUR_USERNAME_HERE']")))
-    next_button.click()
-except (NoSuchElementException, TimeoutException) as e:
-    print("Error during login process:", e)
-    driver.quit()
-    exit()
+# Base URL of the instance, used to open incident forms directly
+instance_url = 'https://your-instance.service-now.com'
 
 # URL for incidents list - filter parameters can be adjusted as needed
 incidents_url = 'https://your-instance.service-now.com/nav_to.do?uri=incident_list.do%3Fsysparm_query%3Dactive%3Dtrue%5EORDERBYDESCsys_created_on%26sysparm_view%3Ddefault'  # Replace with actual incidents URL
 
+# Encoded filter of the API backend, matching the list above
+follow_up_filter = 'active=true'
+
+# Work note posted on every incident - can be customized
+follow_up_note = "هل من تحديث؟"  # "Any updates?" in Arabic
+
+# Journal of the incidents that already got a note, so they are skipped until the window has passed
+journal = ProcessedJournal(os.path.join(os.getenv('USERPROFILE', 'C:\\'), "ServiceNow_Journal.jsonl"),
+                           window=args.skip_window * 3600)
+if args.reset_journal:
+    journal.reset()
+
+dead_letter_path = os.path.join(os.getenv('USERPROFILE', 'C:\\'), "ServiceNow_DeadLetter.jsonl")
+
+def post_follow_ups_via_batch_api():
+    """
+    Post the follow-up note on every incident through the Table API, many PATCHes per Batch API request.
+
+    Incidents journaled within the skip window are left out. Each batch is journaled as soon as
+    it is written, so a restart never posts a note twice; sub-requests the batch did not apply
+    are sent again on their own, and incidents that still fail go to the dead-letter list.
+    Credentials are read from SERVICENOW_USERNAME/SERVICENOW_PASSWORD (or SERVICENOW_TOKEN).
+    """
+    dead_letter = DeadLetterList(dead_letter_path, 'update')
+    numbers = {}
+
+    def incidents(client):
+        for incident in iterate_records(client, 'incident', query=follow_up_filter, fields=['number']):
+            if not journal.seen(incident['sys_id'], 'work_note'):
+                numbers[incident['sys_id']] = incident.get('number')
+                yield incident['sys_id'], {'work_notes': follow_up_note}
+
+    def journal_batch(results):
+        for result in results.values():
+            if result.ok:
+                journal.record(result.sys_id, 'work_note')
+            else:
+                dead_letter.add(numbers.get(result.sys_id) or result.sys_id, f'http_{result.status}', result.error)
+
+    start_time = time.perf_counter()
+    with TableAPIClient(instance_url) as client:
+        writer = BatchWriter(client, batch_size=args.batch_size)
+        results = writer.patch_many('incident', incidents(client), on_batch=journal_batch)
+    elapsed = time.perf_counter() - start_time
+
+    posted = sum(1 for result in results.values() if result.ok)
+    print(f"✅ Posted {posted} work notes with {writer.batches} batch requests in {elapsed:.1f}s.")
+    if dead_letter:
+        print(f"⚠️ {len(dead_letter)} incidents moved to {dead_letter_path}.")
+
+if args.backend == 'api':
+    post_follow_ups_via_batch_api()
+    journal.close()
+    metrics.close()
+    exit()
+
+session_lease = None
+
+def start_browser(refreshed=False):
+    """
+    Start Edge with the user profile and log in, or lease a warm session from the session service.
+
+    Args:
+        refreshed: The slim profile snapshot was already taken again after a failed login
+
+    Returns:
+        The WebDriver, or None if the login failed
+    """
+    global session_lease
+    if args.session_service:
+        # Attach to a warm, already logged-in browser - no cold start and no login
+        session_lease = lease_session('update_incidents_edge')
+        new_driver = session_lease.driver
+    else:
+        # Set up Edge options
+        edge_options = webdriver.EdgeOptions()
+        if args.slim_profile:
+            # Private copy of the session files only - starts fast and does not lock the user profile
+            slim_profile.options(edge_options)
+        else:
+            edge_options.add_argument(f'user-data-dir={edge_profile_path}')
+            edge_options.add_argument('profile-directory=Default')
+
+        # Initialize WebDriver with extended timeout for slower connections
+        if args.lean:
+            lean_options(edge_options)
+        new_driver = processes.start('edge', edge_options)
+        if args.slim_profile:
+            slim_profile.apply_cookies(new_driver)
+
+        try:
+            with metrics.span('login'):
+                new_driver.get(login_url)
+                # Look for the login element - using a generic selector reference
+                # User should replace with their own username element selector
+                next_button = WebDriverWait(new_driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-test-id='YOUR_USERNAME_HERE']")))
+                next_button.click()
+        except (NoSuchElementException, TimeoutException) as e:
+            print("Error during login process:", e)
+            retire_browser(new_driver)
+            if args.slim_profile and not refreshed:
+                # The session in the snapshot has expired - take it again from the user profile and retry once
+                slim_profile.refresh(keep_cookies=False)
+                return start_browser(refreshed=True)
+            return None
+        if args.slim_profile:
+            # Keep the freshest session cookies in the snapshot for the next start
+            slim_profile.capture(new_driver, login_url)
+
+    # Lean profile: fonts, images, avatars and analytics beacons are never downloaded
+    if args.lean:
+        enable_lean_network(new_driver)
+    return new_driver
+
+def retire_browser(old_driver):
+    """Quit a browser this script started and delete the slim profile copy it ran on."""
+    processes.quit(old_driver)
+    slim_profile.remove_clone(old_driver)
+
+def restart_browser():
+    """Replace a browser whose session died (recovery callback) and return the new driver."""
+    global driver, wait
+    try:
+        if session_lease:
+            session_lease.release()
+        else:
+            retire_browser(driver)
+    except Exception:
+        pass  # The old browser is already gone
+    new_driver = start_browser()
+    if not new_driver:
+        raise RuntimeError("Login failed after restarting the browser")
+    driver, wait = new_driver, WebDriverWait(new_driver, 10)
+    return driver
+
+# Stop only browsers left behind by crashed runs; the user's Edge and other running automations stay open
+processes.cleanup_orphans()
+
+driver = start_browser()
+if not driver:
+    slim_profile.remove_clones()
+    metrics.close()
+    exit()
+wait = WebDriverWait(driver, 10)
+
+# Opens classic UI pages; with --direct-nav the Next Experience shell is skipped when the instance allows it
+navigator = ClassicNavigator(driver, direct=args.direct_nav)
+
+@metrics.timed('element_find')
 def find_element_safe(wait, by, value, timeout=10):
     """Safe method to find an element with explicit wait.
     
@@ -64,83 +237,117 @@ def find_element_safe(wait, by, value, timeout=10):
     except TimeoutException:
         return None
 
-def find_shadow_element(host, selector):
-    """Find element inside a shadow DOM.
-    
-    Args:
-        host: Shadow DOM host element
-        selector: CSS selector to find within the shadow DOM
-        
+# Incidents that keep failing are retried with backoff and then parked in the dead-letter list
+recovery = RecordRecovery(DeadLetterList(dead_letter_path, 'update'), navigator,
+                          restart_driver=restart_browser, retries=args.retries)
+
+# Swaps in a fresh browser between incidents once this one has grown past the memory watermark;
+# with --slim-profile the replacement is started and logged in ahead of time
+recycler = BrowserRecycler(start_browser, quit_browser=retire_browser, standby=args.slim_profile,
+                           enabled=not args.session_service)
+
+def recycle_browser():
+    """Replace the browser between records once it crossed the memory or renderer watermark."""
+    global driver, wait
+    new_driver = recycler.recycle(driver)
+    if new_driver is not driver:
+        driver, wait = new_driver, WebDriverWait(new_driver, 10)
+        navigator.reset(new_driver)
+
+def post_follow_up(record):
+    """
+    Open one incident form and post the follow-up work note.
+
     Returns:
-        WebElement if found, None otherwise
+        True once the note was posted, False if the form or a required element did not load
+        or the posted note did not show up
     """
-    try:
-        shadow_root = driver.execute_script("return arguments[0].shadowRoot", host)
-        return shadow_root.find_element(By.CSS_SELECTOR, selector)
-    except Exception:
-        return None
+    # Open the incident form directly from the list snapshot
+    if not navigator.open(f"{instance_url}/incident.do?sys_id={record['sys_id']}"):
+        print(f"❌ Incident {record['number']} could not be opened.")
+        return False
+    wait_for_form_load(driver)  # Wait for the form to load
+    print(f"✅ Opened incident {record['number']}.")
 
-# Main loop to continuously check and update incidents
-while True:
-    # Navigate to the incidents list page
-    driver.get(incidents_url)
-    print("Incidents list page opened")
+    # Find the work notes text area
+    work_notes = find_element_safe(wait, By.ID, "activity-stream-work_notes-textarea")
+    
+    if not work_notes:
+        print("❌ Work notes textarea not found.")
+        return False
+    
+    # Add the update message to work notes - can be customized
+    with metrics.span('edit', record['number']):
+        work_notes.send_keys(follow_up_note)
+        wait_for_ajax_idle(driver)  # Give time for input to register
+    print("✅ Work notes updated.")
 
-    try:
-        # Find the shadow DOM host element (for modern ServiceNow interfaces)
-        shadow_host = find_element_safe(wait, By.XPATH, "//*[starts-with(name(), 'macroponent')]")
-        if not shadow_host:
-            print("❌ Shadow DOM Host not found.")
-            break
+    # Find and click the post button to submit the work notes
+    post_button = find_element_safe(wait, By.CSS_SELECTOR, "button.btn.btn-default.activity-submit")
+    
+    if not post_button:
+        print("❌ Post button not found.")
+        return False
+    
+    with metrics.span('submit', record['number']) as span:
+        post_button.click()
+        posted = wait_for_work_note_posted(driver, work_notes)  # Wait for submission to complete
+        if not posted:
+            span.fail()
+    if not posted:
+        # Not journaled, so recovery retries it and a later run picks it up again
+        print(f"❌ Work note on {record['number']} was not confirmed as posted.")
+        return False
+    print("✅ Clicked on the post button.")
+    return True
 
-        # Find the iframe within the shadow DOM
-        iframe = find_shadow_element(shadow_host, 'iframe')
-        if not iframe:
-            print("❌ iframe not found. Reloading...")
-            continue  # Reload page if iframe is missing
-        
-        # Switch to the iframe containing the incident list
-        driver.switch_to.frame(iframe)
-        print("✅ Switched to iframe!")
+# Local copy of the incident fields, synced with only the records changed since the last run (--mirror)
+mirror = RecordMirror() if args.mirror else None
 
-        # Find and click on the first incident link
-        incident_url = find_element_safe(wait, By.CSS_SELECTOR, "a.linked.formlink")
-        
-        if not incident_url:
-            print("❌ Required elements not found.")
-            break
-        
-        incident_url.click()
-        print("✅ Clicked on the incident link.")
-        time.sleep(2)  # Allow page to load
+def mirror_follow_ups():
+    """
+    Yield the active incidents that did not get a note within the skip window, from the local mirror.
 
-        # Find the work notes text area
-        work_notes = find_element_safe(wait, By.ID, "activity-stream-work_notes-textarea")
-        
-        if not work_notes:
-            print("❌ Work notes textarea not found.")
-            break
-        
-        # Add the update message to work notes - can be customized
-        work_notes.send_keys("هل من تحديث؟")  # "Any updates?" in Arabic
-        print("✅ Work notes updated.")
-        time.sleep(2)  # Give time for input to register
+    The mirror is synced through the browser's session first, so only the incidents changed since
+    the last sync are read from the instance; the selection itself is a local query.
+    """
+    mirror.sync_browser(navigator, incidents_url)
+    for record in mirror.records('incident', active=True, not_done='work_note', window=args.skip_window * 3600):
+        if not journal.seen(record['sys_id'], 'work_note'):
+            yield record
 
-        # Find and click the post button to submit the work notes
-        post_button = find_element_safe(wait, By.CSS_SELECTOR, "button.btn.btn-default.activity-submit")
-        
-        if not post_button:
-            print("❌ Post button not found.")
+posted = 0
+
+# Walk the list page by page (or the mirror's selection); handled incidents are skipped without opening their form
+try:
+    records = mirror_follow_ups() if mirror else iterate_list(navigator, incidents_url, journal, 'work_note')
+    for record in records:
+        recycle_browser()
+        if recovery.run(record['number'], lambda: post_follow_up(record)):
+            # Journal the note right away so a restart never posts it twice
+            journal.record(record['sys_id'], 'work_note')
+            if mirror:
+                mirror.mark('incident', record['sys_id'], 'work_note')
+            posted += 1
+        if recovery.exhausted:
+            print("❌ Too many incidents failed in a row, stopping.")
             break
-        
-        post_button.click()
-        print("✅ Clicked on the post button.")
-        time.sleep(2)  # Wait for submission to complete
+except Exception as e:
+    print(f"An error occurred: {e}")
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        break
+print(f"✅ Posted {posted} work notes.")
+if recovery.dead_letter:
+    print(f"⚠️ {len(recovery.dead_letter)} incidents moved to {dead_letter_path}.")
+journal.close()
+if mirror:
+    mirror.close()
 
 # Close the browser when the script completes or encounters an error
 print("❌ Closing the browser due to error or completion.")
-driver.quit()
\ No newline at end of file
+recycler.close()
+if session_lease:
+    session_lease.release()  # The browser stays warm in the session service
+else:
+    processes.quit(driver)
+slim_profile.remove_clones()
+metrics.close()